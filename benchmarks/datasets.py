@@ -0,0 +1,124 @@
+# benchmarks/datasets.py
+
+import numpy as np
+import pkg_resources
+
+# =============================================================================
+# 固定的合成数据集
+# 所有随机数都来自固定种子，保证每次运行、每台机器上的输入完全相同，结果才可比较。
+# =============================================================================
+
+SEED = 20240601
+
+HOUSE_SYSTEMS = ['Placidus', 'Koch', 'Regiomontanus', 'Campanus', 'Equal', 'Whole Sign']
+
+BASE_OPTIONS = {
+    'ecliptic_mode': 'sidereal',
+    'ayanamsha_mode': 'SIDM_KRISHNAMURTI',
+    'node_mode': 'mean',
+    'house_system': 'Placidus',
+    'selected_minor_planets': ['Ch', 'Ce', 'Pa', 'Jn', 'Vs'],
+}
+
+HORARY_OPTIONS = dict(BASE_OPTIONS, KP_HORARY={'is_active': True, 'mode': 'KS-N', 'number': 101})
+
+# 与示例 notebook 相同的 15 颗恒星
+STARS_15 = [
+    'Algol,bePer', 'Alcyone,etTau', 'Aldebaran,alTau', 'Capella,alAur', 'Sirius,alCMa',
+    'Procyon,alCMi', 'Regulus,alLeo', 'Algorab,deCrv', 'Spica,alVir', 'Arcturus,alBoo',
+    'Alphecca,alCrB', 'Antares,alSco', 'Vega,alLyr', 'DenebAlgedi,deCap', 'Fomalhaut,alPsA',
+]
+
+ASPECT_CONFIG = {
+    'modes': ['orb', 'whole_sign', 'vedic'],
+    'orb_config_str': '',   # 由 aspect_bodies 按天体名生成
+    'active_houses': [1, 10],
+    'aspect_types': ['0°☌', '60°⚹', '90°□', '120°△', '180°☍'],
+    'declination': {'is_active': True, 'orb': 1.2},
+}
+
+SUNRISE_CONFIG = {}
+
+
+def _dms(value):
+    """十进制度数 -> 'D°M′S″' 字符串 (与 birth_config 相同的格式)。"""
+    sign = '-' if value < 0 else ''
+    value = abs(value)
+    d = int(value)
+    m = int((value - d) * 60)
+    s = (value - d - m / 60) * 3600
+    return f"{sign}{d}°{m:02d}′{s:09.6f}″"
+
+
+def birth_configs(n=64):
+    """n 个固定的出生配置 (1950–2030 年，纬度 ±60°)。"""
+    rng = np.random.default_rng(SEED)
+    seconds = rng.integers(0, 80 * 365 * 86400, n)
+    base = np.datetime64('1950-01-01T00:00:00', 's')
+    offsets = rng.choice(['+8:00', '+5:30', '-5:00', '+0:00', '+1:00', '-3:00'], n)
+    lats = rng.uniform(-60, 60, n)
+    lons = rng.uniform(-180, 180, n)
+    configs = []
+    for k in range(n):
+        local = str(base + seconds[k]).replace('T', ' ') + '.000000'
+        configs.append({
+            'local_time_str': local,
+            'timezone_str': str(offsets[k]),
+            'latitude_str': _dms(lats[k]),
+            'longitude_str': _dms(lons[k]),
+            'elevation': 0.0,
+            'calendar': 'g',
+        })
+    return configs
+
+
+def position_args(config, options=BASE_OPTIONS):
+    """把 birth_config 与计算选项合并成 calculate_positions 的关键字参数。"""
+    kwargs = {k: v for k, v in config.items() if k in ('local_time_str', 'timezone_str', 'latitude_str',
+                                                         'longitude_str', 'elevation', 'calendar')}
+    kwargs.update(options)
+    return kwargs
+
+
+def star_names(n):
+    """sefstars.txt 中前 n 颗 (按文件顺序、按星名去重) 恒星，格式 'Name,nomenclature'。"""
+    if n <= len(STARS_15):
+        return STARS_15[:n]
+    path = pkg_resources.resource_filename('quant_astro', 'ephe/sefstars.txt')
+    names, seen = list(STARS_15), {s.split(',')[1] for s in STARS_15}
+    with open(path, encoding='latin-1') as f:
+        for line in f:
+            if line.startswith('#') or ',' not in line:
+                continue
+            name, nomen = (part.strip() for part in line.split(',')[:2])
+            if not name or nomen in seen:
+                continue
+            seen.add(nomen)
+            names.append(f"{name},{nomen}")
+            if len(names) == n:
+                break
+    return names
+
+
+def aspect_bodies(n):
+    """
+    n 个合成天体 (字段与 calculate_positions 的行星字典一致) 与对应的相位配置。
+    """
+    rng = np.random.default_rng(SEED + n)
+    bodies = {}
+    for k in range(n):
+        bodies[f"B{k:03d}"] = {
+            'lon': float(rng.uniform(0, 360)),
+            'lat': float(rng.uniform(-5, 5)),
+            'speed': float(rng.normal(0.5, 0.8)),
+            'ra': float(rng.uniform(0, 360)),
+            'dec': float(rng.uniform(-25, 25)),
+            'dec_speed': float(rng.normal(0, 0.2)),
+        }
+    orbs = '; '.join(f"{name}: {rng.integers(3, 10)}°00′00″" for name in bodies)
+    config = dict(ASPECT_CONFIG, orb_config_str=f"{orbs}; 1: 5°00′00″; 10: 5°00′00″")
+    return bodies, config
+
+
+def dasha_config(level):
+    return {'max_level': level, 'output_mode': 'all', 'days_in_year': 365.25}
@@ -0,0 +1,174 @@
+# benchmarks/load_test.py
+"""
+quant_astro.serve 的压测脚本。
+
+用法 (在仓库根目录)：
+    python benchmarks/load_test.py                              # 启动本地服务并压测 /positions
+    python benchmarks/load_test.py --url http://127.0.0.1:8765  # 压测已运行的服务
+    python benchmarks/load_test.py -e positions -e kp_lords -c 64 -n 5000
+
+每个并发客户端使用一条 keep-alive 连接顺序发送请求；
+报告每个端点的 p50/p90/p99/最大延迟、吞吐量与错误数，以及服务端的平均批大小。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import datasets as ds
+
+ENDPOINTS = ('positions', 'kp_lords', 'significators', 'aspects', 'attributes', 'dasha')
+
+
+def _payloads(endpoint, n_charts):
+    """每个端点的请求体 (按出生配置轮换，保证请求之间有重复也有差异)。"""
+    bodies = []
+    aspect_config = dict(ds.ASPECT_CONFIG, orb_config_str='Su: 8°00′00″; Mo: 8°00′00″; 1: 5°00′00″; 10: 5°00′00″')
+    for config in ds.birth_configs(n_charts):
+        payload = {'birth_config': config, 'options': ds.BASE_OPTIONS}
+        if endpoint == 'aspects':
+            payload['aspect_config'] = aspect_config
+        elif endpoint == 'dasha':
+            payload['dasa_config'] = ds.dasha_config(3)
+        bodies.append(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+    return bodies
+
+
+async def _request(reader, writer, host, method, path, body=b''):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = next(int(line.split(':', 1)[1]) for line in lines[1:] if line.lower().startswith('content-length'))
+    return status, await reader.readexactly(length)
+
+
+async def _client(host, port, jobs, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            endpoint, body = jobs.pop()
+            t0 = time.perf_counter()
+            status, _ = await _request(reader, writer, host, 'POST', f'/{endpoint}', body)
+            latencies[endpoint].append(time.perf_counter() - t0)
+            if status != 200:
+                errors[endpoint] += 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, endpoints, concurrency, total, n_charts, seed=0):
+    rng = np.random.default_rng(seed)
+    bodies = {e: _payloads(e, n_charts) for e in endpoints}
+    jobs = []
+    for k in range(total):
+        endpoint = endpoints[k % len(endpoints)]
+        jobs.append((endpoint, bodies[endpoint][rng.integers(len(bodies[endpoint]))]))
+    latencies = {e: [] for e in endpoints}
+    errors = {e: 0 for e in endpoints}
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, jobs, latencies, errors) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await _request(reader, writer, host, 'GET', '/stats')
+    writer.close()
+    return latencies, errors, elapsed, json.loads(stats)
+
+
+def report(latencies, errors, elapsed, stats, stream=sys.stdout):
+    print(f"{'endpoint':<15} {'requests':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}",
+          file=stream)
+    total = 0
+    for endpoint, values in latencies.items():
+        if not values:
+            continue
+        ms = np.array(values) * 1e3
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        print(f"{endpoint:<15} {len(ms):>9} {p50:>9.2f} {p90:>9.2f} {p99:>9.2f} {ms.max():>9.2f} {errors[endpoint]:>7}",
+              file=stream)
+        total += len(ms)
+    print(f"\n{total} 个请求，耗时 {elapsed:.2f} s，吞吐量 {total / elapsed:.1f} 请求/秒，"
+          f"服务端平均批大小 {stats.get('mean_batch_size', 0):.1f}", file=stream)
+
+
+def _start_server(args):
+    """启动本地服务子进程 (系统分配端口)，返回 (进程, host, port)。"""
+    cmd = [sys.executable, '-m', 'quant_astro.serve', '--port', '0',
+           '--max-batch', str(args.max_batch), '--max-delay-ms', str(args.max_delay_ms)]
+    if args.workers is not None:
+        cmd += ['--workers', str(args.workers)]
+    if args.ephe_path is not None:
+        cmd += ['--ephe-path', os.path.abspath(args.ephe_path)]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # 独立的进程组：结束时万一主进程没能正常退出，可以连同 worker 一起清理
+    proc = subprocess.Popen(cmd, cwd=root, stdout=subprocess.PIPE, text=True, start_new_session=True)
+    for line in proc.stdout:
+        if 'listening on' in line:
+            address = urlsplit(line.split('listening on', 1)[1].strip())
+            # 继续读取并丢弃服务端输出，避免管道写满阻塞服务
+            threading.Thread(target=proc.stdout.read, daemon=True).start()
+            return proc, address.hostname, address.port
+    raise RuntimeError('服务启动失败')
+
+
+def _stop_server(proc, timeout=30.0):
+    """以 SIGINT 让服务正常退出 (关闭进程池)；超时未退出时结束整个进程组。"""
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='quant_astro.serve 压测')
+    parser.add_argument('--url', help='已运行服务的地址；不提供时自动启动本地服务')
+    parser.add_argument('-e', dest='endpoints', action='append', choices=ENDPOINTS, help='压测的端点 (可重复)')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('--charts', type=int, default=64, help='轮换使用的不同出生配置数')
+    parser.add_argument('--workers', type=int, default=None, help='自动启动服务时的 worker 数')
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    parser.add_argument('--ephe-path', default=None, help='自动启动服务时的星历目录 (压测后检查 worker 仍在使用它)')
+    args = parser.parse_args(argv)
+
+    proc = None
+    errors = {}
+    if args.url:
+        address = urlsplit(args.url)
+        host, port = address.hostname, address.port
+    else:
+        proc, host, port = _start_server(args)
+    try:
+        latencies, errors, elapsed, stats = asyncio.run(
+            run(host, port, args.endpoints or ['positions'], args.concurrency, args.requests, args.charts))
+        report(latencies, errors, elapsed, stats)
+        if args.ephe_path is not None and stats.get('ephe_path') != os.path.abspath(args.ephe_path):
+            print(f"星历目录不一致：服务端使用 {stats.get('ephe_path')}，期望 {os.path.abspath(args.ephe_path)}")
+            errors['ephe_path'] = 1
+    finally:
+        if proc is not None:
+            _stop_server(proc)
+    return 1 if any(errors.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
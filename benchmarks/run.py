@@ -0,0 +1,379 @@
+# benchmarks/run.py
+"""
+quant_astro 基准测试。
+
+用法 (在仓库根目录)：
+    python benchmarks/run.py                          # 运行全部基准并打印结果
+    python benchmarks/run.py -k aspects -k dasha      # 只运行名称包含关键字的基准
+    python benchmarks/run.py --save baseline.json     # 保存为基线
+    python benchmarks/run.py --compare baseline.json  # 与基线比较，有退化时退出码为 1
+
+每个基准记录：每轮耗时 (最小/中位/平均)、吞吐量 (条目/秒) 与峰值内存 (tracemalloc)。
+计时与内存分两次测量，避免 tracemalloc 的开销污染计时结果。
+持久化缓存在运行期间被关闭，测量的始终是实际计算路径。
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import swisseph as swe
+
+import quant_astro as qa
+from quant_astro.dasha_Vimshottari import _generate_dasha_intervals
+from quant_astro.dasha_Vimshottari_api import _prepare_dasha_seed
+import datasets as ds
+
+# ----------------- 基准注册 -----------------
+
+BENCHMARKS = []
+
+def benchmark(name):
+    """
+    注册一个基准。被装饰的函数负责准备数据 (不计时)，
+    返回 (待计时的无参函数, 每次调用处理的条目数)。
+    """
+    def decorator(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return decorator
+
+
+_CHARTS = None
+
+def _charts():
+    """64 个固定命盘的计算结果，供下游基准复用 (只算一次)。"""
+    global _CHARTS
+    if _CHARTS is None:
+        _CHARTS = []
+        for config in ds.birth_configs():
+            result = qa.calculate_positions(**ds.position_args(config))
+            _CHARTS.append({'config': config, 'positions': result})
+    return _CHARTS
+
+
+def _register_positions(house_system):
+    @benchmark(f"calculate_positions[{house_system}]")
+    def setup():
+        args = [ds.position_args(c, dict(ds.BASE_OPTIONS, house_system=house_system)) for c in ds.birth_configs()]
+        return (lambda: [qa.calculate_positions(**a) for a in args]), len(args)
+
+for _house_system in ds.HOUSE_SYSTEMS:
+    _register_positions(_house_system)
+
+@benchmark("calculate_positions[KP horary]")
+def _positions_horary():
+    args = [ds.position_args(c, ds.HORARY_OPTIONS) for c in ds.birth_configs()]
+    return (lambda: [qa.calculate_positions(**a) for a in args]), len(args)
+
+
+def _register_fixed_stars(n_stars):
+    @benchmark(f"calculate_fixed_stars[{n_stars} stars]")
+    def setup():
+        stars = ds.star_names(n_stars)
+        jds = [chart['positions'][3] for chart in _charts()[:16]]
+        return (lambda: [qa.calculate_fixed_stars(jd, stars, 'sidereal') for jd in jds]), len(jds) * len(stars)
+
+for _n in (15, 100):
+    _register_fixed_stars(_n)
+
+
+@benchmark("get_kp_lords")
+def _kp_lords():
+    inputs = [(c['positions'][0], c['positions'][1]) for c in _charts()]
+    return (lambda: [qa.get_kp_lords(p, h) for p, h in inputs]), len(inputs)
+
+@benchmark("varga_signs[1M x 16 vargas]")
+def _varga_signs():
+    lons = np.random.default_rng(0).uniform(0.0, 360.0, 1_000_000)
+    return (lambda: qa.varga_signs(lons)), len(lons)
+
+@benchmark("get_significators")
+def _significators():
+    inputs = []
+    for chart in _charts():
+        planets, houses = chart['positions'][0], chart['positions'][1]
+        inputs.append((planets, houses) + tuple(qa.get_kp_lords(planets, houses)))
+    return (lambda: [qa.get_significators(*args) for args in inputs]), len(inputs)
+
+
+def _register_aspects(n_bodies):
+    @benchmark(f"calculate_aspects[{n_bodies} bodies]")
+    def setup():
+        bodies, config = ds.aspect_bodies(n_bodies)
+        houses = _charts()[0]['positions'][1]
+        return (lambda: qa.calculate_aspects(bodies, houses, config)), n_bodies * (n_bodies - 1) // 2
+
+for _n in (10, 40, 100):
+    _register_aspects(_n)
+
+
+@benchmark("harmonic_aspects_series[10k x 15 bodies, H1-H16]")
+def _harmonic_aspects():
+    lons = np.random.default_rng(0).uniform(0.0, 360.0, (10_000, 15))
+    names = [f'b{k}' for k in range(15)]
+    return (lambda: qa.harmonic_aspects_series(lons, names, range(1, 17), orb=2.0)), len(lons)
+
+
+@benchmark("get_attributes")
+def _attributes():
+    inputs = [c['positions'] for c in _charts()]
+    return (lambda: [qa.get_attributes(p[0], p[1], jd=p[3], minor_planet_positions=p[5]) for p in inputs]), len(inputs)
+
+
+def _register_dasha(level):
+    @benchmark(f"_generate_dasha_intervals[level {level}]")
+    def setup():
+        chart = _charts()[0]
+        start, first_lord, _ = _prepare_dasha_seed(chart['positions'][0], chart['config'], {})
+        dasa_config = ds.dasha_config(level)
+        rows = sum(9 ** k for k in range(1, level + 1))
+        return (lambda: _generate_dasha_intervals(start, first_lord, dasa_config)), rows
+
+for _level in range(2, 7):
+    _register_dasha(_level)
+
+
+@benchmark("find_stations[Me-Pl, 10 years]")
+def _stations():
+    return (lambda: qa.find_stations(2451544.5, 2451544.5 + 3652.5)), 10
+
+@benchmark("find_lunations[10 years]")
+def _lunations():
+    return (lambda: qa.find_lunations.uncached(2451544.5, 2451544.5 + 3652.5)), 10
+
+@benchmark("find_returns[Mo, 1k natives x 10 years]")
+def _returns():
+    natal = np.random.default_rng(0).uniform(0.0, 360.0, 1000)
+    return (lambda: qa.find_returns(natal, 'Mo', 2451544.5, 2451544.5 + 3652.5)), len(natal)
+
+@benchmark("calculate_houses_batch")
+def _houses_batch():
+    rng = np.random.default_rng(0)
+    jds = 2451544.5 + rng.uniform(0.0, 3652.5, 10_000)
+    lats, lons = rng.uniform(-60.0, 60.0, len(jds)), rng.uniform(-180.0, 180.0, len(jds))
+    return (lambda: qa.calculate_houses_batch(jds, lats, lons)), len(jds)
+
+@benchmark("calculate_progressions[100 years monthly]")
+def _progressions():
+    birth = 2447892.8
+    targets = birth + np.arange(1200) * 365.24219 / 12.0
+    return (lambda: qa.calculate_progressions(birth, targets, latitude=28.61, longitude=77.21)), len(targets)
+
+def _check_declination_events(bodies, start, end):
+    """赤纬事件只取决于星体自身：去掉月亮后其余星体的事件不变，太阳不产生出界事件。"""
+    def events(names):
+        df = qa.find_declination_events(start, end, bodies=names)
+        df = df[df['p1'].isin(others) & (df['p2'].isin(others) | df['p2'].isna())]
+        return sorted(zip(df['event'].astype(str), df['p1'].astype(str), df['p2'].astype(str), df['jd_ut'].round(9)))
+
+    others = [name for name in bodies if name != 'Mo']
+    with_moon, without_moon = events(bodies), events(others)
+    if with_moon != without_moon:
+        raise AssertionError("find_declination_events 的结果随请求的星体列表变化")
+    if any(event.startswith('oob') and p1 == 'Su' for event, p1, _, _ in with_moon):
+        raise AssertionError("find_declination_events 报告了太阳出界")
+
+@benchmark("find_declination_events[Su-Pl + 2 stars, 10 years]")
+def _declination_events():
+    bodies = ['Su', 'Mo', 'Me', 'Ve', 'Ma', 'Ju', 'Sa', 'Ur', 'Ne', 'Pl', 'Spica', 'Regulus']
+    _check_declination_events(bodies, 2451544.5, 2451544.5 + 730.5)
+    return (lambda: qa.find_declination_events(2451544.5, 2451544.5 + 3652.5, bodies=bodies)), 10
+
+@benchmark("calculate_positions_variants[5 zodiacs]")
+def _positions_variants():
+    jds = 2451544.5 + np.arange(64) * 37.3
+    return (lambda: [qa.calculate_positions_variants(jd, 28.61, 77.21) for jd in jds]), len(jds)
+
+@benchmark("calculate_positions_sweep[20 locations x 3 systems]")
+def _positions_sweep():
+    locations = {f"L{k:02d}": (-50.0 + 5.0 * k, -170.0 + 17.0 * k) for k in range(20)}
+    aspect_config = dict(ds.ASPECT_CONFIG, orb_config_str='Su: 8°; Mo: 8°; Ma: 6°; Ju: 6°; Sa: 6°; 1: 5°; 10: 5°')
+    jds = 2451544.5 + np.arange(16) * 37.3
+    return (lambda: [qa.calculate_positions_sweep(jd, locations, ('Placidus', 'Koch', 'Equal'),
+                                                  aspect_config=aspect_config) for jd in jds]), 16 * 60
+
+@benchmark("panchanga_at[100k timestamps]")
+def _panchanga_at():
+    jds = np.linspace(2451544.5, 2451544.5 + 3652.5, 100_000)
+    return (lambda: qa.panchanga_at(jds, latitude=28.61, longitude=77.21)), len(jds)
+
+@benchmark("panchanga_events[1 year]")
+def _panchanga_events():
+    return (lambda: qa.panchanga_events(2451544.5, 2451544.5 + 365.25)), 1
+
+@benchmark("get_planetary_hour")
+def _planetary_hour():
+    configs = ds.birth_configs(16)
+    return (lambda: [qa.get_planetary_hour(c, ds.SUNRISE_CONFIG) for c in configs]), len(configs)
+
+
+def _chart_html_inputs(out_dir):
+    """16 张命盘的 generate_chart_html 关键字参数 (含 KP 与相位表)。"""
+    inputs = []
+    aspect_bodies, aspect_config = ds.aspect_bodies(10)
+    for k, chart in enumerate(_charts()[:16]):
+        planets, houses = chart['positions'][0], chart['positions'][1]
+        kp_p, kp_h = qa.get_kp_lords(planets, houses)
+        sig_p, sig_h = qa.get_significators(planets, houses, kp_p, kp_h)
+        inputs.append(dict(
+            planet_pos=planets, house_pos=houses, chart_info={'name': f'bench {k}'},
+            kp_planet_results=kp_p, kp_house_results=kp_h, kp_planet_sigs=sig_p, kp_house_sigs=sig_h,
+            kp_ruling_planets=qa.get_ruling_planets(kp_p, kp_h, 'Su'),
+            aspect_results=qa.calculate_aspects(planets, houses, aspect_config),
+            aspect_config=aspect_config,
+            output_filename=os.path.join(out_dir, f'chart_{k}.html'),
+        ))
+    return inputs
+
+@benchmark("generate_chart_html")
+def _chart_html():
+    inputs = _chart_html_inputs(tempfile.mkdtemp(prefix='qa_bench_'))
+    return (lambda: [qa.generate_chart_html(**kw) for kw in inputs]), len(inputs)
+
+def _register_render_charts(bundle_size):
+    @benchmark(f"render_charts[bundle {bundle_size}]")
+    def setup():
+        out_dir = tempfile.mkdtemp(prefix='qa_bench_')
+        inputs = _chart_html_inputs(out_dir)
+        return (lambda: qa.render_charts(inputs, out_dir, bundle_size=bundle_size)), len(inputs)
+
+for _bundle in (None, 16):
+    _register_render_charts(_bundle)
+
+@benchmark("iter_chart_svgs")
+def _chart_svgs():
+    charts = [qa.build_chart_dict(**{k: v for k, v in kw.items() if k != 'output_filename'})
+              for kw in _chart_html_inputs(tempfile.mkdtemp(prefix='qa_bench_'))]
+    return (lambda: list(qa.iter_chart_svgs(charts))), len(charts)
+
+
+# ----------------- 测量 -----------------
+
+def _measure(func, min_rounds, max_rounds, min_time):
+    """重复计时，直到至少 min_rounds 轮且总耗时达到 min_time (不超过 max_rounds 轮)。"""
+    func()  # 预热：载入星历文件、填充 lru_cache
+    times = []
+    gc.collect()
+    while len(times) < min_rounds or (sum(times) < min_time and len(times) < max_rounds):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return times
+
+def _peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(keywords=(), min_rounds=3, max_rounds=50, min_time=1.0, stream=sys.stdout):
+    qa.disable_cache()
+    results = {}
+    for name, setup in BENCHMARKS:
+        if keywords and not any(k in name for k in keywords):
+            continue
+        # 库函数自带的进度打印会干扰计时与输出，测量期间丢弃
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            func, items = setup()
+            times = _measure(func, min_rounds, max_rounds, min_time)
+            peak = _peak_memory(func)
+        median = statistics.median(times)
+        results[name] = {
+            'rounds': len(times),
+            'min_s': min(times),
+            'median_s': median,
+            'mean_s': statistics.fmean(times),
+            'items': items,
+            'throughput_per_s': items / median if median > 0 else float('inf'),
+            'peak_bytes': peak,
+        }
+        r = results[name]
+        print(f"{name:<45} {r['median_s'] * 1e3:>10.2f} ms  {r['throughput_per_s']:>12.1f} /s  "
+              f"{r['peak_bytes'] / 1024:>10.1f} KiB", file=stream)
+    return results
+
+def environment():
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quant_astro': qa.__version__,
+        'swisseph': swe.version,
+        'numpy': np.__version__,
+    }
+
+def compare(current, baseline, time_tolerance=0.10, memory_tolerance=0.10, stream=sys.stdout):
+    """
+    与基线比较中位耗时与峰值内存，超出容差即视为退化。
+    返回退化的基准名列表。
+    """
+    regressions = []
+    print(f"\n{'benchmark':<45} {'time':>10} {'memory':>10}", file=stream)
+    for name, r in current.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<45} {'(new)':>10}", file=stream)
+            continue
+        t_ratio = r['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        m_ratio = r['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else 1.0
+        slow = t_ratio > 1 + time_tolerance
+        heavy = m_ratio > 1 + memory_tolerance
+        flag = '  <-- regression' if (slow or heavy) else ''
+        print(f"{name:<45} {t_ratio:>9.2f}x {m_ratio:>9.2f}x{flag}", file=stream)
+        if slow or heavy:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='quant_astro 基准测试')
+    parser.add_argument('-k', dest='keywords', action='append', default=[], help='只运行名称包含该关键字的基准 (可重复)')
+    parser.add_argument('--min-rounds', type=int, default=3)
+    parser.add_argument('--max-rounds', type=int, default=50)
+    parser.add_argument('--min-time', type=float, default=1.0, help='每个基准至少累计计时的秒数')
+    parser.add_argument('--save', metavar='PATH', help='把结果保存为 JSON 基线')
+    parser.add_argument('--compare', metavar='PATH', help='与已保存的 JSON 基线比较')
+    parser.add_argument('--time-tolerance', type=float, default=0.10, help='耗时允许的相对增幅')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help='峰值内存允许的相对增幅')
+    parser.add_argument('--list', action='store_true', help='只列出基准名称')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return 0
+
+    results = run(args.keywords, args.min_rounds, args.max_rounds, args.min_time)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} 个基准出现退化。")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,18 +2,51 @@
 
 # 核心计算逻辑
 from .core import calculate_positions, decimal_to_dms, calculate_fixed_stars, get_sun_rise_and_lord, get_planetary_hour
+from .core import calculate_positions_numeric, parse_birth_columns, local_times_to_gregorian
+from .core import calculate_houses_batch, HOUSE_SYSTEMS
+from .zodiacs import calculate_positions_variants, variant_longitudes, ayanamsha_value
+from .sweep import calculate_positions_sweep
+from .calendars import julday_array, revjul_array, convert_calendar
+from .timezones import local_to_utc, local_to_jd_utc, utc_offsets
 from .attributes import get_attributes
 from .points import calculate_special_points
-from .kp import get_kp_lords, get_significators, get_ruling_planets
+from .kp import get_kp_lords, get_significators, get_ruling_planets, kp_lords_at
+from .vargas import varga_signs, get_vargas, VARGAS
 
 # <--- [新增] 导出相位计算
-from .aspects import calculate_aspects 
+from .aspects import calculate_aspects, calculate_transit_aspects, harmonic_angles
+from .harmonics import harmonic_longitudes, calculate_harmonic_aspects, harmonic_aspects_series
+
+# 事件搜索：留与逆行阴影期、朔望月相与日月食、五支历、回归、赤纬出界与平行
+from .stations import find_stations
+from .lunations import find_lunations, find_eclipses, lunar_calendar, phase_at
+from .panchanga import panchanga_at, panchanga_events
+from .returns import find_returns
+from .declinations import find_declination_events, iter_declination_events
+
+# 推运与向运
+from .progressions import calculate_progressions, calculate_directions, progressed_aspects
+
+# 中点结构
+from .midpoints import collect_bodies, calculate_midpoints, find_midpoint_hits, midpoint_hits_series
 
 # Dasha 运限系统
-from .dasha_Vimshottari_api import create_dasha_table
+from .dasha_Vimshottari_api import create_dasha_table, iter_dasha_rows, write_dasha_table, write_dasha_tables
+from .dasha_Vimshottari import seed_dasha_batch, label_dasha_index, DASHA_LORDS
 
 # [新增] 图表与HTML生成 (取代了原来的 display 和 kp_api)
-from .chart import generate_chart_html
+from .chart import generate_chart_html, build_chart_dict, render_charts, write_charts_json
+from .chart_svg import render_chart_svg, iter_chart_svgs, write_chart_svgs, solve_collisions
+
+# asyncio 接口 (执行器与批处理参数见 quant_astro.aio.configure)
+from .aio import (calculate_positions_async, calculate_positions_numeric_async, calculate_fixed_stars_async,
+                  get_sun_rise_and_lord_async, get_planetary_hour_async)
+
+# 可选的持久化缓存
+from .cache import enable_cache, disable_cache, clear_cache, cache_info
+
+# 可选的性能埋点
+from .instrument import enable_instrumentation, disable_instrumentation, reset_instrumentation, snapshot as instrumentation_snapshot
 
 # 定义包的版本信息 (建议升级版本号以标记架构变更)
 __version__ = "0.1.6"
\ No newline at end of file
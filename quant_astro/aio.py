@@ -0,0 +1,304 @@
+# quant_astro/aio.py
+
+import asyncio
+import copy
+import inspect
+import os
+import signal
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .cache import make_cache_key, bind_arguments
+
+# =============================================================================
+# asyncio 接口
+#
+# calculate_positions 等同步函数会阻塞事件循环。这里的 *_async 版本把计算交给执行器：
+#   · 'thread'  : 单个后台线程 (swisseph 的星历路径、岁差模式等按线程保存，本库的埋点计数等模块状态也未加锁，
+#                 因此固定只用一个线程)
+#   · 'process' : 进程池，每个进程各自持有一份 swisseph 状态，可真正并行
+# 同一事件循环中参数完全相同的并发请求只计算一次 (键与持久化缓存的规范化方式相同)；
+# 不同请求在 max_delay_ms 的时间窗内合并为一批，整批一次交给执行器，摊薄线程/进程切换与序列化开销；
+# 批内仍逐条调用同步函数 (并非向量化计算)，省下的是每条请求各自提交执行器的往返。
+# =============================================================================
+
+EXECUTOR_KINDS = ('thread', 'process')
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_DELAY_MS = 1.0
+
+_CONFIG = {
+    'executor': 'thread',
+    'max_workers': None,
+    'max_batch': DEFAULT_MAX_BATCH,
+    'max_delay_ms': DEFAULT_MAX_DELAY_MS,
+    'ephe_path': None,
+    'cache_path': None,
+}
+_EXECUTOR = None
+_OWNS_EXECUTOR = False
+
+# 批处理器与在途请求表都绑定在各自的事件循环上
+_BATCHERS = weakref.WeakKeyDictionary()
+_INFLIGHT = weakref.WeakKeyDictionary()
+
+
+# ----------------- 执行器 -----------------
+
+def init_worker(ephe_path=None, cache_path=None):
+    """
+    执行器 worker 的初始化：设置星历路径、按需启用缓存，并计算一张样例星盘，
+    让星历文件、KP 表等在接到第一个请求之前就已载入。
+    ephe_path 成为该 worker 的默认星历目录：之后未指定 ephe_path 的调用都使用它。
+    """
+    # 中断信号由主进程统一处理 (线程 worker 不在主线程，无法也无需设置)
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+    except ValueError:
+        pass
+    from . import core, kp
+    from .cache import enable_cache
+    if cache_path:
+        enable_cache(cache_path)
+    core._set_default_ephe_path(ephe_path)
+    core._ensure_ephe_path()
+    planets, houses = core.calculate_positions_numeric(2451545.0, 0.0, 0.0)[:2]
+    kp_planets, kp_houses = kp.get_kp_lords(planets, houses)
+    kp.get_significators(planets, houses, kp_planets, kp_houses)
+
+
+def worker_ephe_path():
+    """worker 当前使用的星历目录 (在执行器中调用，用于确认自定义星历在请求之后仍然生效)。"""
+    from . import core
+    return getattr(core._EPHE_STATE, 'path', None)
+
+
+def create_executor(kind='thread', max_workers=None, ephe_path=None, cache_path=None):
+    """
+    创建已预热的执行器。
+    kind='thread' 时只有一个线程 (见模块说明)；'process' 时为 max_workers 个进程 (默认 CPU 核数)。
+    """
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"executor 必须是 {EXECUTOR_KINDS} 之一或 concurrent.futures.Executor 实例，收到: {kind!r}")
+    if kind == 'thread':
+        executor = ThreadPoolExecutor(max_workers=1, initializer=init_worker, initargs=(ephe_path, cache_path))
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                       initializer=init_worker, initargs=(ephe_path, cache_path))
+    # 同时提交与 worker 数相同的空任务，确保每个 worker 都已启动并完成初始化
+    list(executor.map(time.sleep, [0.05] * executor._max_workers))
+    return executor
+
+
+def configure(executor='thread', max_workers=None, max_batch=DEFAULT_MAX_BATCH,
+              max_delay_ms=DEFAULT_MAX_DELAY_MS, ephe_path=None, cache_path=None):
+    """
+    设置 *_async 函数使用的执行器与批处理参数 (会关闭之前由本模块创建的执行器)。
+
+    executor     : 'thread' / 'process'，或自行创建的 Executor 实例
+                   (线程池须为单线程；进程池建议以 init_worker 作为 initializer)
+    max_workers  : 进程池大小，默认 CPU 核数
+    max_batch    : 每批最多合并的请求数
+    max_delay_ms : 合并请求的等待窗口 (毫秒)，为 0 时只合并同一轮事件循环中到达的请求
+    ephe_path / cache_path : 传给 init_worker
+    """
+    if isinstance(executor, ThreadPoolExecutor) and executor._max_workers != 1:
+        raise ValueError("线程池必须只有一个线程 (swisseph 与本库的模块状态不支持多线程并发)，需要并行请改用进程池")
+    if not isinstance(executor, Executor) and executor not in EXECUTOR_KINDS:
+        raise ValueError(f"executor 必须是 {EXECUTOR_KINDS} 之一或 concurrent.futures.Executor 实例，收到: {executor!r}")
+    if max_batch < 1:
+        raise ValueError(f"max_batch 必须为正整数，收到: {max_batch!r}")
+    shutdown()
+    _CONFIG.update(executor=executor, max_workers=max_workers, max_batch=max_batch,
+                   max_delay_ms=max_delay_ms, ephe_path=ephe_path, cache_path=cache_path)
+
+
+def get_executor():
+    """当前使用的执行器 (首次调用时按 configure 的设置创建)。"""
+    global _EXECUTOR, _OWNS_EXECUTOR
+    if _EXECUTOR is None:
+        if isinstance(_CONFIG['executor'], Executor):
+            _EXECUTOR, _OWNS_EXECUTOR = _CONFIG['executor'], False
+        else:
+            _EXECUTOR = create_executor(_CONFIG['executor'], _CONFIG['max_workers'],
+                                        _CONFIG['ephe_path'], _CONFIG['cache_path'])
+            _OWNS_EXECUTOR = True
+    return _EXECUTOR
+
+
+def shutdown(wait=True):
+    """关闭由本模块创建的执行器 (外部传入的执行器由调用方负责关闭)。"""
+    global _EXECUTOR, _OWNS_EXECUTOR
+    if _EXECUTOR is not None and _OWNS_EXECUTOR:
+        _EXECUTOR.shutdown(wait=wait)
+    _EXECUTOR, _OWNS_EXECUTOR = None, False
+    _BATCHERS.clear()
+    _INFLIGHT.clear()
+
+
+# ----------------- 微批 -----------------
+
+class MicroBatcher:
+    """
+    把同一分组 (如同一个函数、同一个 HTTP 端点) 的并发请求合并为批，交给执行器处理。
+
+    func(group, items) 在执行器中运行，返回与 items 等长的结果列表。
+    · 某分组的第一条请求到达后等待 max_delay_ms，或攒满 max_batch 条，该分组即可发出；
+    · 同时在途的批数不超过 slots (默认为执行器的 worker 数)：worker 都忙时请求继续累积，
+      有 worker 空闲时再按就绪顺序发出，负载越高批越大。
+    """
+
+    def __init__(self, executor, func, max_batch=DEFAULT_MAX_BATCH, max_delay_ms=DEFAULT_MAX_DELAY_MS, slots=None):
+        self.executor = executor
+        self.func = func
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self.slots = slots or getattr(executor, '_max_workers', 1)
+        self._pending = {}
+        self._timers = {}
+        self._ready = {}   # 已可发出的分组 (dict 保持就绪顺序)
+        self._inflight = 0
+        self.requests = 0
+        self.batches = 0
+
+    def submit(self, group, item):
+        """提交一条请求，返回在结果就绪时完成的 asyncio.Future。"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(group, [])
+        pending.append((item, future))
+        self.requests += 1
+        if len(pending) >= self.max_batch:
+            self._mark_ready(group)
+        elif group not in self._timers and group not in self._ready:
+            self._timers[group] = loop.call_later(self.max_delay, self._mark_ready, group)
+        return future
+
+    def _mark_ready(self, group):
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        self._ready[group] = None
+        self._dispatch()
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._ready and self._inflight < self.slots:
+            group = next(iter(self._ready))
+            del self._ready[group]
+            pending = self._pending.pop(group, [])
+            batch, rest = pending[:self.max_batch], pending[self.max_batch:]
+            if rest:
+                # 超出一批的部分保持就绪，排到队尾等待下一个空闲 worker
+                self._pending[group] = rest
+                self._ready[group] = None
+            if not batch:
+                continue
+            self._inflight += 1
+            self.batches += 1
+            task = loop.run_in_executor(self.executor, self.func, group, [item for item, _ in batch])
+            task.add_done_callback(lambda done, batch=batch: self._complete(batch, done))
+
+    def _complete(self, batch, done):
+        self._inflight -= 1
+        exc = None if done.cancelled() else done.exception()
+        for k, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if done.cancelled():
+                future.cancel()
+            elif exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(done.result()[k])
+        self._dispatch()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'max_batch': self.max_batch,
+            'max_delay_ms': self.max_delay * 1000.0,
+            'slots': self.slots,
+            'inflight': self._inflight,
+            'queued': sum(len(p) for p in self._pending.values()),
+        }
+
+
+# ----------------- 执行器端的批处理 -----------------
+
+def _run_calls(name, calls):
+    """
+    在执行器中按顺序逐条执行同一个 core 函数的一批调用 (一次执行器往返，批内不做向量化)。
+    返回 [(是否成功, 结果或异常)]，单条失败不影响同批其他调用。
+    """
+    from . import core
+    func = getattr(core, name)
+    results = []
+    for args, kwargs in calls:
+        try:
+            results.append((True, func(*args, **kwargs)))
+        except Exception as exc:
+            results.append((False, exc))
+    return results
+
+
+def _batcher():
+    loop = asyncio.get_running_loop()
+    batcher = _BATCHERS.get(loop)
+    if batcher is None:
+        batcher = MicroBatcher(get_executor(), _run_calls, _CONFIG['max_batch'], _CONFIG['max_delay_ms'])
+        _BATCHERS[loop] = batcher
+    return batcher
+
+
+async def _call(name, signature, args, kwargs):
+    loop = asyncio.get_running_loop()
+    inflight = _INFLIGHT.setdefault(loop, {})
+    key = make_cache_key(f'aio.{name}', bind_arguments(signature, args, kwargs))
+
+    future = inflight.get(key)
+    owner = future is None
+    if owner:
+        future = _batcher().submit(name, (args, kwargs))
+        inflight[key] = future
+        future.add_done_callback(lambda _: inflight.pop(key, None))
+
+    # shield：某个等待者被取消时，不影响共享同一计算的其他等待者
+    ok, value = await asyncio.shield(future)
+    if not ok:
+        raise value
+    # 合并的请求各自拿到独立的副本，调用方修改结果不会互相影响
+    return value if owner else copy.deepcopy(value)
+
+
+def _async_version(name):
+    from . import core
+    func = getattr(core, name)
+    signature = inspect.signature(func)
+
+    async def wrapper(*args, **kwargs):
+        return await _call(name, signature, args, kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = f'{name}_async'
+    wrapper.__doc__ = (f"{name} 的异步版本：在执行器中计算，参数与返回值与同步版本相同。\n"
+                       f"并发的相同请求只计算一次，时间窗内的请求合并为一批提交。")
+    wrapper.__signature__ = signature
+    return wrapper
+
+
+calculate_positions_async = _async_version('calculate_positions')
+calculate_positions_numeric_async = _async_version('calculate_positions_numeric')
+calculate_fixed_stars_async = _async_version('calculate_fixed_stars')
+get_sun_rise_and_lord_async = _async_version('get_sun_rise_and_lord')
+get_planetary_hour_async = _async_version('get_planetary_hour')
+
+
+def stats():
+    """当前事件循环中批处理器的统计 (请求数、批数、平均批大小等)；未使用过时返回 None。"""
+    try:
+        batcher = _BATCHERS.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+    return batcher.stats() if batcher is not None else None
@@ -2,6 +2,10 @@
 
 import math
 import re
+import numpy as np
+import pandas as pd
+from . import instrument
+from .instrument import instrumented
 
 # ----------------- 工具函数 -----------------
 
@@ -73,13 +77,35 @@ def parse_orb_config(config_str):
                 
     return orbs
 
+def harmonic_angles(harmonic, primary_only=True):
+    """
+    第 n 谐波的相位角：360k/n (0 < 360k/n ≤ 180)。
+    primary_only=True 时只保留 gcd(k, n) = 1 的角 (即不属于更低谐波的角，如 H9 不含 120°)。
+    第 1 谐波只有 360° 即合相，返回 [0.0]。
+    """
+    n = int(harmonic)
+    if n != harmonic or n < 1:
+        raise ValueError(f"谐波必须是正整数，收到: {harmonic!r}")
+    if n == 1:
+        return [0.0]
+    return [360.0 * k / n for k in range(1, n // 2 + 1) if not primary_only or math.gcd(k, n) == 1]
+
 def parse_aspect_types(type_list):
     """
-    解析相位类型列表，例如 ["0°☌", "90°□"]
+    解析相位类型列表，例如 ["0°☌", "90°□", "H5", "H7 S"]
     返回列表: [{'angle': 0.0, 'symbol': '☌'}, ...]
+
+    "Hn [符号]" 展开为第 n 谐波的全部相位角 (见 harmonic_angles)，符号缺省为 "Hn"，
+    如 "H1" -> 0° (合相)，"H5" -> 72° 与 144°，"H7" -> 51.43°、102.86°、154.29°。
     """
     aspects = []
     for item in type_list:
+        harmonic = re.match(r'\s*[Hh](\d+)\s*(.*)', item)
+        if harmonic:
+            n = int(harmonic.group(1))
+            symbol = harmonic.group(2).strip() or f"H{n}"
+            aspects.extend({'angle': angle, 'symbol': symbol} for angle in harmonic_angles(n))
+            continue
         # 提取前面的数字部分作为角度，剩下的作为符号
         match = re.match(r'([\d.]+)\s*[°]?\s*(.*)', item)
         if match:
@@ -166,6 +192,65 @@ def is_applying_dec(p1_data, p2_data, is_contra):
 
 # ----------------- 核心计算逻辑 -----------------
 
+def _orb_pair_records(b1, b2, limit, custom_aspects, dec_settings):
+    """
+    容许度模式下一对星体 (行星或宫头) 的全部命中记录。
+    dec_settings 为 (dec_orb, parallel_sym, contra_sym)，为 None 时不计算赤纬平行。
+    """
+    records = []
+    # 计算实际角度差
+    dist = get_shortest_distance(b1['data']['lon'], b2['data']['lon'])
+
+    # 检查所有自定义相位类型
+    for asp in custom_aspects:
+        target = asp['angle']
+        diff = abs(dist - target)
+
+        if diff <= limit:
+            # 形成相位
+            is_app = is_applying(b1['data'], b2['data'], target)
+
+            records.append({
+                'p1': b1['name'],
+                'p2': b2['name'],
+                'type': asp['symbol'],
+                'angle_def': target, # 定义的角度
+                'actual_dist': round(dist, 10), # 实际度数
+                'orb': round(diff, 10), # 误差
+                'state': is_app
+            })
+
+    # ================= [新增] 赤纬平行/反平行计算 =================
+    if dec_settings is not None:
+        dec_orb, parallel_sym, contra_sym = dec_settings
+        dec1 = b1['data'].get('dec', 0)
+        dec2 = b2['data'].get('dec', 0)
+
+        # 1. 判断同纬(平行)还是异纬(反平行)
+        is_same_hemisphere = (dec1 * dec2) >= 0
+
+        # 2. 无论南北，只看绝对值的差异
+        dec_diff = abs(abs(dec1) - abs(dec2))
+
+        if dec_diff <= dec_orb:
+            is_contra = not is_same_hemisphere
+            sym = contra_sym if is_contra else parallel_sym
+            state = is_applying_dec(b1['data'], b2['data'], is_contra)
+
+            records.append({
+                'p1': b1['name'],
+                'p2': b2['name'],
+                'type': sym,
+                'angle_def': 0.0, # 赤纬没有基准角度，只用 0 代表绝对平行
+                'actual_dist': round(dec_diff, 10),
+                'orb': round(dec_diff, 10),
+                'state': state
+            })
+    # =============================================================
+    return records
+
+
+@instrumented('calculate_aspects')
 def calculate_aspects(planet_pos, house_pos, aspect_config):
     """
     核心相位计算函数
@@ -178,10 +263,12 @@ def calculate_aspects(planet_pos, house_pos, aspect_config):
     results = {}
     
     # 提取配置
+    _t = instrument.start()
     modes = aspect_config.get('modes', [])
     orb_settings = parse_orb_config(aspect_config.get('orb_config_str', ''))
     active_houses = aspect_config.get('active_houses', []) # list of ints
     custom_aspects = parse_aspect_types(aspect_config.get('aspect_types', []))
+    instrument.stop('calculate_aspects.parse_config', _t)
     
     # [新增] 提取赤纬相位配置
     dec_config = aspect_config.get('declination', {})
@@ -189,6 +276,7 @@ def calculate_aspects(planet_pos, house_pos, aspect_config):
     dec_orb = dec_config.get('orb', 1.2)
     parallel_sym = dec_config.get('parallel_sym', '∥')
     contra_sym = dec_config.get('contra_sym', '∦')
+    dec_settings = (dec_orb, parallel_sym, contra_sym) if enable_dec else None
     
     # 准备参与计算的实体列表
     # 注意：输入到这里的 planet_pos 已经是过滤过的了
@@ -228,55 +316,7 @@ def calculate_aspects(planet_pos, house_pos, aspect_config):
                 
                 # 判罚标准：平均值
                 limit = (orb1 + orb2) / 2.0
-                
-                # 计算实际角度差
-                dist = get_shortest_distance(b1['data']['lon'], b2['data']['lon'])
-                
-                # 检查所有自定义相位类型
-                for asp in custom_aspects:
-                    target = asp['angle']
-                    diff = abs(dist - target)
-                    
-                    if diff <= limit:
-                        # 形成相位
-                        is_app = is_applying(b1['data'], b2['data'], target)
-                        
-                        orb_results.append({
-                            'p1': b1['name'],
-                            'p2': b2['name'],
-                            'type': asp['symbol'],
-                            'angle_def': target, # 定义的角度
-                            'actual_dist': round(dist, 10), # 实际度数
-                            'orb': round(diff, 10), # 误差
-                            'state': is_app
-                        })
-
-                # ================= [新增] 赤纬平行/反平行计算 =================
-                if enable_dec:
-                    dec1 = b1['data'].get('dec', 0)
-                    dec2 = b2['data'].get('dec', 0)
-                    
-                    # 1. 判断同纬(平行)还是异纬(反平行)
-                    is_same_hemisphere = (dec1 * dec2) >= 0
-                    
-                    # 2. 无论南北，只看绝对值的差异
-                    dec_diff = abs(abs(dec1) - abs(dec2)) 
-                    
-                    if dec_diff <= dec_orb:
-                        is_contra = not is_same_hemisphere
-                        sym = contra_sym if is_contra else parallel_sym
-                        state = is_applying_dec(b1['data'], b2['data'], is_contra)
-                        
-                        orb_results.append({
-                            'p1': b1['name'],
-                            'p2': b2['name'],
-                            'type': sym,
-                            'angle_def': 0.0, # 赤纬没有基准角度，只用 0 代表绝对平行
-                            'actual_dist': round(dec_diff, 10), 
-                            'orb': round(dec_diff, 10), 
-                            'state': state
-                        })
-                # =============================================================
+                orb_results.extend(_orb_pair_records(b1, b2, limit, custom_aspects, dec_settings))
         results['orb_mode'] = orb_results
 
     # --- 2. 整宫制模式 (Whole Sign) ---
@@ -404,4 +444,112 @@ def calculate_aspects(planet_pos, house_pos, aspect_config):
                     
         results['vedic_mode'] = vedic_results
 
-    return results
\ No newline at end of file
+    return results
+
+# ----------------- 行运对本命 (Transit-to-Natal) 批量计算 -----------------
+
+@instrumented('calculate_transit_aspects')
+def calculate_transit_aspects(transit_lon, natal_lon, aspect_config,
+                              transit_names, natal_names,
+                              transit_speed=None, max_block_cells=4_000_000):
+    """
+    计算 T 个行运时刻 × N 张本命盘之间的全部容许度相位，返回稀疏记录。
+
+    :param transit_lon:     T×P 行运黄经数组 (度)
+    :param natal_lon:       N×Q 本命黄经数组 (度)，缺失的星体可填 NaN
+    :param aspect_config:   与 calculate_aspects 相同的配置字典，使用 orb_config_str 与 aspect_types
+    :param transit_names:   长度 P 的行运星体名列表，用于在 orb_config_str 中查容许度
+    :param natal_names:     长度 Q 的本命星体名列表
+    :param transit_speed:   T×P 行运黄经日速度，用于判断入/出相位 (本命视为静止)；不传则 applying 全为 False
+    :param max_block_cells: 每块参与计算的 (t, n, p, q) 组合上限，控制峰值内存
+    :return: DataFrame，每行一个命中，列为
+             t, n, p, q (各维索引), aspect (aspect_types 解析结果中的索引),
+             type (相位符号), angle_def, orb, applying (True=入相位)
+
+    容许度判罚与 calculate_aspects 的 orb 模式一致：取两者 orb 设置的平均值。
+    """
+    transit_lon = np.atleast_2d(np.asarray(transit_lon, dtype='float64')) % 360.0
+    natal_lon = np.atleast_2d(np.asarray(natal_lon, dtype='float64')) % 360.0
+    T, P = transit_lon.shape
+    N, Q = natal_lon.shape
+    if len(transit_names) != P or len(natal_names) != Q:
+        raise ValueError("transit_names / natal_names 的长度必须与经度数组的列数一致。")
+    if transit_speed is not None:
+        transit_speed = np.atleast_2d(np.asarray(transit_speed, dtype='float64'))
+
+    orb_settings = parse_orb_config(aspect_config.get('orb_config_str', ''))
+    custom_aspects = parse_aspect_types(aspect_config.get('aspect_types', []))
+    symbols = [asp['symbol'] for asp in custom_aspects]
+
+    # P×Q 容许度矩阵 (平均值)
+    transit_orbs = np.array([orb_settings.get(name, 0.0) for name in transit_names])
+    natal_orbs = np.array([orb_settings.get(name, 0.0) for name in natal_names])
+    limit = (transit_orbs[:, None] + natal_orbs[None, :]) / 2.0
+
+    # 分块：优先整块处理本命维度，单个时刻都放不下时再切本命
+    cells_per_natal = max(P * Q, 1)
+    block_n = min(N, max(1, max_block_cells // cells_per_natal))
+    block_t = max(1, max_block_cells // (block_n * cells_per_natal))
+
+    columns = {k: [] for k in ('t', 'n', 'p', 'q', 'aspect', 'orb', 'applying')}
+
+    for t0 in range(0, T, block_t):
+        t1 = min(t0 + block_t, T)
+        for n0 in range(0, N, block_n):
+            n1 = min(n0 + block_n, N)
+
+            # (t, n, p, q) 四维块：原始差值 delta ∈ (-360, 360)，最短角距 = min(|delta|, 360 - |delta|)
+            # 全部原地运算，避免对整块做取模
+            delta = transit_lon[t0:t1, None, :, None] - natal_lon[None, n0:n1, None, :]
+            dist = np.abs(delta)
+            buf = np.subtract(360.0, dist)
+            np.minimum(dist, buf, out=dist)
+            mask = np.empty(dist.shape, dtype=bool)
+
+            hits = []
+            for a_idx, asp in enumerate(custom_aspects):
+                np.subtract(dist, asp['angle'], out=buf)
+                np.abs(buf, out=buf)
+                np.less_equal(buf, limit, out=mask)
+                # 先取一维索引，命中后再展开，比多维 nonzero / 多维花式索引快得多
+                flat = np.flatnonzero(mask)
+                if len(flat) == 0:
+                    continue
+                e = dist.ravel()[flat] - asp['angle']
+                if transit_speed is not None:
+                    # 带符号角距 (-180, 180] 的符号：|delta| 超过 180 时方向反转
+                    d = delta.ravel()[flat]
+                    direction = np.where(np.abs(d) > 180.0, -np.sign(d), np.sign(d))
+                    # |dist - angle| 的时间导数 = sign(err) × direction × 行运速度，小于 0 即入相位
+                    ti, _, pi, _ = np.unravel_index(flat, mask.shape)
+                    v = transit_speed[t0 + ti, pi]
+                    applying = (np.sign(e) * direction * v) < 0
+                else:
+                    applying = np.zeros(len(flat), dtype=bool)
+                hits.append((flat, np.full(len(flat), a_idx), np.abs(e), applying))
+
+            if not hits:
+                continue
+            # 一维索引本身就是 (t, n, p, q) 的字典序，稳定排序即可合并各相位的结果
+            flat, aspect_idx, orb, applying = [np.concatenate(parts) for parts in zip(*hits)]
+            order = np.argsort(flat, kind='stable')
+            ti, ni, pi, qi = np.unravel_index(flat[order], mask.shape)
+            for key, arr in zip(columns, (ti + t0, ni + n0, pi, qi, aspect_idx[order], orb[order], applying[order])):
+                columns[key].append(arr)
+
+    dtypes = {'t': 'int64', 'n': 'int64', 'p': 'int32', 'q': 'int32', 'aspect': 'int16', 'orb': 'float64', 'applying': 'bool'}
+    data = {
+        key: (np.concatenate(parts) if parts else np.empty(0)).astype(dtypes[key])
+        for key, parts in columns.items()
+    }
+    df = pd.DataFrame(data)
+
+    # 相位符号用 Categorical 表示，避免逐行 Python 字符串
+    categories = list(dict.fromkeys(symbols))
+    symbol_codes = np.array([categories.index(sym) for sym in symbols] or [0], dtype='int16')
+    angles = np.array([asp['angle'] for asp in custom_aspects] or [0.0])
+    aspect_idx = df['aspect'].to_numpy()
+    df.insert(5, 'type', pd.Categorical.from_codes(symbol_codes[aspect_idx], categories=categories))
+    df.insert(6, 'angle_def', angles[aspect_idx])
+    instrument.add_rows('calculate_transit_aspects', len(df))
+    return df
@@ -4,6 +4,8 @@ import swisseph as swe
 
 # 从 core.py 借入这两个函数，这样 __init__.py 不需要改动
 from .core import get_sun_rise_and_lord, get_planetary_hour
+from .cache import cached
+from .instrument import instrumented
 
 # --- 常量定义 ---
 ZODIAC_NAMES = ['Ari', 'Tau', 'Gem', 'Cnc', 'Leo', 'Vir', 'Lib', 'Sco', 'Sag', 'Cap', 'Aqr', 'Pis']
@@ -252,6 +254,8 @@ def get_lon_speed(body, planet_positions, house_positions, temp_lots=None):
 # 主入口函数
 # =============================================================================
 
+@instrumented('get_attributes')
+@cached('get_attributes')
 def get_attributes(
     planet_positions,
     house_positions,
@@ -0,0 +1,255 @@
+# quant_astro/cache.py
+
+import sqlite3
+import pickle
+import hashlib
+import json
+import os
+import time
+import inspect
+import threading
+import functools
+from functools import lru_cache
+
+import numpy as np
+import swisseph as swe
+
+from . import instrument
+
+# =============================================================================
+# 持久化星盘缓存 (默认关闭，需显式调用 enable_cache 或设置环境变量)
+#
+# · 键 = 规范化后的输入参数 + 库版本 + 缓存格式版本 + 星历文件指纹 的 SHA-256
+# · 存储 = 本地 SQLite (WAL 模式)，多进程并发读写安全
+# · 容量 = 按最近访问时间淘汰，总大小不超过 max_bytes
+# =============================================================================
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'quant_astro', 'charts.sqlite')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 设置此环境变量 (缓存文件路径) 后，每个导入本库的进程都会自动启用缓存，方便多进程 worker
+CACHE_ENV_VAR = 'QUANT_ASTRO_CACHE'
+
+# 缓存格式版本：任何 @cached 函数的返回值 (字段、精度、顺序等) 发生变化时加一，
+# 升级后旧缓存文件中的结果自然失效，不必等库版本号变化
+CACHE_SCHEMA_VERSION = 2
+
+_STORE = None
+
+
+class ChartCache:
+    """
+    基于 SQLite 的内容寻址缓存。
+    每个进程/线程持有自己的连接；写入冲突由 SQLite 的文件锁与 busy_timeout 处理。
+    """
+
+    # 命中时若距上次访问超过该秒数才回写访问时间，避免热读变成写事务
+    TOUCH_INTERVAL = 60.0
+    # 每写入多少条检查一次容量
+    EVICT_EVERY = 64
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = os.path.abspath(path)
+        self.max_bytes = int(max_bytes)
+        self._local = threading.local()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._evict()
+
+    def _conn(self):
+        # 连接按线程保存，并在 fork 之后的子进程中重新建立
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+                ' size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """返回 (是否命中, 值)。"""
+        row = self._conn().execute(
+            'SELECT value, last_access FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None
+        now = time.time()
+        if now - row[1] > self.TOUCH_INTERVAL:
+            self._conn().execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return True, pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        self._conn().execute(
+            'INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)',
+            (key, sqlite3.Binary(blob), len(blob), time.time())
+        )
+        self._puts += 1
+        if self._puts % self.EVICT_EVERY == 0:
+            self._evict()
+
+    def _evict(self):
+        """总大小超过上限时，按最近访问时间从旧到新删除，直到降到上限的 90%。"""
+        conn = self._conn()
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall():
+            if total <= target:
+                break
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+
+    def clear(self):
+        self._conn().execute('DELETE FROM entries')
+
+    def info(self):
+        count, total = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+        ).fetchone()
+        return {
+            'path': self.path, 'entries': count, 'bytes': total, 'max_bytes': self.max_bytes,
+            'hits': self.hits, 'misses': self.misses,
+        }
+
+
+# ----------------- 开关 -----------------
+
+def enable_cache(path=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    启用持久化缓存。
+    之后 calculate_positions / calculate_fixed_stars / get_kp_lords / get_attributes
+    对相同输入直接从磁盘读取结果。
+    """
+    global _STORE
+    _STORE = ChartCache(path or DEFAULT_CACHE_PATH, max_bytes)
+    return _STORE
+
+def disable_cache():
+    """关闭缓存 (不删除磁盘文件)。"""
+    global _STORE
+    _STORE = None
+
+def clear_cache():
+    """清空当前缓存中的所有条目。"""
+    if _STORE is not None:
+        _STORE.clear()
+
+def cache_info():
+    """返回当前缓存的统计信息；未启用时返回 None。"""
+    return _STORE.info() if _STORE is not None else None
+
+
+# ----------------- 键的规范化 -----------------
+
+def _canonical(obj):
+    """把参数转换为稳定的 JSON 结构。字典保留插入顺序，因为结果字典的顺序依赖于它。"""
+    if isinstance(obj, dict):
+        return {'__dict__': [[str(k), _canonical(v)] for k, v in obj.items()]}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return {'__array__': [str(obj.dtype), list(obj.shape), hashlib.sha256(np.ascontiguousarray(obj).tobytes()).hexdigest()]}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    return repr(obj)
+
+@lru_cache(maxsize=None)
+def _ephemeris_fingerprint(ephe_path):
+    """星历目录中文件名、大小与修改时间的指纹，文件更新后旧缓存自动失效。"""
+    entries = []
+    if ephe_path and os.path.isdir(ephe_path):
+        for name in sorted(os.listdir(ephe_path)):
+            st = os.stat(os.path.join(ephe_path, name))
+            entries.append([name, st.st_size, st.st_mtime_ns])
+    return hashlib.sha256(json.dumps([swe.version, entries]).encode('utf-8')).hexdigest()
+
+def _library_version():
+    from . import __version__
+    return __version__
+
+def make_cache_key(namespace, arguments):
+    """由命名空间与规范化参数生成缓存键。"""
+    from .core import _default_ephe_path
+    # 未提供 ephe_path 时按实际使用的目录 (含 worker 的自定义默认目录) 取指纹
+    ephe_path = arguments.get('ephe_path') or _default_ephe_path()
+    payload = [
+        namespace,
+        _library_version(),
+        CACHE_SCHEMA_VERSION,
+        _ephemeris_fingerprint(ephe_path),
+        sorted([name, _canonical(value)] for name, value in arguments.items()),
+    ]
+    text = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def bind_arguments(signature, args, kwargs):
+    """按函数签名把实参整理为 {参数名: 值} (含默认值，**kwargs 展开)，作为 make_cache_key 的输入。"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {}
+    for name, value in bound.arguments.items():
+        if signature.parameters[name].kind is inspect.Parameter.VAR_KEYWORD:
+            arguments.update(value)   # **kwargs 展开，与显式传参等价
+        else:
+            arguments[name] = value
+    return arguments
+
+
+# ----------------- 装饰器 -----------------
+
+def cached(namespace):
+    """
+    给计算函数加上可选的持久化缓存。
+    未启用缓存时只多一次全局变量判断；缓存读写出错时退回直接计算。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = _STORE
+            if store is None:
+                return func(*args, **kwargs)
+
+            key = make_cache_key(namespace, bind_arguments(signature, args, kwargs))
+
+            try:
+                hit, value = store.get(key)
+            except sqlite3.Error:
+                return func(*args, **kwargs)
+            instrument.record_cache(namespace, hit)
+            if hit:
+                return value
+
+            result = func(*args, **kwargs)
+            try:
+                store.put(key, result)
+            except (sqlite3.Error, pickle.PicklingError, TypeError):
+                pass
+            return result
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+if os.environ.get(CACHE_ENV_VAR):
+    enable_cache(os.environ[CACHE_ENV_VAR])
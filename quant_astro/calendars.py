@@ -0,0 +1,117 @@
+# quant_astro/calendars.py
+
+import numpy as np
+
+# =============================================================================
+# 向量化历法换算：儒略历 ↔ 格里历 ↔ 儒略日 (JD)
+#
+# 日期部分一律走整数儒略日数 (JDN)，日内时间以整数微秒保存，
+# 因此历法互换是精确的，不经过浮点小时的往返。
+# calendar 参数可为 'g'/'j'，或与输入等长的 'g'/'j' 数组 (逐行指定)。
+# =============================================================================
+
+# 1970-01-01 (格里历) 的儒略日数，用于与 numpy.datetime64 互转
+UNIX_EPOCH_JDN = 2440588
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+
+def _is_gregorian(calendar):
+    return np.char.lower(np.asarray(calendar, dtype=str)) == 'g'
+
+
+def ymd_to_jdn(year, month, day, calendar='g'):
+    """
+    年月日 -> 儒略日数 (整数，当天正午对应的 JD)。
+    采用 Fliegel–Van Flandern 整数算法，支持负年份 (天文纪年)。
+    """
+    year = np.asarray(year, dtype='int64')
+    month = np.asarray(month, dtype='int64')
+    day = np.asarray(day, dtype='int64')
+
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12 * a - 3
+    # 先得到儒略历下的结果，格里历在此基础上加上世纪闰年修正
+    jdn = day + (153 * m + 2) // 5 + 365 * y + y // 4 - 32083
+    return np.where(_is_gregorian(calendar), jdn - y // 100 + y // 400 + 38, jdn)
+
+
+def jdn_to_ymd(jdn, calendar='g'):
+    """儒略日数 -> (年, 月, 日) 整数数组。"""
+    jdn = np.asarray(jdn, dtype='int64')
+    is_greg = _is_gregorian(calendar)
+
+    # 格里历先把世纪周期折算掉，之后与儒略历共用同一套四年周期公式
+    a = jdn + 32044
+    b = (4 * a + 3) // 146097
+    c_greg = a - 146097 * b // 4
+    c = np.where(is_greg, c_greg, jdn + 32082)
+    century = np.where(is_greg, 100 * b, 0)
+
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+    day = e - (153 * m + 2) // 5 + 1
+    month = m + 3 - 12 * (m // 10)
+    year = century + d - 4800 + m // 10
+    return year, month, day
+
+
+def julday_array(year, month, day, hour=0.0, calendar='g'):
+    """向量化的 swe.julday：返回浮点儒略日。"""
+    jdn = ymd_to_jdn(year, month, day, calendar)
+    return jdn - 0.5 + np.asarray(hour, dtype='float64') / 24.0
+
+
+def revjul_array(jd, calendar='g'):
+    """
+    向量化的 swe.revjul，时间拆到微秒 (四舍五入)。
+    返回 (year, month, day, hour, minute, second, microsecond) 整数数组。
+    """
+    jd = np.asarray(jd, dtype='float64') + 0.5
+    jdn = np.floor(jd).astype('int64')
+    tod_us = np.round((jd - jdn) * MICROSECONDS_PER_DAY).astype('int64')
+    # 舍入到整天时进位
+    carry = tod_us >= MICROSECONDS_PER_DAY
+    jdn = jdn + carry
+    tod_us = np.where(carry, tod_us - MICROSECONDS_PER_DAY, tod_us)
+
+    year, month, day = jdn_to_ymd(jdn, calendar)
+    seconds, microsecond = np.divmod(tod_us, 1_000_000)
+    minutes, second = np.divmod(seconds, 60)
+    hour, minute = np.divmod(minutes, 60)
+    return year, month, day, hour, minute, second, microsecond
+
+
+def convert_calendar(year, month, day, from_calendar='j', to_calendar='g'):
+    """
+    精确的历法互换 (仅日期部分，日内时间不变)。
+    例如 convert_calendar(1582, 10, 4, 'j', 'g') -> (1582, 10, 14)。
+    """
+    return jdn_to_ymd(ymd_to_jdn(year, month, day, from_calendar), to_calendar)
+
+
+def fields_to_datetime64(year, month, day, hour=0, minute=0, second=0, microsecond=0, calendar='g'):
+    """
+    日期时间字段 -> numpy.datetime64[us] (numpy 使用外推格里历)，精确到微秒。
+    儒略历输入会先换算为对应的格里历时刻。
+    """
+    days = ymd_to_jdn(year, month, day, calendar) - UNIX_EPOCH_JDN
+    tod_us = ((np.asarray(hour, dtype='int64') * 60 + np.asarray(minute, dtype='int64')) * 60
+              + np.asarray(second, dtype='int64')) * 1_000_000 + np.asarray(microsecond, dtype='int64')
+    return (days * MICROSECONDS_PER_DAY + tod_us).astype('datetime64[us]')
+
+
+def datetime64_to_jd(values):
+    """numpy.datetime64 (视为 UTC) -> 浮点儒略日。"""
+    us = np.asarray(values).astype('datetime64[us]').astype('int64')
+    days, tod_us = np.divmod(us, MICROSECONDS_PER_DAY)
+    return (days + UNIX_EPOCH_JDN - 0.5) + tod_us / MICROSECONDS_PER_DAY
+
+
+def jd_to_datetime64(jd):
+    """浮点儒略日 -> numpy.datetime64[us] (UTC)，四舍五入到微秒。"""
+    jd = np.asarray(jd, dtype='float64') + 0.5
+    jdn = np.floor(jd).astype('int64')
+    tod_us = np.round((jd - jdn) * MICROSECONDS_PER_DAY).astype('int64')
+    return ((jdn - UNIX_EPOCH_JDN) * MICROSECONDS_PER_DAY + tod_us).astype('datetime64[us]')
@@ -1,8 +1,14 @@
 # quant_astro/chart.py
 
+import html
 import json
 import os
+import tempfile
+from contextlib import contextmanager
+import pkg_resources
 from .core import decimal_to_dms
+from . import instrument
+from .instrument import instrumented
 
 def _decimal_to_zodiac_parts(lon):
     """
@@ -23,25 +29,19 @@ def _decimal_to_zodiac_parts(lon):
         'abs_lon': lon
     }
 
-def generate_chart_html(planet_pos, house_pos, 
-                        # 新增参数接收你的字典数据
-                        chart_info=None,        # 接收 chart_name, birth_config, options 的合并字典
-                        kp_planet_results=None, # 接收 kp_planet_results
-                        kp_house_results=None,  # 接收 kp_house_results
-                        kp_planet_sigs=None,    # 接收 kp_planet_sigs
-                        kp_house_sigs=None,     # 接收 kp_house_sigs
-                        kp_ruling_planets=None, # 接收 kp_ruling_planets
-
-                        # === 新增参数 ===
-                        aspect_results=None,     # 接收 aspects.py 的计算结果
-                        aspect_config=None,      # 接收相位配置 (含 active_houses)
-                        calculation_options=None,# 接收计算配置 (含 selected_planets)
-
-
-                        output_filename="astro_chart_final.html"):
+def build_chart_dict(planet_pos, house_pos,
+                     chart_info=None,
+                     kp_planet_results=None,
+                     kp_house_results=None,
+                     kp_planet_sigs=None,
+                     kp_house_sigs=None,
+                     kp_ruling_planets=None,
+                     aspect_results=None,
+                     aspect_config=None,
+                     calculation_options=None):
     """
-    生成 HTML，纯 UI 渲染。
-    已更新：支持详细的 KP 各种表格数据传入
+    把计算结果转换为前端 (astro_style_config.js) 使用的 CHART_DATA 字典。
+    参数与 generate_chart_html 相同；单张与批量渲染共用这一步。
     """
     
     # 1. 转换数据为前端格式
@@ -151,6 +151,35 @@ def generate_chart_html(planet_pos, house_pos,
         # 排序宫位
         chart_dict['kp_data']['houses'].sort(key=lambda x: x['sort_id'])
 
+    return chart_dict
+
+def generate_chart_html(planet_pos, house_pos, 
+                        # 新增参数接收你的字典数据
+                        chart_info=None,        # 接收 chart_name, birth_config, options 的合并字典
+                        kp_planet_results=None, # 接收 kp_planet_results
+                        kp_house_results=None,  # 接收 kp_house_results
+                        kp_planet_sigs=None,    # 接收 kp_planet_sigs
+                        kp_house_sigs=None,     # 接收 kp_house_sigs
+                        kp_ruling_planets=None, # 接收 kp_ruling_planets
+
+                        # === 新增参数 ===
+                        aspect_results=None,     # 接收 aspects.py 的计算结果
+                        aspect_config=None,      # 接收相位配置 (含 active_houses)
+                        calculation_options=None,# 接收计算配置 (含 selected_planets)
+
+
+                        output_filename="astro_chart_final.html"):
+    """
+    生成 HTML，纯 UI 渲染。
+    已更新：支持详细的 KP 各种表格数据传入
+    """
+    
+    chart_dict = build_chart_dict(
+        planet_pos, house_pos, chart_info,
+        kp_planet_results, kp_house_results, kp_planet_sigs, kp_house_sigs, kp_ruling_planets,
+        aspect_results, aspect_config, calculation_options
+    )
+
     json_output = json.dumps(chart_dict, indent=2)
 
     # 3. 定义资源绝对路径
@@ -252,4 +281,326 @@ window.onload = function() {{
         f.write(html_content)
 
     print(f"✅ HTML生成完毕: {output_filename}")
-    print(f"🔗 关联配置: {base_path}/astro_style_config.js")
\ No newline at end of file
+    print(f"🔗 关联配置: {base_path}/astro_style_config.js")
+
+# =============================================================================
+# 批量渲染
+#
+# 成千上万张星盘时，逐张调用 generate_chart_html 的开销主要在：
+# 每次重新拼接整段 f-string 模板、缩进 JSON、以及每个文件各自引用/复制样式资源。
+# 这里模板只在模块加载时切分一次，数据用紧凑 JSON 流式写入文件，
+# astro_style.css / astro_style_config.js 在整批中只保留一份 (复制到输出目录或内联)。
+# =============================================================================
+
+ASSET_FILES = ('astro_style.css', 'astro_style_config.js')
+
+def _default_assets_dir():
+    """库内置的前端资源目录 (quant_astro/html/，随 package_data 一起安装)。"""
+    return pkg_resources.resource_filename('quant_astro', 'html')
+
+ASSET_MODES = ('relative', 'inline', 'link')
+
+_BODY_HTML = """
+    <div id="svgChartContainer" class="chart-container"></div>
+
+    <div id="southIndianChart" class="south-indian-chart"></div>
+
+    <div id="aspectsContainer" class="aspects-main-container"></div>
+
+    <div id="tableContainer" class="astro-table-container">
+        <div class="table-block" id="block-info">
+        <h3 style="color:#e6edf3; text-align:center; border-bottom: 2px solid #30363d; padding-bottom: 10px;">📋 占星配置信息</h3>
+        <div id="infoTable"></div>
+        </div>
+        <div class="table-block" id="block-ruling">
+        <h3 style="color:#e6edf3; text-align:center; margin-top:30px;">👑 主宰星</h3>
+        <div id="rulingTable"></div>
+        </div>
+        <div class="table-block" id="block-kp-planet">
+        <h3 style="color:#e6edf3; text-align:center; margin-top:30px;">✨ 行星 KP</h3>
+        <div id="kpPlanetTable"></div>
+        </div>
+        <div class="table-block" id="block-kp-house">
+        <h3 style="color:#e6edf3; text-align:center; margin-top:30px;">🏠 宫位 KP</h3>
+        <div id="kpHouseTable"></div>
+        </div>
+        <div class="table-block" id="block-sig-planet">
+        <h3 style="color:#e6edf3; text-align:center; margin-top:30px;">🌟 行星象征宫位</h3>
+        <div id="sigPlanetTable"></div>
+        </div>
+        <div class="table-block" id="block-sig-house">
+        <h3 style="color:#e6edf3; text-align:center; margin-top:30px;">🏰 宫位象征星</h3>
+        <div id="sigHouseTable"></div>
+        </div>
+    </div>
+"""
+
+# 各渲染函数写入的容器；分页切换时先清空，数据缺失的表格不会残留上一张的内容
+_RENDER_JS = """
+const CHART_TARGETS = ['svgChartContainer', 'southIndianChart', 'aspectsContainer', 'infoTable',
+    'rulingTable', 'kpPlanetTable', 'kpHouseTable', 'sigPlanetTable', 'sigHouseTable'];
+
+function renderChartData(data) {
+    CHART_TARGETS.forEach(function (id) {
+        const el = document.getElementById(id);
+        if (el) { el.innerHTML = ''; }
+    });
+    if (!window.renderAstroChart) {
+        console.error("renderAstroChart 未定义，请检查 astro_style_config.js 是否加载成功");
+        return;
+    }
+    window.renderAstroChart(data);
+    if (window.renderSouthIndianChart) { window.renderSouthIndianChart(data); }
+    if (window.renderAspectTables) { window.renderAspectTables(data); }
+    if (window.renderKpTables) { window.renderKpTables(data); }
+}
+"""
+
+_PAGER_HTML = """
+    <div id="chartPager" style="text-align:center; margin:12px 0; color:#e6edf3;">
+        <button id="chartPrev" type="button">◀</button>
+        <select id="chartSelect"></select>
+        <button id="chartNext" type="button">▶</button>
+    </div>
+"""
+
+_PAGER_JS = """
+window.onload = function () {
+    const select = document.getElementById('chartSelect');
+    CHART_LABELS.forEach(function (label, i) {
+        const opt = document.createElement('option');
+        opt.value = i;
+        opt.textContent = label;
+        select.appendChild(opt);
+    });
+    function show(i) {
+        i = Math.max(0, Math.min(CHARTS.length - 1, i));
+        select.value = i;
+        location.hash = String(i);
+        renderChartData(CHARTS[i]);
+    }
+    select.onchange = function () { show(parseInt(select.value, 10)); };
+    document.getElementById('chartPrev').onclick = function () { show(parseInt(select.value, 10) - 1); };
+    document.getElementById('chartNext').onclick = function () { show(parseInt(select.value, 10) + 1); };
+    show(parseInt(location.hash.slice(1), 10) || 0);
+};
+"""
+
+_SINGLE_JS = """
+window.onload = function () { renderChartData(CHART_DATA); };
+"""
+
+# 紧凑 JSON 编码器 (无缩进、无多余空格)，整个模块共用
+_COMPACT_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def _script_safe(text):
+    # 防止数据中的 "</script>" 等提前结束脚本块；"<\/" 在 JS 字符串中等价于 "</"
+    return text.replace('</', '<\\/')
+
+
+def _write_json(f, obj):
+    """
+    把单个对象以紧凑 JSON 写入 f。
+    逐张编码 (走 C 加速的一次性编码) 后立即写出，整批数据不会同时驻留内存。
+    """
+    f.write(_script_safe(_COMPACT_ENCODER.encode(obj)))
+
+
+def _build_head(title, assets, assets_dir, assets_url):
+    """生成 <head> 部分；整批只生成一次。inline 模式下资源文件也只读取一次。"""
+    parts = ['<!DOCTYPE html>\n<html lang="zh">\n<head>\n    <meta charset="UTF-8">\n',
+             f'    <title>{html.escape(title)}</title>\n']
+    if assets == 'inline':
+        with open(os.path.join(assets_dir, ASSET_FILES[0]), encoding='utf-8') as f:
+            parts.append(f'<style>\n{f.read()}\n</style>\n')
+        with open(os.path.join(assets_dir, ASSET_FILES[1]), encoding='utf-8') as f:
+            parts.append(f'<script>\n{_script_safe(f.read())}\n</script>\n')
+    else:
+        base = assets_url.rstrip('/') if assets == 'link' else 'assets'
+        parts.append(f'    <link rel="stylesheet" href="{base}/{ASSET_FILES[0]}">\n')
+        parts.append(f'    <script src="{base}/{ASSET_FILES[1]}"></script>\n')
+    parts.append(f'<script>{_RENDER_JS}</script>\n</head>\n<body>\n')
+    return ''.join(parts)
+
+
+def _copy_assets(assets_dir, output_dir):
+    """relative 模式：把样式资源复制一份到 output_dir/assets，整批所有页面共用。"""
+    import shutil
+    target = os.path.join(output_dir, 'assets')
+    os.makedirs(target, exist_ok=True)
+    for name in ASSET_FILES:
+        shutil.copyfile(os.path.join(assets_dir, name), os.path.join(target, name))
+
+
+def _chart_data(chart):
+    """
+    单个批量条目 -> (CHART_DATA 字典, 文件名, 标签)。
+    条目可以是 generate_chart_html 的关键字参数字典 (含 planet_pos)，
+    也可以是已构建好的 CHART_DATA 字典 (含 asc_lon)；
+    可选键 filename / label 指定输出文件名与分页标签。
+    """
+    if not isinstance(chart, dict):
+        raise ValueError(f"批量渲染的条目必须是字典，收到: {type(chart).__name__}")
+    filename = chart.get('filename')
+    label = chart.get('label')
+    if 'planet_pos' in chart:
+        kwargs = {k: v for k, v in chart.items() if k not in ('filename', 'label', 'output_filename')}
+        data = build_chart_dict(**kwargs)
+    elif 'asc_lon' in chart:
+        data = {k: v for k, v in chart.items() if k not in ('filename', 'label')}
+    else:
+        raise ValueError("批量渲染的条目需包含 planet_pos (计算结果) 或 asc_lon (已构建的 CHART_DATA)")
+    if label is None:
+        info = data.get('chart_info') or {}
+        label = info.get('chart_name') or info.get('name')
+    return data, filename, label
+
+
+# 进程的 umask (只能通过设置再恢复来读取，在模块加载时读取一次)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _atomic_open(path):
+    """
+    在 path 所在目录创建唯一命名的临时文件；写完后由 _atomic_commit 替换为 path，出错时由 _atomic_discard 删除。
+    中途出错不会留下半个 HTML 或临时文件，同时写同一路径的多个进程也不会共用临时文件。
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, prefix=f'.{name}.',
+                                       suffix='.tmp', delete=False)
+
+
+def _atomic_commit(f, path):
+    f.close()
+    # NamedTemporaryFile 的权限固定为 0600，改回按 umask 新建文件时的权限
+    os.chmod(f.name, 0o666 & ~_UMASK)
+    os.replace(f.name, path)
+
+
+def _atomic_discard(f):
+    f.close()
+    try:
+        os.remove(f.name)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _atomic_write(path):
+    f = _atomic_open(path)
+    try:
+        yield f
+    except BaseException:
+        _atomic_discard(f)
+        raise
+    _atomic_commit(f, path)
+
+
+@instrumented('render_charts')
+def render_charts(charts, output_dir,
+                  assets='relative',
+                  assets_dir=None,
+                  assets_url=None,
+                  bundle_size=None,
+                  filename_pattern='chart_{index:05d}.html',
+                  title='Astrology Chart'):
+    """
+    批量生成星盘 HTML。
+
+    charts       : 可迭代对象 (可为生成器)，每项为 generate_chart_html 的关键字参数字典
+                   或 build_chart_dict 的结果；可选键 filename / label。
+    output_dir   : 输出目录 (不存在时自动创建)。
+    assets       : 'relative' -> 资源复制一份到 output_dir/assets，页面以相对路径引用；
+                   'inline'   -> 资源读取一次，内联到每个文件 (单文件可独立打开)；
+                   'link'     -> 引用 assets_url 下的资源，不复制。
+    assets_dir   : 资源所在目录，默认为库内置的 quant_astro/html/。
+    bundle_size  : None 时每张星盘一个文件；为正整数时每个文件打包至多 bundle_size 张，
+                   页面带分页器 (下拉/上一张/下一张)，文件名使用 filename_pattern 的 index 作为包序号。
+    返回写出的文件路径列表。
+    """
+    if assets not in ASSET_MODES:
+        raise ValueError(f"assets 必须是 {ASSET_MODES} 之一，收到: {assets!r}")
+    if assets == 'link' and not assets_url:
+        raise ValueError("assets='link' 时必须提供 assets_url")
+    if bundle_size is not None and (not isinstance(bundle_size, int) or bundle_size < 1):
+        raise ValueError(f"bundle_size 必须是正整数，收到: {bundle_size!r}")
+
+    assets_dir = assets_dir or _default_assets_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    if assets == 'relative':
+        _copy_assets(assets_dir, output_dir)
+    head = _build_head(title, assets, assets_dir, assets_url)
+
+    paths = []
+    count = 0
+    if bundle_size is None:
+        for index, chart in enumerate(charts):
+            data, filename, _ = _chart_data(chart)
+            path = os.path.join(output_dir, filename or filename_pattern.format(index=index))
+            with _atomic_write(path) as f:
+                f.write(head)
+                f.write(_BODY_HTML)
+                f.write('<script>\nconst CHART_DATA = ')
+                _write_json(f, data)
+                f.write(f';\n{_SINGLE_JS}</script>\n</body>\n</html>\n')
+            paths.append(path)
+            count += 1
+    else:
+        f = None
+        labels = []
+        try:
+            for index, chart in enumerate(charts):
+                data, _, label = _chart_data(chart)
+                position = index % bundle_size
+                if position == 0:
+                    if f is not None:
+                        _close_bundle(f, labels, paths[-1])
+                        f = None
+                    path = os.path.join(output_dir, filename_pattern.format(index=index // bundle_size))
+                    f = _atomic_open(path)
+                    paths.append(path)
+                    labels = []
+                    f.write(head)
+                    f.write(_PAGER_HTML)
+                    f.write(_BODY_HTML)
+                    f.write('<script>\nconst CHARTS = [')
+                else:
+                    f.write(',\n')
+                _write_json(f, data)
+                labels.append(str(label) if label is not None else f'#{index + 1}')
+                count += 1
+            if f is not None:
+                _close_bundle(f, labels, paths[-1])
+                f = None
+        finally:
+            if f is not None:
+                _atomic_discard(f)
+
+    instrument.add_rows('render_charts', count)
+    return paths
+
+
+def _close_bundle(f, labels, path):
+    f.write('];\nconst CHART_LABELS = ')
+    _write_json(f, labels)
+    f.write(f';\n{_PAGER_JS}</script>\n</body>\n</html>\n')
+    _atomic_commit(f, path)
+
+
+@instrumented('write_charts_json')
+def write_charts_json(charts, output_path):
+    """
+    把一批星盘的 CHART_DATA 以 JSON Lines (每行一个紧凑 JSON) 逐条写入 output_path，
+    便于前端或其他程序按需加载。条目格式同 render_charts。返回写入的条数。
+    """
+    count = 0
+    with _atomic_write(output_path) as f:
+        for chart in charts:
+            data, _, _ = _chart_data(chart)
+            f.write(_COMPACT_ENCODER.encode(data))
+            f.write('\n')
+            count += 1
+    instrument.add_rows('write_charts_json', count)
+    return count
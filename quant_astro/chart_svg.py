@@ -0,0 +1,298 @@
+# quant_astro/chart_svg.py
+
+import os
+from html import escape
+
+import numpy as np
+
+from . import instrument
+from .instrument import instrumented
+from .chart import _chart_data, _atomic_write
+
+# =============================================================================
+# 纯 Python 的 SVG 星盘渲染 (不依赖浏览器)
+#
+# 输入与 generate_chart_html 注入前端的 CHART_DATA 相同 (build_chart_dict 的结果)，
+# 图形与 quant_astro/html/astro_style_config.js 中 renderAstroChart 画出的圆盘一致，
+# 另在内盘绘制相位线。样式内联在 SVG 中，可直接嵌入邮件或 PDF。
+# 行星防碰撞在 NumPy 中整批求解，多张星盘共用一次迭代。
+# =============================================================================
+
+# 与 astro_style_config.js 中 window.ASTRO_STYLE 保持一致
+DEFAULT_STYLE = {
+    'planets_registry': {
+        'Su': {'symbol': '☉', 'color': '#FF8A80', 'visible': True},
+        'Mo': {'symbol': '☽', 'color': '#90CAF9', 'visible': True},
+        'Me': {'symbol': '☿', 'color': '#A5D6A7', 'visible': True},
+        'Ve': {'symbol': '♀', 'color': '#FFE082', 'visible': True},
+        'Ma': {'symbol': '♂', 'color': '#FF8A80', 'visible': True},
+        'Ju': {'symbol': '♃', 'color': '#FF8A80', 'visible': True},
+        'Sa': {'symbol': '♄', 'color': '#FFE082', 'visible': True},
+        'Ur': {'symbol': '♅', 'color': '#A5D6A7', 'visible': True},
+        'Ne': {'symbol': '♆', 'color': '#90CAF9', 'visible': True},
+        'Pl': {'symbol': '♇', 'color': '#90CAF9', 'visible': True},
+        'Ra': {'symbol': '☊', 'color': '#90CAF9', 'visible': True},
+        'Ke': {'symbol': '☋', 'color': '#90CAF9', 'visible': True},
+        'Lilith': {'symbol': '⚸', 'color': '#fa5252', 'visible': True},
+    },
+    'colors': {
+        'highlight': '#e6edf3',
+        'text_main': '#e6edf3',
+        'text_dim': '#e6edf3',
+        'retro': '#FF8A80',
+        'zones': {'outer_ring': '#161b22', 'planet_ring': '#0d1117', 'inner_disk': '#21262d', 'center_core': '#0d1117'},
+        'elements': ['#FF8A80', '#FFE082', '#A5D6A7', '#90CAF9'],   # 火 土 风 水
+        'aspects': {'hard': '#FF8A80', 'soft': '#90CAF9', 'other': '#8b949e'},
+    },
+    'radii': {
+        'r1': 450, 'r2': 420, 'r3': 390,
+        'r4': 355, 'r5': 315, 'r6': 270, 'r7': 230, 'r8': 200,
+        'r9': 175, 'r10': 150, 'r11': 125,
+    },
+    'settings': {'collision_min_dist': 7.5, 'collision_max_iter': 100, 'text_spread_deg': 5},
+    'size': 930,
+}
+
+# 与 astro_style.css 中对应的类相同；内联后单个 SVG 文件即可独立显示
+_SVG_CSS = (
+    '.stroke-main{stroke:#e6edf3;stroke-width:2px;fill:none}'
+    '.stroke-house{stroke:#30363d;stroke-width:1.5px;fill:none}'
+    '.stroke-aspect{stroke-width:1.2px;fill:none;opacity:.8}'
+    '.text-planet{font-family:"Segoe UI Symbol","Apple Color Emoji",sans-serif;'
+    'text-anchor:middle;dominant-baseline:central}'
+    '.text-retro{font-family:"Segoe UI Symbol",sans-serif;text-anchor:middle;'
+    'dominant-baseline:central;font-weight:bold}'
+)
+
+_HARD_ANGLES = (90.0, 180.0)
+_SOFT_ANGLES = (60.0, 120.0)
+
+
+# ----------------- 防碰撞 -----------------
+
+def solve_collisions(lons, min_dist=7.5, max_iter=100):
+    """
+    行星符号防碰撞 (与前端 solvePlanetCollisions 相同的环形弹簧斥力)。
+
+    lons : 形状 (n,) 或 (批量, n) 的黄经数组 (度)，每行一张星盘。
+    每轮按当前渲染经度排序，相邻 (含 360° 跨界) 间距小于 min_dist 的两颗星
+    各向外推开一半重叠量；所有行同时迭代，直到全部无碰撞或达到 max_iter。
+    返回与输入形状相同、按原顺序排列的渲染经度 (0–360)。
+    """
+    lons = np.asarray(lons, dtype='float64')
+    squeeze = lons.ndim == 1
+    render = np.atleast_2d(lons) % 360.0
+    rows, n = render.shape
+    if n < 2:
+        return render[0] if squeeze else render
+
+    order = np.broadcast_to(np.arange(n), (rows, n)).copy()
+    for _ in range(max_iter):
+        idx = np.argsort(render, axis=1, kind='stable')
+        render = np.take_along_axis(render, idx, axis=1)
+        order = np.take_along_axis(order, idx, axis=1)
+
+        # gap[:, i] 为第 i 颗到下一颗 (环形) 的角距
+        gap = np.diff(render, axis=1, append=render[:, :1] + 360.0)
+        push = np.maximum(min_dist - gap, 0.0) / 2.0
+        if not push.any():
+            break
+        # 第 i 颗被下一颗向后推，被上一颗向前推
+        render = (render - push + np.roll(push, 1, axis=1)) % 360.0
+
+    result = np.empty_like(render)
+    np.put_along_axis(result, order, render, axis=1)
+    return result[0] if squeeze else result
+
+
+# ----------------- 渲染 -----------------
+
+def _merge_style(style):
+    if not style:
+        return DEFAULT_STYLE
+    merged = {}
+    for key, default in DEFAULT_STYLE.items():
+        value = style.get(key, default)
+        merged[key] = dict(default, **value) if isinstance(default, dict) else value
+    return merged
+
+
+def _planet_style(registry, name):
+    return registry.get(name) or {'symbol': name[0], 'color': '#8b949e', 'visible': True}
+
+
+def _visible_planets(chart_dict, registry):
+    return [p for p in chart_dict['planets'] if _planet_style(registry, p['name']).get('visible', True) is not False]
+
+
+def _text(parts, txt, x, y, color, size, cls='text-planet', bold=False):
+    weight = ' font-weight="bold"' if bold else ''
+    parts.append(f'<text x="{x:.2f}" y="{y:.2f}" class="{cls}" fill="{color}" font-size="{size}"{weight}>{txt}</text>')
+
+
+def _aspect_color(colors, angle):
+    angle = float(angle)
+    if angle in _HARD_ANGLES:
+        return colors['aspects']['hard']
+    if angle in _SOFT_ANGLES:
+        return colors['aspects']['soft']
+    return colors['aspects']['other']
+
+
+def _render(chart_dict, render_lons, style, aspects):
+    """按已求解的行星渲染经度生成一张 SVG 字符串。"""
+    registry = style['planets_registry']
+    colors = style['colors']
+    zones = colors['zones']
+    elements = colors['elements']
+    radii = style['radii']
+    spread = style['settings']['text_spread_deg']
+    size = style['size']
+    asc = chart_dict['asc_lon']
+
+    def pos(lon, radius):
+        # 上升点在左侧 (角度 π)，与前端 getPos 相同
+        angle = np.pi + np.radians(asc - np.asarray(lon, dtype='float64'))
+        return np.cos(angle) * radius, np.sin(angle) * radius
+
+    half = size / 2
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+             f'viewBox="{-half:g} {-half:g} {size:g} {size:g}"><style>{_SVG_CSS}</style>']
+
+    # 1. 同心圆背景
+    for r, fill in ((radii['r1'], zones['outer_ring']), (radii['r3'], zones['planet_ring']),
+                    (radii['r9'], zones['inner_disk']), (radii['r11'], zones['center_core'])):
+        parts.append(f'<circle cx="0" cy="0" r="{r}" fill="{fill}"/>')
+
+    # 2. 宫位分割线
+    houses = chart_dict['houses']
+    house_lons = np.array([h['abs_lon'] for h in houses], dtype='float64')
+    x1, y1 = pos(house_lons, radii['r3'])
+    x2, y2 = pos(house_lons, radii['r11'])
+    for k in range(len(houses)):
+        parts.append(f'<line x1="{x1[k]:.2f}" y1="{y1[k]:.2f}" x2="{x2[k]:.2f}" y2="{y2[k]:.2f}" class="stroke-house"/>')
+
+    # 3. 圆环描边
+    for r in (radii['r1'], radii['r3'], radii['r9'], radii['r11']):
+        parts.append(f'<circle cx="0" cy="0" r="{r}" fill="none" class="stroke-main"/>')
+
+    # 4. 宫头星座与度分 (1–6 宫左分右度，7–12 宫左度右分)
+    sx, sy = pos(house_lons, radii['r2'])
+    lx, ly = pos(house_lons + spread, radii['r2'])
+    rx, ry = pos(house_lons - spread, radii['r2'])
+    for k, h in enumerate(houses):
+        z = h['zodiac']
+        _text(parts, z['sign_sym'], sx[k], sy[k], elements[z['sign_idx'] % 4], '24px')
+        deg, minute = f"{z['deg']}°", f"{z['min']}′"
+        if 1 <= h['id'] <= 6:
+            _text(parts, minute, lx[k], ly[k], colors['text_dim'], '25px')
+            _text(parts, deg, rx[k], ry[k], colors['text_main'], '25px')
+        else:
+            _text(parts, deg, lx[k], ly[k], colors['text_main'], '25px')
+            _text(parts, minute, rx[k], ry[k], colors['text_dim'], '25px')
+
+    # 5. 相位线 (内盘，连接行星实际位置)
+    planets = _visible_planets(chart_dict, registry)
+    if aspects:
+        orb_aspects = (chart_dict.get('aspects') or {}).get('orb') or []
+        lon_of = {p['name']: p['abs_lon'] for p in chart_dict['planets']}
+        lon_of.update({f"house {h['id']}": h['abs_lon'] for h in houses})
+        lines = [(lon_of[a['p1']], lon_of[a['p2']], a['angle_def']) for a in orb_aspects
+                 if a['p1'] in lon_of and a['p2'] in lon_of and float(a['angle_def']) != 0.0]
+        if lines:
+            ends = np.array([(a, b) for a, b, _ in lines], dtype='float64')
+            ax, ay = pos(ends[:, 0], radii['r11'])
+            bx, by = pos(ends[:, 1], radii['r11'])
+            for k, (_, _, angle) in enumerate(lines):
+                parts.append(f'<line x1="{ax[k]:.2f}" y1="{ay[k]:.2f}" x2="{bx[k]:.2f}" y2="{by[k]:.2f}" '
+                             f'class="stroke-aspect" stroke="{_aspect_color(colors, angle)}"/>')
+
+    # 6. 行星：符号 / 度 / 星座 / 分 / 逆行 各占一层
+    if planets:
+        layers = {r: pos(render_lons, radii[r]) for r in ('r4', 'r5', 'r6', 'r7', 'r8')}
+        for k, p in enumerate(planets):
+            z = p['zodiac']
+            p_style = _planet_style(registry, p['name'])
+            _text(parts, escape(p_style['symbol']), layers['r4'][0][k], layers['r4'][1][k], p_style['color'], '28px')
+            _text(parts, f"{z['deg']}°", layers['r5'][0][k], layers['r5'][1][k], colors['text_main'], '25px')
+            _text(parts, z['sign_sym'], layers['r6'][0][k], layers['r6'][1][k], elements[z['sign_idx'] % 4], '20px')
+            _text(parts, f"{z['min']}′", layers['r7'][0][k], layers['r7'][1][k], colors['text_dim'], '25px')
+            if p['is_retro']:
+                _text(parts, 'R', layers['r8'][0][k], layers['r8'][1][k], colors['retro'], '21px', 'text-retro', True)
+
+    # 7. 宫位编号
+    mids = chart_dict.get('house_mids') or []
+    if mids:
+        mx, my = pos([m['lon'] for m in mids], radii['r10'])
+        for k, m in enumerate(mids):
+            _text(parts, m['id'], mx[k], my[k], colors['highlight'], '18px', bold=True)
+
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def render_chart_svg(chart_dict, style=None, aspects=True):
+    """
+    单张星盘 -> SVG 字符串。
+    chart_dict 为 build_chart_dict 的结果 (或 generate_chart_html 的关键字参数字典)；
+    style 可按 DEFAULT_STYLE 的结构覆盖部分配置；aspects=False 时不画相位线。
+    """
+    return next(iter_chart_svgs([chart_dict], style=style, aspects=aspects))
+
+
+def iter_chart_svgs(charts, style=None, aspects=True, batch_size=256):
+    """
+    逐张生成 SVG 字符串 (生成器)，条目格式同 chart.render_charts。
+    每 batch_size 张为一批，可见行星数相同的星盘合并为一个矩阵一次求解防碰撞。
+    """
+    for _, svg in _iter_svgs(charts, style, aspects, batch_size):
+        yield svg
+
+
+def _iter_svgs(charts, style, aspects, batch_size):
+    # 生成 (条目指定的文件名或 None, SVG 字符串)
+    style = _merge_style(style)
+    registry = style['planets_registry']
+    settings = style['settings']
+
+    def flush(batch):
+        groups = {}
+        for k, (data, _) in enumerate(batch):
+            groups.setdefault(len(_visible_planets(data, registry)), []).append(k)
+        solved = [None] * len(batch)
+        for n, members in groups.items():
+            lons = np.array([[p['abs_lon'] for p in _visible_planets(batch[k][0], registry)] for k in members],
+                            dtype='float64').reshape(len(members), n)
+            render = solve_collisions(lons, settings['collision_min_dist'], settings['collision_max_iter'])
+            for row, k in enumerate(members):
+                solved[k] = render[row]
+        for (data, filename), render_lons in zip(batch, solved):
+            yield filename, _render(data, render_lons, style, aspects)
+
+    batch = []
+    for chart in charts:
+        data, filename, _ = _chart_data(chart)
+        batch.append((data, filename))
+        if len(batch) == batch_size:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+
+@instrumented('write_chart_svgs')
+def write_chart_svgs(charts, output_dir, filename_pattern='chart_{index:05d}.svg', style=None, aspects=True,
+                     batch_size=256):
+    """
+    批量把星盘写为独立的 SVG 文件 (逐张写出，不在内存中保留整批结果)。
+    条目的可选键 filename 指定文件名，否则按 filename_pattern 编号。返回写出的路径列表。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for index, (filename, svg) in enumerate(_iter_svgs(charts, style, aspects, batch_size)):
+        path = os.path.join(output_dir, filename or filename_pattern.format(index=index))
+        with _atomic_write(path) as f:
+            f.write(svg)
+        paths.append(path)
+    instrument.add_rows('write_chart_svgs', len(paths))
+    return paths
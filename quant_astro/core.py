@@ -2,10 +2,24 @@
 
 import swisseph as swe
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pytz
 import re
+import threading
 import pkg_resources
+import numpy as np
 import pandas as pd
+from .cache import cached
+from . import instrument
+from .instrument import instrumented
+from . import calendars
+from .timezones import resolve_utc_offset, utc_to_local, local_to_utc
+
+# --- 预编译的解析正则 ---
+_DMS_NUMBER_RE = re.compile(r"[\d.]+")
+# 本地时间 "YYYY-MM-DD HH:MM:SS[.ffffff]"，年份允许负数 (天文纪年)
+_LOCAL_TIME_RE = r'^\s*(-?\d{1,4})-(\d{1,2})-(\d{1,2})[ T](\d{1,2}):(\d{1,2}):(\d{1,2}(?:\.\d*)?)\s*$'
+_LOCAL_TIME_SCALAR_RE = re.compile(_LOCAL_TIME_RE)
 
 # --- 小行星目录：代码简写 -> swisseph 内置常量 ---
 # 这6个是 swisseph 标准发行版内置的，不需要额外星历文件
@@ -18,6 +32,9 @@ MINOR_PLANET_CATALOG = {
     'Vs': swe.VESTA,    # 4 灶神星
 }
 
+# --- 宫制名称 -> swisseph 宫制代码 ---
+HOUSE_SYSTEMS = {'Placidus': b'P', 'Koch': b'K', 'Regiomontanus': b'R', 'Whole Sign': b'W', 'Equal': b'E', 'Campanus': b'C'}
+
 # --- 占星基础数据：庙旺陷落表 ---
 PLANET_DIGNITIES = {
     'Su': {'Dom': ['Leo'], 'Exalt': ['Ari'], 'Det': ['Aqr'], 'Fall': ['Lib']},
@@ -49,9 +66,11 @@ def decimal_to_dms(deg_float):
 # --------------------
 
 # (从你原始代码中提取的辅助函数)
+# 批量任务中经纬度/时区字符串大量重复，解析结果按字符串缓存
+@lru_cache(maxsize=4096)
 def _parse_dms(dms_str):
     # 1. 提取出度、分、秒的纯数字
-    parts = re.findall(r"[\d.]+", dms_str)
+    parts = _DMS_NUMBER_RE.findall(dms_str)
     
     # 2. 先计算出坐标的十进制绝对值
     absolute_deg = float(parts[0]) + float(parts[1])/60 + float(parts[2])/3600
@@ -61,49 +80,160 @@ def _parse_dms(dms_str):
         return -absolute_deg
     return absolute_deg
 
-def _parse_timezone(tz_str):
-    match = re.match(r'^([+-]?)(\d{1,2})(:?)(\d{0,2})$', tz_str)
-    sign = -1 if match.group(1) == '-' else 1
-    hours = float(match.group(2))
-    mins = float(match.group(4) or 0)
-    return sign * (hours + mins/60)
-
 # --- 历法转换辅助函数 ---
+def _split_seconds(sec_str):
+    """把 "SS[.ffffff]" 精确拆成 (秒, 微秒)，不经过浮点。"""
+    whole, _, frac = sec_str.partition('.')
+    return int(whole), int(frac[:6].ljust(6, '0'))
+
 def _parse_local_time_and_convert_to_gregorian(local_time_str, calendar='g'):
     """
     解析本地时间字符串，统一转换为格里历 datetime 对象，无精度损失。
     """
+    if calendar.lower() != 'g':
+        # 儒略历：先按字段解析 (儒略历的 2 月 29 日在格里历下可能不存在，不能先建 datetime)，
+        # 日期部分经整数儒略日数精确换算，日内时间原样保留
+        match = _LOCAL_TIME_SCALAR_RE.match(local_time_str)
+        if not match:
+            raise ValueError(f"无法解析本地时间字符串: {local_time_str}")
+        year, month, day, hh, mm = (int(match.group(i)) for i in range(1, 6))
+        ss, us = _split_seconds(match.group(6))
+        g_year, g_month, g_day = calendars.convert_calendar(year, month, day, 'j', 'g')
+        return datetime(int(g_year), int(g_month), int(g_day), hh, mm, ss, us)
+
+    # fromisoformat 比 strptime 快一个数量级，覆盖 6 位或无小数秒的常见格式
     try:
-        dt = datetime.strptime(local_time_str, "%Y-%m-%d %H:%M:%S.%f")
+        dt = datetime.fromisoformat(local_time_str)
+        if dt.tzinfo is not None:
+            raise ValueError(local_time_str)
     except ValueError:
-        dt = datetime.strptime(local_time_str, "%Y-%m-%d %H:%M:%S")
+        try:
+            dt = datetime.strptime(local_time_str, "%Y-%m-%d %H:%M:%S.%f")
+        except ValueError:
+            dt = datetime.strptime(local_time_str, "%Y-%m-%d %H:%M:%S")
+    return dt  # 已是格里历，直接返回
+
+# --- 批量解析 (向量化) ---
+def _extract_local_time_fields(local_times):
+    """
+    批量把本地时间字符串拆成整数字段 (year, month, day, 日内微秒)。
+    秒的小数部分按字符串截取，不经过浮点，保证微秒精确。
+    """
+    raw = np.asarray(local_times, dtype=object).ravel()
+    fields = pd.Series(raw).str.extract(_LOCAL_TIME_RE)
+    bad = fields[0].isna().to_numpy()
+    if bad.any():
+        raise ValueError(f"无法解析本地时间字符串: {raw[np.argmax(bad)]}")
+
+    year, month, day, hh, mm = (fields[i].to_numpy().astype('int64') for i in range(5))
+    sec = fields[5].str.partition('.')
+    ss = sec[0].to_numpy().astype('int64')
+    us = sec[2].str.slice(0, 6).str.ljust(6, '0').to_numpy().astype('int64')
+    tod_us = ((hh * 60 + mm) * 60 + ss) * 1_000_000 + us
+    return year, month, day, tod_us
+
+def local_times_to_gregorian(local_times, calendar='g'):
+    """
+    批量把本地时间字符串 (按 calendar 指定的历法) 转换为格里历 numpy.datetime64[us]，
+    即 _parse_local_time_and_convert_to_gregorian 的向量化版本。
+    calendar 为 'g'/'j'，或与输入等长的逐行历法数组。
+    """
+    year, month, day, tod_us = _extract_local_time_fields(local_times)
+    return calendars.fields_to_datetime64(year, month, day, microsecond=tod_us, calendar=calendar)
+
+def _map_unique(values, parser):
+    """对重复率高的字符串列只解析去重后的值，再按索引映射回原位置。"""
+    if isinstance(values, str):
+        return np.float64(parser(values))
+    arr = np.asarray(values, dtype=object)
+    uniq, inverse = np.unique(arr, return_inverse=True)
+    return np.array([parser(u) for u in uniq], dtype='float64')[inverse.reshape(arr.shape)]
+
+@instrumented('parse_birth_columns')
+def parse_birth_columns(local_times, timezones, latitudes, longitudes, calendar='g',
+                        ambiguous='raise', nonexistent='raise'):
+    """
+    批量把字符串列 (与 birth_config 相同的格式) 一次性转换为数值数组，
+    结果可直接传给 calculate_positions_numeric。
+
+    参数：
+        local_times : 本地时间字符串序列 "YYYY-MM-DD HH:MM:SS[.ffffff]"
+        timezones   : 时区字符串序列 (如 "+8:00" 或 "Asia/Shanghai")，或单个字符串
+        latitudes   : 纬度 DMS 字符串序列，或单个字符串
+        longitudes  : 经度 DMS 字符串序列，或单个字符串
+        calendar    : 'g' (格里历) / 'j' (儒略历)，或逐行的历法数组
+        ambiguous / nonexistent : IANA 时区下重叠/空缺本地时间的处理方式，见 timezones.local_to_utc
+
+    返回：
+        {'jd_utc', 'latitude', 'longitude', 'utc_offset'}，均为 float64 数组；
+        策略为 'nan' 的行 jd_utc 与 utc_offset 为 NaN
+    """
+    local = local_times_to_gregorian(local_times, calendar)
+    instrument.add_rows('parse_birth_columns', len(local))
+    utc = local_to_utc(local, timezones, ambiguous, nonexistent)
+    invalid = np.isnat(utc)
+    jd_utc = calendars.datetime64_to_jd(np.where(invalid, local, utc))
+    jd_utc[invalid] = np.nan
+    n = len(local)
+    return {
+        'jd_utc': jd_utc,
+        'latitude': np.broadcast_to(_map_unique(latitudes, _parse_dms), (n,)).copy(),
+        'longitude': np.broadcast_to(_map_unique(longitudes, _parse_dms), (n,)).copy(),
+        'utc_offset': (local - utc) / np.timedelta64(1, 'h'),
+    }
+
+# --- 星历路径与岁差模式 ---
+# swe.set_ephe_path 会关闭已打开的星历文件并清空内部缓存，只在路径变化时才调用。
+# pyswisseph 的状态 (星历路径、岁差模式等) 是线程局部的，因此按线程记录当前路径。
+_EPHE_STATE = threading.local()
 
-    if calendar.lower() == 'g':
-        return dt  # 已是格里历，直接返回
+def _set_default_ephe_path(ephe_path=None):
+    """设置当前线程在 ephe_path 未提供时使用的星历目录 (aio.init_worker 用它让 worker 一直使用自定义星历)。"""
+    _EPHE_STATE.default = ephe_path
 
-    # 儒略历 -> 格里历：通过 swe 官方函数精确转换
-    hour_dec = (dt.hour
-                + dt.minute / 60.0
-                + dt.second / 3600.0
-                + dt.microsecond / 3600000000.0)
+def _default_ephe_path():
+    """当前线程的默认星历目录：_set_default_ephe_path 设置的目录，否则为库内置的 ephe 目录。"""
+    # 用户未提供路径时，会自动找到 site-packages/quant_astro/ephe/ 这个目录
+    return getattr(_EPHE_STATE, 'default', None) or pkg_resources.resource_filename('quant_astro', 'ephe')
 
-    # 按儒略历日期计算儒略日（JD）
-    jd = swe.julday(dt.year, dt.month, dt.day, hour_dec, swe.JUL_CAL)
+def _ensure_ephe_path(ephe_path=None):
+    """设置星历路径：未提供时使用当前线程的默认目录 (见 _default_ephe_path)。"""
+    path = ephe_path or _default_ephe_path()
+    if path != getattr(_EPHE_STATE, 'path', None):
+        swe.set_ephe_path(path)
+        _EPHE_STATE.path = path
 
-    # 将 JD 转回格里历
-    g_year, g_month, g_day, g_h_dec = swe.revjul(jd, swe.GREG_CAL)
+def _resolve_ayanamsha(ayanamsha_mode):
+    """
+    智能转换岁差模式：支持字符串输入
+    允许输入 "swe.SIDM_KRISHNAMURTI" 或 "SIDM_KRISHNAMURTI"，也可直接传 swisseph 常量
+    """
+    if isinstance(ayanamsha_mode, str):
+        # 1. 去掉可能误写的 "swe." 前缀，只保留大写变量名
+        clean_name = ayanamsha_mode.replace("swe.", "").strip()
 
-    # 将格里历小时小数拆回时、分、秒、微秒
-    g_h  = int(g_h_dec)
-    g_md = (g_h_dec - g_h) * 60.0
-    g_m  = int(g_md)
-    g_sd = (g_md - g_m) * 60.0
-    g_s  = int(g_sd)
-    g_us = round((g_sd - g_s) * 1_000_000)
+        # 2. 从 swisseph 库中动态查找这个名字对应的数字
+        if hasattr(swe, clean_name):
+            return getattr(swe, clean_name)
+        # 如果名字写错了，给个报错或者默认值
+        raise ValueError(f"❌ 找不到岁差模式名称: {ayanamsha_mode}。请检查拼写是否与 swisseph 常量一致。")
+    return ayanamsha_mode
 
-    return datetime(int(g_year), int(g_month), int(g_day), g_h, g_m, g_s, g_us)
+def _to_jd_utc(when, utc_offset=0.0):
+    """
+    数值输入转换为 UTC 儒略日。
+    when 可为儒略日浮点数、numpy.datetime64 或 datetime；结果 = when - utc_offset 小时。
+    """
+    if isinstance(when, (datetime, np.datetime64)):
+        us = np.datetime64(when, 'us').astype('int64')
+        jd = 2440587.5 + float(us) / 86400e6
+    else:
+        jd = float(when)
+    return jd - utc_offset / 24.0
 
 # --- 主计算函数 ---
+@instrumented('calculate_positions')
+@cached('calculate_positions')
 def calculate_positions(
     local_time_str, timezone_str, latitude_str, longitude_str, elevation,
     ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI',
@@ -114,44 +244,18 @@ def calculate_positions(
     计算给定时间和地点的行星和宫位位置。
     如果提供了 ephe_path，则使用它。否则，使用库内置的星历文件。
     """
-
-
-    # =========================================================================
-    # [新增] 智能转换岁差模式：支持字符串输入
-    # 允许输入 "swe.SIDM_KRISHNAMURTI" 或 "SIDM_KRISHNAMURTI"
-    # =========================================================================
-    real_ayanamsha_mode = ayanamsha_mode # 默认先拿过来
-    
-    if isinstance(ayanamsha_mode, str):
-        # 1. 去掉可能误写的 "swe." 前缀，只保留大写变量名
-        clean_name = ayanamsha_mode.replace("swe.", "").strip()
-        
-        # 2. 从 swisseph 库中动态查找这个名字对应的数字
-        if hasattr(swe, clean_name):
-            real_ayanamsha_mode = getattr(swe, clean_name)
-        else:
-            # 如果名字写错了，给个报错或者默认值
-            raise ValueError(f"❌ 找不到岁差模式名称: {ayanamsha_mode}。请检查拼写是否与 swisseph 常量一致。")
-    # =========================================================================
-
-
-    # 修改点2：根据 ephe_path 是否提供来设置星历路径
-    if ephe_path:
-        # 用户提供了外部路径，使用它
-        swe.set_ephe_path(ephe_path)
-    else:
-        # 用户未提供路径，使用包内自带的路径
-        # 这会自动找到 site-packages/quant_astro/ephe/ 这个目录
-        bundled_ephe_path = pkg_resources.resource_filename('quant_astro', 'ephe')
-        swe.set_ephe_path(bundled_ephe_path)
-
     # 1. 解析输入参数
+    _t = instrument.start()
     # 立即按指定历法（'g'=格里历，'j'=儒略历）将时间无损统一转换为格里历
     calendar = kwargs.get('calendar', 'g')
     local_dt = _parse_local_time_and_convert_to_gregorian(local_time_str, calendar)
     latitude = _parse_dms(latitude_str)
     longitude = _parse_dms(longitude_str)
-    timezone_offset = _parse_timezone(timezone_str)
+    # 支持固定偏移与 IANA 时区名；后者的夏令时重叠/空缺按 ambiguous / nonexistent 处理
+    timezone_offset = resolve_utc_offset(
+        local_dt, timezone_str,
+        kwargs.get('ambiguous', 'raise'), kwargs.get('nonexistent', 'raise')
+    )
 
     # 2. 计算儒略日 (Julian Day)
     # local_dt 已确保为格里历，显式传入 swe.GREG_CAL，并保留微秒精度
@@ -163,6 +267,87 @@ def calculate_positions(
             + utc_time.microsecond / 3600000000.0,
         swe.GREG_CAL
     )
+    instrument.stop('calculate_positions.parse', _t)
+
+    return _compute_positions(
+        jd_utc, latitude, longitude, ecliptic_mode, ayanamsha_mode,
+        node_mode, house_system, ephe_path, **kwargs
+    )
+
+@instrumented('calculate_positions_numeric')
+@cached('calculate_positions_numeric')
+def calculate_positions_numeric(
+    when, latitude, longitude, elevation=0.0, utc_offset=0.0,
+    ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI',
+    node_mode='mean', house_system='Placidus', ephe_path=None,
+    **kwargs
+):
+    """
+    calculate_positions 的数值快速入口，跳过全部字符串解析。
+
+    参数：
+        when       : 儒略日浮点数，或 numpy.datetime64 / datetime (格里历)
+        latitude   : 纬度 (度，南纬为负)
+        longitude  : 经度 (度，西经为负)
+        utc_offset : when 相对 UTC 的小时偏移；when 已是 UTC 时保持 0
+        其余参数与 calculate_positions 相同 (含 selected_planets、KP_HORARY 等 kwargs)
+
+    返回值与 calculate_positions 完全一致。
+    """
+    jd_utc = _to_jd_utc(when, utc_offset)
+    return _compute_positions(
+        jd_utc, float(latitude), float(longitude), ecliptic_mode, ayanamsha_mode,
+        node_mode, house_system, ephe_path, **kwargs
+    )
+
+@instrumented('calculate_houses_batch')
+def calculate_houses_batch(jds, latitudes, longitudes, house_system='Placidus',
+                           ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None):
+    """
+    批量计算宫头：n 个 (UTC 儒略日, 纬度, 经度) 组合，不构造行星位置。
+
+    参数：
+        jds                   : 儒略日 (UTC) 数组
+        latitudes, longitudes : 度数，数组或标量 (按 numpy 规则广播到 jds 的长度)
+        house_system          : HOUSE_SYSTEMS 中的宫制名称
+        ecliptic_mode / ayanamsha_mode / ephe_path : 与 calculate_positions 相同
+
+    返回：
+        DataFrame (行与输入一一对应)，列为 'house 1' … 'house 12'、'Asc'、'MC'，
+        宫头经度与 calculate_positions 的 house_positions[...]['lon'] 相同 (0–360)。
+    """
+    if house_system not in HOUSE_SYSTEMS:
+        raise ValueError(f"不支持的宫制: {house_system}，可选: {', '.join(HOUSE_SYSTEMS)}")
+    jds, lats, lons = np.broadcast_arrays(np.atleast_1d(np.asarray(jds, dtype='float64')),
+                                          np.asarray(latitudes, dtype='float64'),
+                                          np.asarray(longitudes, dtype='float64'))
+    _ensure_ephe_path(ephe_path)
+    if ecliptic_mode == 'sidereal':
+        swe.set_sid_mode(_resolve_ayanamsha(ayanamsha_mode))
+        house_flag = swe.FLG_SIDEREAL
+    else:
+        house_flag = 0
+
+    code = HOUSE_SYSTEMS[house_system]
+    houses_ex = swe.houses_ex
+    out = np.empty((len(jds), 14))
+    for k, (jd, lat, lon) in enumerate(zip(jds.tolist(), lats.tolist(), lons.tolist())):
+        cusps, ascmc = houses_ex(jd, lat, lon, code, flags=house_flag)
+        out[k, :12] = cusps[:12]
+        out[k, 12:] = ascmc[:2]
+    columns = [f"house {i + 1}" for i in range(12)] + ['Asc', 'MC']
+    instrument.add_rows('calculate_houses_batch', len(out))
+    return pd.DataFrame(out % 360.0, columns=columns)
+
+def _compute_positions(jd_utc, latitude, longitude, ecliptic_mode, ayanamsha_mode,
+                       node_mode, house_system, ephe_path, **kwargs):
+    """calculate_positions 与数值入口共用的计算主体 (输入均已是数值)。"""
+    real_ayanamsha_mode = _resolve_ayanamsha(ayanamsha_mode)
+
+    # 根据 ephe_path 是否提供来设置星历路径
+    _t = instrument.start()
+    _ensure_ephe_path(ephe_path)
+    instrument.stop('calculate_positions.ephe_path', _t)
 
     # [新增] 预先计算真实黄赤交角，供后续所有 swe.cotrans() 使用
     # swe.ECL_NUT (= -1)：swisseph 内置伪天体，专用于返回章动与黄赤交角
@@ -203,6 +388,7 @@ def calculate_positions(
     # 获取用户选择的行星列表，如果未提供则默认为 None (即全选)
     selected_planets = kwargs.get('selected_planets', None)
 
+    _t = instrument.start()
     for p_id, name in planet_map.items():
         should_calc = False
         if selected_planets is None or 'All' in selected_planets:
@@ -239,11 +425,12 @@ def calculate_positions(
                 pos_ecl_south = (south_lon, south_lat, xx[2])
                 pos_eq_south = swe.cotrans(pos_ecl_south, eps)
                 planet_positions['Ke'] = {'lon': south_lon, 'lat': south_lat, 'speed': xx[3], 'ra': pos_eq_south[0], 'dec': pos_eq_south[1], 'dec_speed': -xx_eq[4]}
+    instrument.stop('calculate_positions.planets', _t)
 
 
     # 5. 计算宫位位置
     house_positions = {}
-    house_codes = {'Placidus': b'P', 'Koch': b'K', 'Regiomontanus': b'R', 'Whole Sign': b'W', 'Equal': b'E', 'Campanus': 'C'}
+    house_codes = HOUSE_SYSTEMS
     
     if house_system in house_codes:
         target_asc = None  # <---【新增】初始化变量，防止非卜卦模式下报错
@@ -262,8 +449,10 @@ def calculate_positions(
             if not horary_mode or horary_number is None:
                 raise ValueError("卜卦字典中缺少 'mode' 或 'number' 参数。")
 
+            _t = instrument.start()
             csv_path = pkg_resources.resource_filename('quant_astro', 'data/sub-sub.csv')
             df = pd.read_csv(csv_path)
+            instrument.stop('calculate_positions.horary_table', _t)
             
             if horary_mode.upper() == "KS-N":
                 COLUMN, RESULT_COLUMN = "KS-N", "KS-D"
@@ -290,16 +479,19 @@ def calculate_positions(
                         jd_low = jd_mid
                 return jd_mid
 
-            house_codes_map = {'Placidus': b'P', 'Koch': b'K', 'Regiomontanus': b'R', 'Whole Sign': b'W', 'Equal': b'E', 'Campanus': 'C'}
+            house_codes_map = HOUSE_SYSTEMS
             house_flag = swe.FLG_SIDEREAL if ecliptic_mode == 'sidereal' else 0
             hs_code_bytes = house_codes_map.get(house_system)
             
             # 关键：用搜索到的新时间，覆盖用于计算宫位的时间
+            _t = instrument.start()
             jd_for_houses = find_correct_time(target_asc, jd_utc, latitude, longitude, hs_code_bytes, house_flag)
+            instrument.stop('calculate_positions.horary_search', _t)
         
 
         
         # 原始计算宫位代码
+        _t = instrument.start()
 
         houses, ascmc, houses_speed, ascmc_speed = swe.houses_ex2(
                 jd_for_houses, latitude, longitude, house_codes[house_system], flags=house_flag
@@ -328,6 +520,7 @@ def calculate_positions(
             pos_eq = swe.cotrans(pos_ecl, eps)
             # 注意：这里的 'lon' 用的是 final_lon
             house_positions[f"house {i+1}"] = {'lon': final_lon, 'lat': 0.0, 'speed': current_speed, 'ra': pos_eq[0], 'dec': pos_eq[1], 'dec_speed': 0.0}
+        instrument.stop('calculate_positions.houses', _t)
 
 
     # ----------------- [新增] 按照用户配置顺序重组字典 -----------------
@@ -364,6 +557,7 @@ def calculate_positions(
 
 
     # ----------------- [新增] 独立计算函数：日出与值日星 -----------------
+@instrumented('get_sun_rise_and_lord')
 def get_sun_rise_and_lord(birth_config, sunrise_config):
     """
     独立计算日出时间及值日星。
@@ -378,8 +572,7 @@ def get_sun_rise_and_lord(birth_config, sunrise_config):
     # pyswisseph 没有 get_ephe_path，因此我们直接尝试设置路径。
     # 这能防止因路径丢失导致的 calculation error (return 0.0)。
     try:
-        bundled_ephe_path = pkg_resources.resource_filename('quant_astro', 'ephe')
-        swe.set_ephe_path(bundled_ephe_path)
+        _ensure_ephe_path()
     except Exception:
         pass 
 
@@ -396,7 +589,9 @@ def get_sun_rise_and_lord(birth_config, sunrise_config):
     # 设为当天 00:00:00，搜索当天的日出
     local_midnight = local_dt.replace(hour=0, minute=0, second=0, microsecond=0)
     
-    tz_offset = _parse_timezone(birth_config['timezone_str'])
+    # 午夜只作为搜索起点：落在夏令时空缺/重叠中时取转换后/较早的时刻即可
+    tz_str = birth_config['timezone_str']
+    tz_offset = resolve_utc_offset(local_midnight, tz_str, 'earliest', 'shift_forward')
     utc_midnight = local_midnight - timedelta(hours=tz_offset)
     
     jd_start = swe.julday(utc_midnight.year, utc_midnight.month, utc_midnight.day,
@@ -463,7 +658,7 @@ def get_sun_rise_and_lord(birth_config, sunrise_config):
         micro = int((s - int(s)) * 1000000)
         
         rise_dt_utc = datetime(y, m, d, h, mi, int(s), micro)
-        rise_dt_local = rise_dt_utc + timedelta(hours=tz_offset)
+        rise_dt_local = utc_to_local(rise_dt_utc, tz_str)
         
     except ValueError as e:
         return {'error': f"Date Conversion Error: {e} (JD={rise_jd})"}
@@ -487,6 +682,8 @@ def get_sun_rise_and_lord(birth_config, sunrise_config):
     }
 
 # ----------------- [新增] 独立函数：计算恒星位置 -----------------
+@instrumented('calculate_fixed_stars')
+@cached('calculate_fixed_stars')
 def calculate_fixed_stars(jd_utc, selected_stars, ecliptic_mode='tropical', ayanamsha_mode='SIDM_KRISHNAMURTI'):
     """
     计算给定儒略日下，一组恒星的位置。
@@ -543,6 +740,7 @@ def calculate_fixed_stars(jd_utc, selected_stars, ecliptic_mode='tropical', ayan
 # ----------------- [恒星函数结束] -----------------
 
 # ----------------- [从 attributes.py 移入] 计算行星时 (Planetary Hour) -----------------
+@instrumented('get_planetary_hour')
 def get_planetary_hour(birth_config, sunrise_config):
     """
     计算当前时间对应的行星时 (Planetary Hour)。
@@ -550,15 +748,14 @@ def get_planetary_hour(birth_config, sunrise_config):
     """
     # 1. 基础配置与时间解析 (与日出函数类似)
     try:
-        bundled_ephe_path = pkg_resources.resource_filename('quant_astro', 'ephe')
-        swe.set_ephe_path(bundled_ephe_path)
+        _ensure_ephe_path()
     except Exception:
         pass 
 
     lat = _parse_dms(birth_config['latitude_str'])
     lon = _parse_dms(birth_config['longitude_str'])
     alt = birth_config.get('elevation', 0.0)
-    tz_offset = _parse_timezone(birth_config['timezone_str'])
+    tz_str = birth_config['timezone_str']
     
     local_dt_str = birth_config['local_time_str']
     calendar = birth_config.get('calendar', 'g')
@@ -569,6 +766,7 @@ def get_planetary_hour(birth_config, sunrise_config):
         """返回 target_date 当天的 (日出dt, 日落dt)"""
         # 构造 UTC 午夜
         midnight_local = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        tz_offset = resolve_utc_offset(midnight_local, tz_str, 'earliest', 'shift_forward')
         midnight_utc = midnight_local - timedelta(hours=tz_offset)
         jd_start = swe.julday(midnight_utc.year, midnight_utc.month, midnight_utc.day,
                               midnight_utc.hour + midnight_utc.minute/60.0)
@@ -604,7 +802,7 @@ def get_planetary_hour(birth_config, sunrise_config):
             mn = int((h_dec - h) * 60)
             s = (h_dec - h - mn/60) * 3600
             dt_utc = datetime(y, m, d, h, mn, int(s), int((s-int(s))*1000000))
-            return dt_utc + timedelta(hours=tz_offset)
+            return utc_to_local(dt_utc, tz_str)
 
         return jd_to_local(rise_jd), jd_to_local(set_jd)
 
@@ -6,19 +6,160 @@ import pytz
 import csv
 import pkg_resources
 import pandas as pd
+import numpy as np
+from functools import lru_cache
+from .timezones import resolve_utc_offset, get_tzinfo
+from . import instrument
+from .instrument import instrumented
+
+# --- 行星周期定义 (与您的 notebook 保持一致) ---
+# DASHA_LORDS 按周期顺序排列，批量接口返回的主星编码即为其中的索引
+PLANET_CYCLE = {
+    'Ke': {'value': 7, 'next': 'Ve'}, 'Ve': {'value': 20, 'next': 'Su'},
+    'Su': {'value': 6, 'next': 'Mo'}, 'Mo': {'value': 10, 'next': 'Ma'},
+    'Ma': {'value': 7, 'next': 'Ra'}, 'Ra': {'value': 18, 'next': 'Ju'},
+    'Ju': {'value': 16, 'next': 'Sa'}, 'Sa': {'value': 19, 'next': 'Me'},
+    'Me': {'value': 17, 'next': 'Ke'}
+}
+DASHA_LORDS = ('Ke', 'Ve', 'Su', 'Mo', 'Ma', 'Ra', 'Ju', 'Sa', 'Me')
+
+# 以每个主星为起点的子周期累积比例表 (9 × 10)，第 p 行为从 DASHA_LORDS[p] 开始的 9 段边界
+_DASHA_YEARS = np.array([PLANET_CYCLE[p]['value'] for p in DASHA_LORDS], dtype='float64')
+_DASHA_CUM = np.array([
+    np.concatenate(([0.0], np.cumsum(np.roll(_DASHA_YEARS, -p)) / 120.0)) for p in range(9)
+])
+_DASHA_CUM[:, -1] = 1.0
+# 把 9 行边界平移到互不重叠的区间 [2p, 2p+1)，一次 searchsorted 即可按父主星分组查找
+_DASHA_CUM_FLAT = (_DASHA_CUM[:, :9] + 2.0 * np.arange(9)[:, None]).ravel()
 
 # --- 内部辅助函数 ---
 
-def _parse_timezone(tz_str):
-    """解析时区字符串为小时浮点数 (从您的 notebook 中提取)"""
-    import re
-    match = re.match(r'^([+-]?)(\d{1,2})(:?)(\d{0,2})$', tz_str)
-    if not match:
-        raise ValueError(f"无法解析时区字符串: {tz_str}")
-    sign = -1 if match.group(1) == '-' else 1
-    hours = float(match.group(2))
-    mins = float(match.group(4) or 0)
-    return sign * (hours + mins/60)
+@lru_cache(maxsize=None)
+def _load_star_rows():
+    """读取 data/star.csv 并缓存，返回不可变的行元组 (每行为 csv.DictReader 的字典)。"""
+    star_file_path = pkg_resources.resource_filename('quant_astro', 'data/star.csv')
+    with open(star_file_path, mode='r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        return tuple(reader)
+
+@lru_cache(maxsize=None)
+def _load_star_table():
+    """
+    星宿表的数组版本，供批量计算使用。
+    返回 (from_deg, year_number, lord_idx)，lord_idx 为 DASHA_LORDS 中的索引。
+    """
+    rows = _load_star_rows()
+    from_deg = np.array([float(r['From']) for r in rows])
+    year_number = np.array([float(r['YearNumber']) for r in rows])
+    lord_idx = np.array([DASHA_LORDS.index(r['Star-Lord']) for r in rows], dtype=np.int8)
+    for arr in (from_deg, year_number, lord_idx):
+        arr.setflags(write=False)
+    return from_deg, year_number, lord_idx
+
+def _to_utc_us(values):
+    """
+    把时间数组统一转换为 UTC 微秒整数 (int64，自 1970-01-01 起)。
+    支持：浮点儒略日 (UTC)、numpy datetime64 (视为 UTC)、带时区的 pandas 时间。
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and isinstance(values.dtype, pd.DatetimeTZDtype):
+        values = pd.DatetimeIndex(values).tz_convert('UTC').tz_localize(None)
+    arr = np.asarray(values)
+    if arr.dtype.kind in 'fiu':
+        # 儒略日 -> Unix 微秒 (JD 2440587.5 = 1970-01-01 00:00 UTC)
+        return np.round((arr.astype('float64') - 2440587.5) * 86400e6).astype('int64')
+    if arr.dtype.kind == 'O':
+        arr = pd.to_datetime(arr.ravel(), utc=True).tz_localize(None).values.reshape(arr.shape)
+    return arr.astype('datetime64[us]').astype('int64')
+
+@instrumented('seed_dasha_batch')
+def seed_dasha_batch(moon_lons, birth_utc, days_in_year=365.25):
+    """
+    批量计算多个命主的 Dasha 起点 (向量化版本的 _calculate_e_seconds + _calculate_dasha_start_time)。
+
+    参数:
+        moon_lons    : 月亮黄经数组 (度，恒星黄道)
+        birth_utc    : 出生 UTC 时刻数组，浮点儒略日或 datetime64 (UTC)，形状与 moon_lons 可广播
+        days_in_year : Dasha 计算中使用的年长度
+
+    返回:
+        (first_lord_idx, dasha_start_utc)
+        first_lord_idx  : int8 数组，DASHA_LORDS 中的索引 (DASHA_LORDS[i] 即主星简写)
+        dasha_start_utc : datetime64[us] 数组，Dasha 周期起始 UTC 时刻
+    """
+    from_deg, year_number, lord_idx = _load_star_table()
+
+    lon = np.mod(np.asarray(moon_lons, dtype='float64'), 360.0)
+    birth_us = _to_utc_us(birth_utc)
+    lon, birth_us = np.broadcast_arrays(lon, birth_us)
+    instrument.add_rows('seed_dasha_batch', lon.size)
+
+    # 1. 定位星宿区间 (表按 From 升序排列，Revati 结束于 360°)
+    star_idx = np.searchsorted(from_deg, lon, side='right') - 1
+
+    # 2. E = 年数 × 年长(秒) × 已走度数 / 13°20′，与 _calculate_e_seconds 相同的公式
+    traversed = lon - from_deg[star_idx]
+    e_seconds = year_number[star_idx] * (days_in_year * 86400.0) * traversed / 13.333333333333334
+
+    # 3. 与单条路径一致，截断到微秒后从出生时刻中减去
+    dasha_start_us = birth_us - np.floor(e_seconds * 1e6).astype('int64')
+    return lord_idx[star_idx], dasha_start_us.astype('datetime64[us]')
+
+@instrumented('label_dasha_index')
+def label_dasha_index(index, dasha_start, first_lord, dasa_config, chunk_size=1_000_000):
+    """
+    为一列时间戳 (如行情 K 线索引) 标注各层 Dasha 主星编码。
+
+    与把 _generate_dasha_intervals 的表按时间 merge-asof 到索引上等价，但不生成区间表：
+    每个时间戳在 120 年周期中的比例位置逐层定位到 9 段子周期中，全程为 numpy 向量运算。
+
+    参数:
+        index       : datetime64 数组 / DatetimeIndex (无时区视为 UTC)，或浮点 UTC 儒略日
+        dasha_start : Dasha 起点，_calculate_dasha_start_time 的返回值或 seed_dasha_batch 的 datetime64
+        first_lord  : 起始主星简写 (如 'Ra') 或 DASHA_LORDS 中的索引
+        dasa_config : 使用其中的 max_level (标注层数) 与 days_in_year
+        chunk_size  : 分块行数，限制中间数组的内存
+
+    返回:
+        DataFrame，列为 'L1' ... 'L{max_level}'，值为 int8 主星编码 (DASHA_LORDS 索引)，
+        不在 Dasha 120 年周期内的时间戳为 -1。若 index 为 DatetimeIndex 则作为结果索引。
+    """
+    max_level = dasa_config.get("max_level", 4)
+    days_in_year = dasa_config.get("days_in_year", 365.25)
+    first_idx = DASHA_LORDS.index(first_lord) if isinstance(first_lord, str) else int(first_lord)
+
+    start_us = int(_to_utc_us(dasha_start))
+    times_us = _to_utc_us(index).ravel()
+    cycle_us = 120.0 * days_in_year * 86400e6
+
+    n = len(times_us)
+    out = np.full((n, max_level), -1, dtype=np.int8)
+
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        u = (times_us[lo:hi] - start_us) / cycle_us
+        valid = (u >= 0.0) & (u < 1.0)
+        u = u[valid]
+        parent = np.full(len(u), first_idx, dtype=np.int64)
+        block = np.empty((len(u), max_level), dtype=np.int8)
+
+        for level in range(max_level):
+            # 在父主星对应的那一行边界中定位，得到第 j 段子周期
+            pos = np.searchsorted(_DASHA_CUM_FLAT, u + 2.0 * parent, side='right') - 1
+            j = np.clip(pos - 9 * parent, 0, 8)
+            left = _DASHA_CUM[parent, j]
+            width = _DASHA_CUM[parent, j + 1] - left
+            lord = (parent + j) % 9
+            block[:, level] = lord
+            # 换算为该子周期内的相对位置，作为下一层的输入
+            u = np.clip((u - left) / width, 0.0, np.nextafter(1.0, 0.0))
+            parent = lord
+
+        out[lo:hi][valid] = block
+
+    columns = [f"L{i + 1}" for i in range(max_level)]
+    result_index = index if isinstance(index, pd.Index) else None
+    instrument.add_rows('label_dasha_index', len(out))
+    return pd.DataFrame(out, columns=columns, index=result_index)
 
 def _calculate_e_seconds(moon_lon, days_in_year):
     """
@@ -27,11 +168,8 @@ def _calculate_e_seconds(moon_lon, days_in_year):
     """
     getcontext().prec = 20 # 设置高精度
     
-    # 1. 读取打包在库中的 star.csv 文件
-    star_file_path = pkg_resources.resource_filename('quant_astro', 'data/star.csv')
-    with open(star_file_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        star_data = [row for row in reader]
+    # 1. 读取打包在库中的 star.csv 文件 (进程内只解析一次)
+    star_data = _load_star_rows()
 
     # 2. 找到月亮所在的星宿区间
     lon = Decimal(str(moon_lon))
@@ -63,18 +201,20 @@ def _calculate_e_seconds(moon_lon, days_in_year):
     
     return E, moon_star_details['Star-Lord']
 
-def _calculate_dasha_start_time(birth_time_str, timezone_str, e_seconds):
+def _calculate_dasha_start_time(birth_time_str, timezone_str, e_seconds,
+                                ambiguous='raise', nonexistent='raise'):
     """
     根据E值计算Dasha周期的起始时间。
     对应您 notebook 中计算初始日期的单元格。
+    timezone_str 可为固定偏移或 IANA 时区名 (此时按出生当时的夏令时规则换算)。
     """
     getcontext().prec = 20
     
     # 1. 解析时间和时区
     initial_time = datetime.strptime(birth_time_str, "%Y-%m-%d %H:%M:%S.%f")
-    timezone_offset = _parse_timezone(timezone_str)
-    local_tz = pytz.FixedOffset(int(timezone_offset * 60))
-    initial_utc = local_tz.localize(initial_time).astimezone(pytz.utc)
+    timezone_offset = resolve_utc_offset(initial_time, timezone_str, ambiguous, nonexistent)
+    local_tz = get_tzinfo(timezone_str)
+    initial_utc = pytz.utc.localize(initial_time - timedelta(hours=timezone_offset))
     
     # 2. 高精度时间减法
     total_seconds_to_subtract = Decimal(str(e_seconds))
@@ -87,94 +227,71 @@ def _calculate_dasha_start_time(birth_time_str, timezone_str, e_seconds):
     
     return dasha_start_utc.astimezone(local_tz)
 
-def _generate_dasha_intervals(dasha_start_time, first_lord, dasa_config):
+def _iter_dasha_intervals(dasha_start_time, first_lord, dasa_config):
     """
-    生成所有层级的Dasha时间表。
-    对应您 notebook 中最终生成层级划分的单元格。
+    按时间顺序逐条产出 Dasha 区间 (level, planet, start, end)，不在内存中保留整张表。
+    深度优先遍历：父区间先于其第一个子区间产出，与 _generate_dasha_intervals 排序后的顺序一致。
+    内存只与层级深度有关，max_level=6 (53万行) 时也保持平稳。
     """
     getcontext().prec = 20
-    
-    # 1. 从配置中解包参数
+
     MAX_LEVEL = dasa_config.get("max_level", 4)
     OUTPUT_MODE = dasa_config.get("output_mode", "all")
     DAYS_IN_YEAR = dasa_config.get("days_in_year", 365.25)
-    
-    # 2. 行星周期定义 (与您的 notebook 保持一致)
-    planet_cycle = {
-        'Ke': {'value': 7, 'next': 'Ve'}, 'Ve': {'value': 20, 'next': 'Su'},
-        'Su': {'value': 6, 'next': 'Mo'}, 'Mo': {'value': 10, 'next': 'Ma'},
-        'Ma': {'value': 7, 'next': 'Ra'}, 'Ra': {'value': 18, 'next': 'Ju'},
-        'Ju': {'value': 16, 'next': 'Sa'}, 'Sa': {'value': 19, 'next': 'Me'},
-        'Me': {'value': 17, 'next': 'Ke'}
-    }
-    
+
     A = Decimal(str(DAYS_IN_YEAR)) * Decimal('86400')
-    planet_seconds = {p: Decimal(d['value']) * A for p, d in planet_cycle.items()}
+    planet_seconds = {p: Decimal(d['value']) * A for p, d in PLANET_CYCLE.items()}
 
-    # 3. 递归函数 (与您的 notebook 保持一致，非常棒的设计！)
-    def divide_interval(main_planet, start, end, level, max_level):
-        intervals = []
-        sub_periods_at_this_level = []
+    def divide_interval(main_planet, start, end, level):
+        # 与原递归函数相同的时间切分算法，只是改为边算边产出
         current_planet = main_planet
         current_start = start
         parent_total_seconds = Decimal((end - start).total_seconds())
 
         for _ in range(9):
-            planet_years = Decimal(planet_cycle[current_planet]['value'])
+            planet_years = Decimal(PLANET_CYCLE[current_planet]['value'])
             sub_seconds = (parent_total_seconds * planet_years) / Decimal(120)
             current_end = current_start + timedelta(seconds=float(sub_seconds))
-            sub_periods_at_this_level.append((f"L{level} {current_planet}", current_start, current_end))
-            current_planet = planet_cycle[current_planet]['next']
+            if OUTPUT_MODE == 'all' or level == MAX_LEVEL:
+                yield level, current_planet, current_start, current_end
+            if level < MAX_LEVEL:
+                yield from divide_interval(current_planet, current_start, current_end, level + 1)
+            current_planet = PLANET_CYCLE[current_planet]['next']
             current_start = current_end
-            
-        intervals.extend(sub_periods_at_this_level)
-
-        if level < max_level:
-            for name, sub_start, sub_end in sub_periods_at_this_level:
-                sub_main_planet = name.split()[-1]
-                deeper_intervals = divide_interval(sub_main_planet, sub_start, sub_end, level + 1, max_level)
-                intervals.extend(deeper_intervals)
-        
-        return intervals
-
-    # 4. 主逻辑
-    # 生成 Level 1
-    level1_intervals = []
+
+    # Level 1 使用整数年长度，其余层级按比例切分
     current_time = dasha_start_time
     current_planet = first_lord
     for _ in range(9):
-        seconds_to_add = planet_seconds[current_planet]
-        end_time = current_time + timedelta(seconds=float(seconds_to_add))
-        level1_intervals.append((f"L1 {current_planet}", current_time, end_time))
+        end_time = current_time + timedelta(seconds=float(planet_seconds[current_planet]))
+        if OUTPUT_MODE == 'all' or MAX_LEVEL == 1:
+            yield 1, current_planet, current_time, end_time
+        if MAX_LEVEL > 1:
+            yield from divide_interval(current_planet, current_time, end_time, 2)
         current_time = end_time
-        current_planet = planet_cycle[current_planet]['next']
-
-    # 生成更深层级
-    all_intervals = []
-    if OUTPUT_MODE == 'all':
-        all_intervals.extend(level1_intervals)
-        
-    for l1_name, l1_start, l1_end in level1_intervals:
-        main_planet = l1_name.split()[-1]
-        all_intervals.extend(divide_interval(main_planet, l1_start, l1_end, 2, MAX_LEVEL))
-
-    # 排序并格式化为 DataFrame
-    all_intervals.sort(key=lambda x: x[1])
-    
-    # 创建 DataFrame
-    final_data = []
-    for name, start, end in all_intervals:
-        level, planet = name.split()
-        final_data.append({
-            'Level': int(level[1:]),
+        current_planet = PLANET_CYCLE[current_planet]['next']
+
+def _iter_dasha_rows(dasha_start_time, first_lord, dasa_config):
+    """逐行产出与 _generate_dasha_intervals 列相同的字典 {'Level', 'Planet', 'date'}。"""
+    # IANA 时区下，每个日期按其自身所处的夏令时规则显示本地时间
+    tz = dasha_start_time.tzinfo
+    normalize = tz.normalize if isinstance(tz, pytz.tzinfo.DstTzInfo) else None
+    for level, planet, start, _ in _iter_dasha_intervals(dasha_start_time, first_lord, dasa_config):
+        if normalize is not None:
+            start = normalize(start)
+        yield {
+            'Level': level,
             'Planet': planet,
             'date': start.strftime('%Y-%m-%d %H:%M:%S.%f')
-        })
-        
-    df = pd.DataFrame(final_data)
-
-    # 根据 output_mode 筛选
-    if OUTPUT_MODE == 'present':
-        df = df[df['Level'] == MAX_LEVEL].reset_index(drop=True)
-        
-    return df
\ No newline at end of file
+        }
+
+def _generate_dasha_intervals(dasha_start_time, first_lord, dasa_config):
+    """
+    生成所有层级的Dasha时间表。
+    对应您 notebook 中最终生成层级划分的单元格。
+    """
+    # 生成器已按时间顺序产出，并已按 output_mode 筛选
+    return pd.DataFrame(
+        list(_iter_dasha_rows(dasha_start_time, first_lord, dasa_config)),
+        columns=['Level', 'Planet', 'date']
+    )
@@ -1,61 +1,203 @@
 # quant_astro/api.py
-from google.colab import files
-from .dasha_Vimshottari import _calculate_e_seconds, _calculate_dasha_start_time, _generate_dasha_intervals
+from .dasha_Vimshottari import _calculate_e_seconds, _calculate_dasha_start_time, _generate_dasha_intervals, _iter_dasha_rows
 from .core import _parse_local_time_and_convert_to_gregorian
-from IPython.display import display, FileLink
-import pandas as pd
+from . import instrument
+from .instrument import instrumented
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
 import os
 
-def create_dasha_table(planet_positions, birth_config, dasa_config):
-    """
-    一键生成Dasha表并提供下载链接。
-    这是您库的主要入口函数。
+# 无头写出支持的文件格式 (扩展名 -> 格式名)
+DASHA_FILE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
 
-    Args:
-        planet_positions (dict): 从 core.py 的 calculate_positions 函数获取的行星位置字典。
-        birth_config (dict): 包含出生信息的字典。
-        dasa_config (dict): 包含Dasha计算设置的字典。
-    """
-    print("🚀 Dasha 表生成开始...")
+DASHA_COLUMNS = ['Level', 'Planet', 'date']
 
-    # 1. 从输入中提取必要信息
-    # 遵循您的要求，直接从预先计算好的 planet_positions 字典中获取月亮经度
+def _prepare_dasha_seed(planet_positions, birth_config, dasa_config):
+    """
+    从行星位置与出生配置中得到 (dasha_start_time, first_lord, e_seconds)。
+    create_dasha_table 与无头 API 共用这一步，保证两条路径结果一致。
+    """
     try:
         moon_lon = planet_positions['Mo']['lon']
-        print(f"✅ 成功获取月亮经度: {moon_lon:.4f}°")
     except KeyError:
         raise ValueError("输入的 'planet_positions' 字典中缺少 'Mo' (月亮) 的数据。")
-    
+
     # 读取历法设置，立即将时间统一转换为格里历（与 core.py 保持一致）
     calendar = birth_config.get('calendar', 'g')
     _raw_time = birth_config["local_time_str"]
     if calendar.lower() == 'j':
+        # 日期经 calendars 模块整数换算，isoformat 保证年份补齐 4 位、微秒完整
         _greg_dt = _parse_local_time_and_convert_to_gregorian(_raw_time, 'j')
-        birth_time_str = _greg_dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+        birth_time_str = _greg_dt.isoformat(sep=' ', timespec='microseconds')
     else:
         birth_time_str = _raw_time
     timezone_str = birth_config["timezone_str"]
-    days_in_year = dasa_config["days_in_year"]
+    days_in_year = dasa_config.get("days_in_year", 365.25)
 
-    # 2. 调用 dasha.py 中的函数，分步执行计算
-    print("⏳ 正在计算 Dasha 周期的起始时间...")
     e_seconds, first_lord = _calculate_e_seconds(moon_lon, days_in_year)
+    dasha_start_time = _calculate_dasha_start_time(
+        birth_time_str, timezone_str, e_seconds,
+        birth_config.get('ambiguous', 'raise'), birth_config.get('nonexistent', 'raise')
+    )
+    return dasha_start_time, first_lord, e_seconds
+
+def create_dasha_table(planet_positions, birth_config, dasa_config):
+    """
+    一键生成Dasha表并提供下载链接。
+    这是您库的主要入口函数。
+
+    Args:
+        planet_positions (dict): 从 core.py 的 calculate_positions 函数获取的行星位置字典。
+        birth_config (dict): 包含出生信息的字典。
+        dasa_config (dict): 包含Dasha计算设置的字典。
+    """
+    # Colab 专用依赖只在此处按需导入，服务器端请使用 write_dasha_table / iter_dasha_rows
+    from google.colab import files
+
+    print("🚀 Dasha 表生成开始...")
+
+    # 1. 从输入中提取必要信息并计算起始时间
+    print("⏳ 正在计算 Dasha 周期的起始时间...")
+    dasha_start_time, first_lord, e_seconds = _prepare_dasha_seed(planet_positions, birth_config, dasa_config)
     print(f" - 起始主星 (First Lord): {first_lord}")
     print(f" - 计算出的偏移秒数 (E): {e_seconds:.4f}")
-    
-    dasha_start_time = _calculate_dasha_start_time(birth_time_str, timezone_str, e_seconds)
     print(f"✅ Dasha 周期起始本地时间: {dasha_start_time.strftime('%Y-%m-%d %H:%M:%S.%f')}")
 
-    # 3. 生成 Dasha 表格数据
+    # 2. 生成 Dasha 表格数据
     print("⏳ 正在生成所有层级的 Dasha 时间点...")
     dasha_df = _generate_dasha_intervals(dasha_start_time, first_lord, dasa_config)
     print(f"✅ 成功生成 {len(dasha_df)} 条 Dasha 记录。")
 
-    # 4. 保存为CSV并生成下载链接
+    # 3. 保存为CSV并生成下载链接
     output_filename = "dasha_table.csv"
     dasha_df.to_csv(output_filename, index=False, encoding='utf-8')
     print(f"📄 CSV文件 '{output_filename}' 已保存到当前工作目录。")
 
     # 使用 google.colab.files.download 来触发浏览器下载
     print("\n✨ 正在启动浏览器下载...")
-    files.download(output_filename)
\ No newline at end of file
+    files.download(output_filename)
+
+# ----------------- 无头 (Headless) 流式 API -----------------
+
+def iter_dasha_rows(planet_positions, birth_config, dasa_config):
+    """
+    以生成器形式逐行产出 Dasha 表，不构建 DataFrame、不写文件、不打印。
+    每行为 {'Level': int, 'Planet': str, 'date': 'YYYY-mm-dd HH:MM:SS.ffffff'}，
+    列与 create_dasha_table 生成的 CSV 完全一致。
+    """
+    dasha_start_time, first_lord, _ = _prepare_dasha_seed(planet_positions, birth_config, dasa_config)
+    return _iter_dasha_rows(dasha_start_time, first_lord, dasa_config)
+
+def _iter_chunks(rows, chunk_size):
+    """把行生成器切成固定大小的列表块。"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@instrumented('write_dasha_table')
+def write_dasha_table(planet_positions, birth_config, dasa_config, output_path,
+                      file_format=None, chunk_size=50000):
+    """
+    把 Dasha 表分块流式写入调用方指定的路径，适合服务器/批处理环境。
+
+    参数:
+        output_path : 输出文件路径
+        file_format : 'csv' / 'parquet' / 'ndjson'；为 None 时按扩展名推断
+        chunk_size  : 每块行数，内存占用只与该值有关，与 max_level 无关
+
+    返回:
+        写入的总行数
+
+    说明:
+        先写入同目录下的临时文件，完成后原子替换，失败时不会留下半截文件。
+        函数不依赖任何全局状态，多个命主可在不同进程中并行写出 (见 write_dasha_tables)。
+        parquet 格式需要额外安装 pyarrow。
+    """
+    if file_format is None:
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext not in DASHA_FILE_FORMATS:
+            raise ValueError(f"无法从扩展名推断输出格式: {output_path}，请显式传入 file_format。")
+        file_format = DASHA_FILE_FORMATS[ext]
+    file_format = file_format.lower()
+    if file_format not in ('csv', 'parquet', 'ndjson'):
+        raise ValueError(f"不支持的输出格式: {file_format}")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须为正整数。")
+
+    rows = iter_dasha_rows(planet_positions, birth_config, dasa_config)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    total = 0
+
+    try:
+        if file_format == 'csv':
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=DASHA_COLUMNS)
+                writer.writeheader()
+                for chunk in _iter_chunks(rows, chunk_size):
+                    writer.writerows(chunk)
+                    total += len(chunk)
+
+        elif file_format == 'ndjson':
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for chunk in _iter_chunks(rows, chunk_size):
+                    f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in chunk))
+                    total += len(chunk)
+
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("写出 parquet 需要安装 pyarrow: pip install pyarrow")
+
+            schema = pa.schema([('Level', pa.int8()), ('Planet', pa.string()), ('date', pa.string())])
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                for chunk in _iter_chunks(rows, chunk_size):
+                    writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                    total += len(chunk)
+                if total == 0:
+                    writer.write_table(schema.empty_table())
+
+        os.replace(tmp_path, output_path)
+        instrument.add_rows('write_dasha_table', total)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return total
+
+def _write_dasha_job(job):
+    """进程池任务：解包单个命主的参数并写出。"""
+    return write_dasha_table(
+        job['planet_positions'], job['birth_config'], job['dasa_config'], job['output_path'],
+        file_format=job.get('file_format'), chunk_size=job.get('chunk_size', 50000)
+    )
+
+def write_dasha_tables(jobs, max_workers=None):
+    """
+    并行写出多个命主的 Dasha 表。
+
+    参数:
+        jobs        : 列表，每项为 dict，包含 planet_positions / birth_config / dasa_config /
+                      output_path，可选 file_format / chunk_size
+        max_workers : 进程数，默认由 ProcessPoolExecutor 决定；为 1 时在当前进程顺序执行
+
+    返回:
+        与 jobs 顺序一致的行数列表
+    """
+    jobs = list(jobs)
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_write_dasha_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_write_dasha_job, jobs))
@@ -0,0 +1,230 @@
+# quant_astro/declinations.py
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .core import MINOR_PLANET_CATALOG
+from .search import (DEFAULT_TOLERANCE, ephemeris_flag, jd_range, jd_to_datetime64, sample_body,
+                     sign_changes, solve_root)
+
+# =============================================================================
+# 赤纬事件：出界 (Out of Bounds) 与平行 / 反平行的精确时刻
+#
+# 出界：|dec| 超过当时的真黄赤交角，函数 f = |dec| - ε 由负变正为 oob_start，由正变负为 oob_end。
+# 平行：dec1 - dec2 过零；反平行：dec1 + dec2 过零 (calculate_aspects 的单盘判定取的是这两者的容许度)。
+# 全部由赤道坐标 (swe.FLG_EQUATORIAL，dec 与 dec_speed) 在网格上找变号区间，再以赤纬速度为导数求根。
+# 星体可以是行星 / 交点 / MINOR_PLANET_CATALOG 小行星，也可以是 calculate_fixed_stars 接受的恒星名
+# (swe.fixstar2_ut 与 swe.calc_ut 单次开销相当，恒星同样逐点采样)。
+# 太阳与交点的黄纬恒为 0 (太阳只有几角秒)，|dec| 只会在至点附近贴着 ε 擦过，不判定出界。
+# 网格步长按星体选取 (月亮 0.5 天，其余 2 天)，星对取两者中较小的步长：
+# 某个星体 (或星对) 的结果只取决于它自己，与同时请求了哪些其他星体无关。
+# 网格步长之内的贴零擦过 (两星赤纬相切等) 可能只报告其中一部分。
+# 长时间范围按 chunk_days 分段计算，iter_declination_events 逐段产出结果，内存只与单段长度有关。
+# =============================================================================
+
+DECLINATION_BODIES = {
+    'Su': swe.SUN, 'Mo': swe.MOON, 'Me': swe.MERCURY, 'Ve': swe.VENUS, 'Ma': swe.MARS, 'Ju': swe.JUPITER,
+    'Sa': swe.SATURN, 'Ur': swe.URANUS, 'Ne': swe.NEPTUNE, 'Pl': swe.PLUTO, 'Ra': swe.MEAN_NODE,
+}
+DEFAULT_DECLINATION_BODIES = tuple(DECLINATION_BODIES)
+DECLINATION_EVENTS = ('oob_start', 'oob_end', 'parallel', 'contraparallel')
+
+# 网格步长 (天)：月亮 0.5 天 (月亮赤纬日变化可达 6°)，其余 2 天；_DEFAULT_STEP 须为 _MOON_STEP 的整数倍
+_MOON_STEP = 0.5
+_DEFAULT_STEP = 2.0
+
+# 不判定出界的星体：黄纬为 0 (或只有几角秒)，赤纬最多贴着黄赤交角擦过
+_NO_OOB_BODIES = ('Su', 'Ra', 'Ke')
+
+
+def _body_spec(name):
+    """星体名 -> ('body', swisseph 常量, 符号) 或 ('star', 恒星名, 1)；Ke 为 Ra 的赤纬取反。"""
+    if name == 'Ke':
+        return 'body', DECLINATION_BODIES['Ra'], -1.0
+    if name in DECLINATION_BODIES:
+        return 'body', DECLINATION_BODIES[name], 1.0
+    if name in MINOR_PLANET_CATALOG:
+        return 'body', MINOR_PLANET_CATALOG[name], 1.0
+    try:
+        swe.fixstar2_ut(name, 2451545.0, swe.FLG_SWIEPH)
+    except swe.Error as e:
+        raise ValueError(f"无法识别的星体或恒星: {name} ({e})") from None
+    return 'star', name, 1.0
+
+
+def _dec_function(spec, flag):
+    """单点赤纬：返回 jd -> (dec, dec_speed)。"""
+    kind, key, sign = spec
+    if kind == 'star':
+        def at(jd):
+            xx = swe.fixstar2_ut(key, jd, flag)[0]
+            return xx[1], xx[4]
+    else:
+        def at(jd):
+            xx = swe.calc_ut(jd, key, flag)[0]
+            return sign * xx[1], sign * xx[4]
+    return at
+
+
+def _sample_dec(spec, t, flag):
+    """网格赤纬与赤纬速度，形状 (len(t), 2)。"""
+    kind, key, sign = spec
+    if kind == 'body':
+        return sign * sample_body(t, key, flag, index=(1, 4))
+    fixstar = swe.fixstar2_ut
+    return np.array([fixstar(key, jd, flag)[0][1:5:3] for jd in t.tolist()]).reshape(-1, 2)
+
+
+def _obliquity(t):
+    return sample_body(t, swe.ECL_NUT, 0, index=(0,))[:, 0]
+
+
+def _oob_events(name, at, t, dec, eps, tol):
+    f = np.abs(dec[:, 0]) - eps
+
+    def fdf(jd):
+        d, v = at(jd)
+        return abs(d) - swe.calc_ut(jd, swe.ECL_NUT, 0)[0][0], np.sign(d) * v
+
+    events = []
+    for i in sign_changes(f):
+        jd = solve_root(fdf, t[i], t[i + 1], f[i], f[i + 1], tol=tol)
+        events.append(('oob_start' if f[i] < 0 else 'oob_end', name, None, jd, at(jd)[0]))
+    return events
+
+
+def _pair_events(names, functions, t, decs, a, b, kinds, tol):
+    """星对 (a[k], b[k]) 的平行 / 反平行：先对 (时刻, 星对) 矩阵统一找变号，再逐个求根。decs 形状 (len(t), n, 2)。"""
+    events = []
+    for kind in kinds:
+        sign = -1.0 if kind == 'parallel' else 1.0
+        g = decs[:, a, 0] + sign * decs[:, b, 0]
+        left, right = g[:-1], g[1:]
+        rows, cols = np.nonzero(((left < 0) & (right >= 0)) | ((left > 0) & (right <= 0)))
+        for i, k in zip(rows.tolist(), cols.tolist()):
+            at_a, at_b = functions[a[k]], functions[b[k]]
+
+            def fdf(jd):
+                (d1, v1), (d2, v2) = at_a(jd), at_b(jd)
+                return d1 + sign * d2, v1 + sign * v2
+
+            jd = solve_root(fdf, t[i], t[i + 1], g[i, k], g[i + 1, k], tol=tol)
+            events.append((kind, names[a[k]], names[b[k]], jd, at_a(jd)[0]))
+    return events
+
+
+def _chunk_events(names, specs, functions, steps, c0, c1, flag, events, tol):
+    # 各步长的网格都落在从 c0 起、间隔 step 的同一组格点上，结果与分段长度无关
+    grids, samples, obliquity = {}, {}, {}
+
+    def grid(step):
+        if step not in grids:
+            t = c0 + step * np.arange(int(np.ceil((c1 - c0) / step - 1e-9)) + 1)
+            t[-1] = c1
+            grids[step] = t
+        return grids[step]
+
+    def sample(k, step):
+        if (k, step) not in samples:
+            samples[(k, step)] = _sample_dec(specs[k], grid(step), flag)
+        return samples[(k, step)]
+
+    rows = []
+    if 'oob_start' in events or 'oob_end' in events:
+        for k, name in enumerate(names):
+            if name in _NO_OOB_BODIES:
+                continue
+            step = steps[k]
+            if step not in obliquity:
+                obliquity[step] = _obliquity(grid(step))
+            found = _oob_events(name, functions[k], grid(step), sample(k, step), obliquity[step], tol)
+            rows.extend(e for e in found if e[0] in events)
+
+    kinds = [kind for kind in ('parallel', 'contraparallel') if kind in events]
+    if kinds and len(names) > 1:
+        a, b = np.triu_indices(len(names), 1)
+        # Ra 与 Ke 的赤纬恒为相反数，不构成事件
+        keep = np.array([{names[i], names[j]} != {'Ra', 'Ke'} for i, j in zip(a, b)], dtype=bool)
+        a, b = a[keep], b[keep]
+        # 星对按两者中较小的步长分组，同组在同一网格上统一找变号
+        pair_steps = np.minimum(np.asarray(steps)[a], np.asarray(steps)[b])
+        for step in np.unique(pair_steps).tolist():
+            in_group = pair_steps == step
+            involved = set(a[in_group].tolist()) | set(b[in_group].tolist())
+            # 不在本组的星体不参与计算，以 NaN 占位 (保持 decs 按 names 索引)
+            decs = np.stack([sample(k, step) if k in involved else np.full((len(grid(step)), 2), np.nan)
+                             for k in range(len(names))], axis=1)
+            rows.extend(_pair_events(names, functions, grid(step), decs, a[in_group], b[in_group], kinds, tol))
+    return rows
+
+
+def _to_frame(rows, names):
+    df = pd.DataFrame(rows, columns=['event', 'p1', 'p2', 'jd_ut', 'dec'])
+    df = df.sort_values(['jd_ut'], kind='stable').reset_index(drop=True)
+    df['event'] = pd.Categorical(df['event'], categories=DECLINATION_EVENTS)
+    df['p1'] = pd.Categorical(df['p1'], categories=names)
+    df['p2'] = pd.Categorical(df['p2'], categories=names)
+    df.insert(4, 'time', jd_to_datetime64(df['jd_ut'].to_numpy()))
+    return df
+
+
+def iter_declination_events(start, end, bodies=DEFAULT_DECLINATION_BODIES, events=DECLINATION_EVENTS,
+                            ephe_path=None, tol=DEFAULT_TOLERANCE, chunk_days=365.25):
+    """
+    逐段产出赤纬事件 (每段一个 DataFrame，列同 find_declination_events)，适合几十上百年的长范围。
+    每段覆盖约 chunk_days 天 (取整到最大的网格步长)，段内按时间排序；跨段的顺序与时间顺序一致。
+    """
+    jd_start, jd_end = jd_range(start, end)
+    events = [events] if isinstance(events, str) else list(events)
+    unknown = [e for e in events if e not in DECLINATION_EVENTS]
+    if unknown:
+        raise ValueError(f"不支持的赤纬事件: {', '.join(unknown)}，可选: {', '.join(DECLINATION_EVENTS)}")
+    if not chunk_days > 0:
+        raise ValueError("chunk_days 必须为正数。")
+    names = list(dict.fromkeys([bodies] if isinstance(bodies, str) else bodies))
+    # 赤纬与黄道模式无关，一律取热带赤道坐标
+    flag = ephemeris_flag('tropical', ephe_path=ephe_path) | swe.FLG_EQUATORIAL
+    specs = [_body_spec(name) for name in names]
+    functions = [_dec_function(spec, flag) for spec in specs]
+    steps = [_MOON_STEP if name == 'Mo' else _DEFAULT_STEP for name in names]
+
+    # 分段长度取最大步长的整数倍，各步长的网格在段与段之间保持对齐
+    span = max(int(round(chunk_days / _DEFAULT_STEP)), 1) * _DEFAULT_STEP
+    for k in range(int(np.ceil((jd_end - jd_start) / span))):
+        c0 = jd_start + k * span
+        c1 = min(c0 + span, jd_end)
+        _t = instrument.start()
+        rows = _chunk_events(names, specs, functions, steps, c0, c1, flag, events, tol)
+        # 段首的事件归上一段 (首段除外)，避免重复
+        rows = [row for row in rows if (c0 < row[3] or c0 == jd_start) and row[3] <= c1]
+        instrument.stop('iter_declination_events.chunk', _t)
+        instrument.add_rows('iter_declination_events', len(rows))
+        yield _to_frame(rows, names)
+
+
+@instrumented('find_declination_events')
+def find_declination_events(start, end, bodies=DEFAULT_DECLINATION_BODIES, events=DECLINATION_EVENTS,
+                            ephe_path=None, tol=DEFAULT_TOLERANCE, chunk_days=365.25):
+    """
+    查找时间范围内的出界期与平行 / 反平行的精确时刻。
+
+    参数:
+        start, end : 起止时间 (儒略日 UT、numpy.datetime64 或 UTC datetime)
+        bodies     : 星体简写 (DECLINATION_BODIES、'Ke'、MINOR_PLANET_CATALOG) 或恒星名 (如 'Spica', 'Regulus')
+        events     : DECLINATION_EVENTS 的子集
+        tol        : 求根精度 (天)
+        chunk_days : 分段长度 (天)，见 iter_declination_events
+
+    返回:
+        DataFrame，按时间排序，列为
+        event, p1, p2 (出界事件为空), jd_ut, time (UTC datetime64), dec (p1 在事件时刻的赤纬)
+        出界期即同一星体相邻的 oob_start 与 oob_end 之间；Su、Ra、Ke 不产生出界事件。
+    """
+    names = list(dict.fromkeys([bodies] if isinstance(bodies, str) else bodies))
+    parts = list(iter_declination_events(start, end, names, events, ephe_path, tol, chunk_days))
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    df['event'] = pd.Categorical(df['event'], categories=DECLINATION_EVENTS)
+    return df
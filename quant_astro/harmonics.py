@@ -0,0 +1,235 @@
+# quant_astro/harmonics.py
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from . import instrument
+from .instrument import instrumented
+from .aspects import is_applying, get_shortest_distance
+
+# =============================================================================
+# 谐波盘 (Harmonic Charts)
+#
+# 第 n 谐波盘的位置 = 黄经 × n (取 360 的模)。本命中相距 360k/n 的两颗星在第 n 谐波盘中合相，
+# 因此在各谐波盘中找合相，就一次得到了该谐波的全部相位 (H5 的 72°/144°、H7 的 51.43° 等)。
+# 合相检测：把每一行 (一个时刻/一张星盘的一个谐波盘) 的位置排序 (0° 附近按容许度环绕延伸)，
+# 每个星体用二分查找取出其后 orb 以内的星体，每对只出现一次；
+# 多行拼成一个有序数组 (第 r 行平移 r × stride)，一次 argsort、一次 searchsorted 完成整块。
+# =============================================================================
+
+DEFAULT_HARMONIC_ORB = 8.0
+
+
+def _check_harmonics(harmonics):
+    harmonics = [harmonics] if np.isscalar(harmonics) else list(harmonics)
+    for h in harmonics:
+        if int(h) != h or h < 1:
+            raise ValueError(f"谐波必须是正整数，收到: {h!r}")
+    if not harmonics:
+        raise ValueError("harmonics 不能为空。")
+    return list(dict.fromkeys(int(h) for h in harmonics))
+
+
+def harmonic_longitudes(lons, harmonics):
+    """
+    谐波盘位置。
+
+    lons      : 任意形状的黄经数组
+    harmonics : 谐波列表 (如 [5, 7, 9])
+    返回形状 lons.shape + (len(harmonics),) 的数组，值为 (lon × n) % 360
+    """
+    harmonics = _check_harmonics(harmonics)
+    lons = np.asarray(lons, dtype='float64')
+    return (lons[..., None] * np.asarray(harmonics, dtype='float64')) % 360.0
+
+
+def _pair_limits(names, orb):
+    """
+    orb 为数值时所有星对相同；为 {星体名: 容许度} 字典 (parse_orb_config 的结果) 时
+    按 calculate_aspects 的规则取两者的平均值。返回 N×N 矩阵 (谐波盘中的度数)。
+    """
+    if isinstance(orb, dict):
+        orbs = np.array([float(orb.get(name, 0.0)) for name in names])
+        limits = (orbs[:, None] + orbs[None, :]) / 2.0
+    else:
+        limits = np.full((len(names), len(names)), float(orb))
+    if limits.size and not (0 <= limits.min() and limits.max() < 180):
+        raise ValueError("谐波盘中的容许度必须在 [0, 180) 内。")
+    return limits
+
+
+def _conjunctions_block(values, max_orb):
+    """
+    values: (R, N) 谐波盘位置 (0–360)。
+    返回 (row, a, b, sep)：第 row 行中 a、b 两星的谐波盘间距 sep ≤ max_orb (每对一次)。
+    """
+    R, N = values.shape
+    flat = values.ravel()
+    rows = np.repeat(np.arange(R), N)
+    bodies = np.tile(np.arange(N), R)
+
+    # 0° 附近的星体复制到 360° 之后，跨 0° 的星对由靠近 360° 的星体向后查到
+    wrap = flat < max_orb
+    v = np.concatenate([flat, flat[wrap] + 360.0])
+    r = np.concatenate([rows, rows[wrap]])
+    c = np.concatenate([bodies, bodies[wrap]])
+    original = np.concatenate([np.ones(R * N, dtype=bool), np.zeros(int(wrap.sum()), dtype=bool)])
+
+    stride = 360.0 + 2.0 * max_orb + 1.0
+    keys = r * stride + v
+    order = np.argsort(keys, kind='stable')
+    keys, v, c, original = keys[order], v[order], c[order], original[order]
+
+    # 只从原始位置向后查找：[s + 1, stop)
+    start = np.flatnonzero(original)
+    stop = np.searchsorted(keys, keys[start] + max_orb, side='right')
+    counts = stop - start - 1
+    total = int(counts.sum())
+    owner = np.repeat(start, counts)
+    pos = owner + 1 + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+
+    row = np.repeat(r[order][start], counts)
+    a, b = c[owner], c[pos]
+    sep = v[pos] - v[owner]
+    return row, np.minimum(a, b), np.maximum(a, b), sep
+
+
+def _natal_angles(lon_a, lon_b, harmonic):
+    """谐波合相对应的本命相位角 360k/n、k 与本命最短角距。"""
+    delta = np.abs(lon_a - lon_b) % 360.0
+    dist = np.minimum(delta, 360.0 - delta)
+    k = np.rint(dist * harmonic / 360.0)
+    return 360.0 * k / harmonic, k.astype('int64'), dist
+
+
+@instrumented('calculate_harmonic_aspects')
+def calculate_harmonic_aspects(planet_pos, harmonics, orb=DEFAULT_HARMONIC_ORB, primary_only=False):
+    """
+    单张星盘的谐波相位，记录格式与 calculate_aspects 的 orb_mode 相同。
+
+    参数:
+        planet_pos   : 位置字典 (calculate_positions 的行星/宫头等，需含 'lon'，入/出相位用 'speed')
+        harmonics    : 谐波列表，如 [5, 7, 9]
+        orb          : 谐波盘中的合相容许度 (度)；也可为 {星体名: 容许度} 字典，按两者平均值判罚。
+                       对应本命容许度为 orb / n
+        primary_only : 只保留 gcd(k, n) = 1 的相位 (不重复报告更低谐波已有的相位，如 H9 中的 120°)
+
+    返回:
+        列表，每项为 {'p1', 'p2', 'type' ('H5' 等), 'angle_def' (本命相位角), 'actual_dist',
+        'orb' (本命度数), 'state' ('A'/'S'/'E'), 'harmonic'}，按 (谐波, p1, p2) 排序
+    """
+    harmonics = _check_harmonics(harmonics)
+    names = list(planet_pos)
+    lons = np.array([float(planet_pos[name]['lon']) for name in names])
+    limits = _pair_limits(names, orb)
+    if len(names) < 2:
+        return []
+
+    values = harmonic_longitudes(lons, harmonics).T
+    row, a, b, sep = _conjunctions_block(values, limits.max())
+    keep = sep <= limits[a, b]
+    row, a, b, sep = row[keep], a[keep], b[keep], sep[keep]
+
+    results = []
+    for k in np.lexsort((b, a, row)):
+        h = harmonics[row[k]]
+        p1, p2 = names[a[k]], names[b[k]]
+        angle, multiple, dist = _natal_angles(lons[a[k]], lons[b[k]], h)
+        if primary_only and math.gcd(int(multiple), h) != 1:
+            continue
+        angle = float(angle)
+        results.append({
+            'p1': p1,
+            'p2': p2,
+            'type': f"H{h}",
+            'angle_def': angle,
+            'actual_dist': round(get_shortest_distance(float(lons[a[k]]), float(lons[b[k]])), 10),
+            'orb': round(float(sep[k]) / h, 10),
+            'state': is_applying(planet_pos[p1], planet_pos[p2], angle),
+            'harmonic': h,
+        })
+    instrument.add_rows('calculate_harmonic_aspects', len(results))
+    return results
+
+
+@instrumented('harmonic_aspects_series')
+def harmonic_aspects_series(lons, names, harmonics, orb=DEFAULT_HARMONIC_ORB, speeds=None,
+                            primary_only=False, max_block_cells=250_000):
+    """
+    批量版：R 行 (行运时刻序列，或多张本命盘) × N 个星体，对每一行的每个谐波盘检测合相。
+
+    :param lons:            R×N 黄经数组
+    :param names:           长度 N 的星体名 (p1 / p2 列的类别，orb 为字典时用于查容许度)
+    :param harmonics:       谐波列表
+    :param orb:             谐波盘中的合相容许度，数值或 {星体名: 容许度} 字典
+    :param speeds:          R×N 黄经日速度，用于判断入/出相位；不传则 applying 全为 False
+    :param primary_only:    只保留 gcd(k, n) = 1 的相位
+    :param max_block_cells: 每块处理的 (行 × 谐波 × 星体) 上限，控制峰值内存 (排序数组随之增长，默认约 40 MB)
+    :return: DataFrame，每行一个命中，列为
+             t (行索引), p1, p2 (Categorical 星体名), harmonic, type (Categorical, 'H5' 等),
+             angle_def, actual_dist, orb (本命度数), applying
+    """
+    harmonics = _check_harmonics(harmonics)
+    lons = np.atleast_2d(np.asarray(lons, dtype='float64'))
+    R, N = lons.shape
+    if len(names) != N:
+        raise ValueError("names 的长度必须与经度数组的列数一致。")
+    if speeds is not None:
+        speeds = np.atleast_2d(np.asarray(speeds, dtype='float64'))
+        if speeds.shape != lons.shape:
+            raise ValueError("speeds 的形状必须与 lons 相同。")
+    limits = _pair_limits(names, orb)
+    H = len(harmonics)
+    harmonic_arr = np.asarray(harmonics, dtype='int64')
+
+    parts = []
+    block = max(1, max_block_cells // max(H * N, 1))
+    for t0 in range(0, R if N >= 2 else 0, block):
+        chunk = lons[t0:t0 + block]
+        # (行, 谐波, 星体) -> (行 × 谐波, 星体)
+        values = harmonic_longitudes(chunk, harmonics).transpose(0, 2, 1).reshape(-1, N)
+        row, a, b, sep = _conjunctions_block(values, limits.max())
+        keep = sep <= limits[a, b]
+        t_idx, h_idx = np.divmod(row[keep], H)
+        parts.append((t_idx + t0, h_idx, a[keep], b[keep], sep[keep]))
+
+    if parts:
+        t_idx, h_idx, a, b, sep = (np.concatenate(col) for col in zip(*parts))
+    else:
+        t_idx = h_idx = a = b = np.empty(0, dtype='int64')
+        sep = np.empty(0)
+    h = harmonic_arr[h_idx]
+    lon_a, lon_b = lons[t_idx, a], lons[t_idx, b]
+    angle, multiple, dist = _natal_angles(lon_a, lon_b, h)
+    if primary_only:
+        coprime = np.gcd(multiple, h) == 1
+        t_idx, h_idx, a, b, sep, h = t_idx[coprime], h_idx[coprime], a[coprime], b[coprime], sep[coprime], h[coprime]
+        lon_a, lon_b, angle, dist = lon_a[coprime], lon_b[coprime], angle[coprime], dist[coprime]
+
+    if speeds is not None:
+        # 与 calculate_transit_aspects 相同：|dist - angle| 的时间导数小于 0 即入相位
+        d = lon_a - lon_b
+        d = (d + 180.0) % 360.0 - 180.0
+        v = speeds[t_idx, a] - speeds[t_idx, b]
+        applying = (np.sign(dist - angle) * np.sign(d) * v) < 0
+    else:
+        applying = np.zeros(len(t_idx), dtype=bool)
+
+    order = np.lexsort((b, a, h_idx, t_idx))
+    categories = list(names)
+    type_categories = [f"H{n}" for n in harmonics]
+    df = pd.DataFrame({
+        't': t_idx[order].astype('int64'),
+        'p1': pd.Categorical.from_codes(a[order], categories=categories),
+        'p2': pd.Categorical.from_codes(b[order], categories=categories),
+        'harmonic': h[order].astype('int32'),
+        'type': pd.Categorical.from_codes(h_idx[order], categories=type_categories),
+        'angle_def': angle[order],
+        'actual_dist': dist[order],
+        'orb': sep[order] / h[order],
+        'applying': applying[order].astype(bool),
+    })
+    instrument.add_rows('harmonic_aspects_series', len(df))
+    return df
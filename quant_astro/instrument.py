@@ -0,0 +1,166 @@
+# quant_astro/instrument.py
+
+import os
+import json
+import time
+import functools
+from collections import Counter
+
+import swisseph as swe
+
+# =============================================================================
+# 可选的性能埋点 (默认关闭)
+#
+# 开启后按进程汇总：
+#   · stages    : 各阶段的调用次数、累计/最大耗时 (perf_counter)
+#   · swe_calls : 每个 swisseph 函数的调用次数 (开启时临时包装 swe 模块函数)
+#   · cache     : 持久化缓存按命名空间的命中/未命中次数
+#   · rows      : 批量接口处理的行数
+# 关闭时埋点只剩一次全局布尔判断。
+# =============================================================================
+
+_ENABLED = False
+_CALLBACK = None
+_DEPTH = 0
+
+_STAGES = {}
+_SWE_CALLS = Counter()
+_CACHE = {}
+_ROWS = Counter()
+
+# 被包装前的 swisseph 原始函数，关闭时据此还原
+_SWE_ORIGINALS = {}
+
+
+# ----------------- 开关 -----------------
+
+def enable_instrumentation(callback=None):
+    """
+    开启埋点。
+    callback 若提供，每次最外层入口函数 (如 calculate_positions) 结束后
+    以当前快照 (dict) 调用一次，可用于推送到外部监控。
+    """
+    global _ENABLED, _CALLBACK
+    _CALLBACK = callback
+    if not _ENABLED:
+        _patch_swisseph()
+        _ENABLED = True
+
+def disable_instrumentation():
+    """关闭埋点并还原 swisseph 函数；已收集的数据保留，可继续读取快照。"""
+    global _ENABLED, _CALLBACK
+    _ENABLED = False
+    _CALLBACK = None
+    _unpatch_swisseph()
+
+def reset_instrumentation():
+    """清空已收集的数据。"""
+    _STAGES.clear()
+    _SWE_CALLS.clear()
+    _CACHE.clear()
+    _ROWS.clear()
+
+def is_enabled():
+    return _ENABLED
+
+
+# ----------------- swisseph 调用计数 -----------------
+
+def _counting(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _SWE_CALLS[name] += 1
+        return func(*args, **kwargs)
+    return wrapper
+
+def _patch_swisseph():
+    # 各模块都以 swe.xxx 的形式在调用时查找属性，因此替换模块属性即可覆盖全部调用
+    for name in dir(swe):
+        if name.startswith('_') or name in _SWE_ORIGINALS:
+            continue
+        func = getattr(swe, name)
+        if type(func).__name__ == 'builtin_function_or_method':
+            _SWE_ORIGINALS[name] = func
+            setattr(swe, name, _counting(name, func))
+
+def _unpatch_swisseph():
+    for name, func in _SWE_ORIGINALS.items():
+        setattr(swe, name, func)
+    _SWE_ORIGINALS.clear()
+
+
+# ----------------- 记录 -----------------
+
+def start():
+    """阶段开始：返回计时令牌，未开启时返回 None。与 stop 成对使用。"""
+    return time.perf_counter() if _ENABLED else None
+
+def stop(name, token):
+    """阶段结束：把自 start 以来的耗时记到 name 名下。"""
+    if token is None:
+        return
+    elapsed = time.perf_counter() - token
+    stats = _STAGES.get(name)
+    if stats is None:
+        _STAGES[name] = [1, elapsed, elapsed]
+    else:
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+
+def add_rows(name, count):
+    """记录批量接口处理的行数。"""
+    if _ENABLED:
+        _ROWS[name] += int(count)
+
+def record_cache(namespace, hit):
+    """记录一次缓存查询结果 (由 cache.cached 调用)。"""
+    if _ENABLED:
+        counts = _CACHE.setdefault(namespace, [0, 0])
+        counts[0 if hit else 1] += 1
+
+def instrumented(name):
+    """
+    入口函数装饰器：记录整次调用的耗时，最外层调用结束时触发回调。
+    未开启时只多一次全局变量判断。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global _DEPTH
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            token = time.perf_counter()
+            _DEPTH += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _DEPTH -= 1
+                stop(name, token)
+                if _DEPTH == 0 and _CALLBACK is not None:
+                    _CALLBACK(snapshot())
+        return wrapper
+    return decorator
+
+
+# ----------------- 导出 -----------------
+
+def snapshot():
+    """当前进程的埋点数据快照 (可直接 json 序列化)。"""
+    return {
+        'pid': os.getpid(),
+        'enabled': _ENABLED,
+        'stages': {
+            name: {'calls': s[0], 'total_s': s[1], 'mean_s': s[1] / s[0], 'max_s': s[2]}
+            for name, s in sorted(_STAGES.items())
+        },
+        'swe_calls': dict(sorted(_SWE_CALLS.items())),
+        'cache': {ns: {'hits': c[0], 'misses': c[1]} for ns, c in sorted(_CACHE.items())},
+        'rows': dict(sorted(_ROWS.items())),
+    }
+
+def snapshot_json(**json_kwargs):
+    """快照的 JSON 字符串。"""
+    json_kwargs.setdefault('ensure_ascii', False)
+    return json.dumps(snapshot(), **json_kwargs)
@@ -3,7 +3,77 @@
 import pandas as pd
 import numpy as np
 import pkg_resources
+from functools import lru_cache
+from .cache import cached
+from . import instrument
+from .instrument import instrumented
 
+# kp_lords_at 的输出列 -> sub-sub.csv 中的列名
+KP_LORD_COLUMNS = {
+    'sign': 'Sign',
+    'star': 'Star',
+    'sign_lord': 'Sign-Lord',
+    'star_lord': 'Star-Lord',
+    'sub_lord': 'Sub-Lord',
+    'sub_sub_lord': 'Sub-Sub-Lord',
+}
+
+@lru_cache(maxsize=None)
+def _load_kp_table():
+    """
+    读取 data/sub-sub.csv 并缓存 (进程内只解析一次)。
+    返回 (from_arr, to_arr, records)；表按 From 升序排列、首尾相接，To 为 0 的末行视为 360。
+    """
+    # 使用 pkg_resources 来安全地获取包内数据文件的路径
+    csv_path = pkg_resources.resource_filename('quant_astro', 'data/sub-sub.csv')
+    df = pd.read_csv(csv_path)
+    df['To'] = np.where(df['To'] == 0, 360.0, df['To'])
+    from_arr = df['From'].values.astype('float64')
+    to_arr = df['To'].values.astype('float64')
+    for arr in (from_arr, to_arr):
+        arr.setflags(write=False)
+    return from_arr, to_arr, tuple(df.to_dict('records'))
+
+@lru_cache(maxsize=None)
+def _load_kp_codes():
+    """
+    kp_lords_at 使用的编码表：每列一个 (类别列表, 每行的类别编码) 对，另附 paada 数组。
+    """
+    _, _, records = _load_kp_table()
+    columns = {}
+    for key, column in KP_LORD_COLUMNS.items():
+        values = [row[column] for row in records]
+        categories = list(dict.fromkeys(values))
+        index = {value: k for k, value in enumerate(categories)}
+        columns[key] = (categories, np.array([index[v] for v in values], dtype='int16'))
+    paada = np.array([row['paada'] for row in records], dtype='int8')
+    return columns, paada
+
+def kp_lords_at(lons):
+    """
+    向量化的 KP 星主查询。
+
+    lons : 任意形状的黄经数组 (度，可为负或大于 360；NaN 对应空行)
+    返回 DataFrame (行按 lons 展平后的顺序)，列为
+        sign, star, sign_lord, star_lord, sub_lord, sub_sub_lord (Categorical), paada, sign_degree
+    与 get_kp_lords 对同一经度给出的结果相同。
+    """
+    from_arr, _, _ = _load_kp_table()
+    columns, paada = _load_kp_codes()
+    lons = np.asarray(lons, dtype='float64').ravel() % 360.0
+    valid = ~np.isnan(lons)
+    row = np.searchsorted(from_arr, lons, side='right') - 1
+    row = np.where(valid, np.clip(row, 0, len(from_arr) - 1), 0)
+
+    data = {}
+    for key, (categories, codes) in columns.items():
+        data[key] = pd.Categorical.from_codes(np.where(valid, codes[row], -1), categories=categories)
+    data['paada'] = pd.arrays.IntegerArray(paada[row], ~valid)
+    data['sign_degree'] = lons % 30
+    return pd.DataFrame(data)
+
+@instrumented('get_kp_lords')
+@cached('get_kp_lords')
 def get_kp_lords(planet_dict, house_dict):
     """
     为行星和宫位分别查找KP星主信息。
@@ -15,15 +85,10 @@ def get_kp_lords(planet_dict, house_dict):
     返回:
         (planet_results, house_results): 两个独立的字典
     """
-    # 使用 pkg_resources 来安全地获取包内数据文件的路径
-    csv_path = pkg_resources.resource_filename('quant_astro', 'data/sub-sub.csv')
-    
-    df = pd.read_csv(csv_path)
-    df['To'] = np.where(df['To'] == 0, 360.0, df['To'])
-    
-    from_arr = df['From'].values.astype('float64')
-    to_arr = df['To'].values.astype('float64')
-    records = df.to_dict('records')
+    # 星主表在进程内只解析一次
+    _t = instrument.start()
+    from_arr, to_arr, records = _load_kp_table()
+    instrument.stop('get_kp_lords.load_table', _t)
 
     # 定义一个内部函数来处理单个字典，避免代码重复
     def process_single_dict(input_dict):
@@ -55,6 +120,7 @@ def get_kp_lords(planet_dict, house_dict):
     return planet_results, house_results
 
 
+@instrumented('get_significators')
 def get_significators(planet_pos, house_pos, kp_planet_results, kp_house_results):
     """
     计算KP占星中的行星象征星(Planet Significators)和宫位象征星(House Significators)。
@@ -0,0 +1,286 @@
+# quant_astro/lunations.py
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .cache import cached
+from .kp import kp_lords_at
+from .search import (DEFAULT_TOLERANCE, ephemeris_flag, jd_range, to_jd_array, jd_to_datetime64, time_grid,
+                     wrap180, sign_changes, solve_root, hermite)
+from .core import _ensure_ephe_path
+
+# =============================================================================
+# 朔望、月相与日月食日历
+#
+# 月相由日月距角 (月亮黄经 - 太阳黄经) 决定：0° 朔、90° 上弦、180° 望、270° 下弦。
+# 距角每天增加 10–16°，以 1 天为步长采样即可保证每个目标角在一个区间内至多穿越一次；
+# 各目标角直接对 wrap180(距角 - 目标) 求根，导数为日月速度差。
+# 日月食用 swisseph 的全球食搜索 (sol_eclipse_when_glob / lun_eclipse_when)，并记录食点度数的 KP 星主。
+# 结果可经持久化缓存按 (时间范围, 参数) 保存在磁盘上 (见 enable_cache)。
+# phase_at 对任意时间数组给出月相：按年分块解出每 30° 的距角节点 (带缓存)，
+# 节点之间用三次 Hermite 插值 (节点处的值与导数都是精确的)，不再逐点调用星历。
+# =============================================================================
+
+LUNATION_EVENTS = {
+    'new_moon': 0.0,
+    'first_quarter': 90.0,
+    'full_moon': 180.0,
+    'last_quarter': 270.0,
+}
+# 八分月相：以四个主相位为中心、各占 45°
+MOON_PHASES = ('new_moon', 'waxing_crescent', 'first_quarter', 'waxing_gibbous',
+               'full_moon', 'waning_gibbous', 'last_quarter', 'waning_crescent')
+ECLIPSE_KINDS = ('solar', 'lunar')
+
+_GRID_STEP = 1.0            # 距角采样步长 (天)
+_KNOT_SPACING = 30.0        # phase_at 的节点间隔 (度)
+_BLOCK_DAYS = 365.25        # phase_at 的分块长度 (天)
+_BLOCK_PAD = 32.0           # 分块前后延伸，保证块内每个时刻都有前一个朔
+_J2000 = 2451545.0
+
+
+def _elongation(jd, flag):
+    """(距角 0–360, 距角速度 度/日, 太阳黄经, 月亮黄经)"""
+    sun = swe.calc_ut(jd, swe.SUN, flag)[0]
+    moon = swe.calc_ut(jd, swe.MOON, flag)[0]
+    return (moon[0] - sun[0]) % 360.0, moon[3] - sun[3], sun[0] % 360.0, moon[0] % 360.0
+
+
+def _solve_elongations(jd_start, jd_end, targets, flag, tol):
+    """
+    [jd_start, jd_end] 内距角等于各目标角的全部时刻。
+    返回按时间排序的 (jd, 目标索引) 数组。
+    """
+    t = time_grid(jd_start - _GRID_STEP, jd_end + _GRID_STEP, _GRID_STEP)
+    elong = np.array([_elongation(jd, flag)[0] for jd in t.tolist()])
+
+    def fdf_for(target):
+        def fdf(jd):
+            value, rate = _elongation(jd, flag)[:2]
+            return float(wrap180(value - target)), rate
+        return fdf
+
+    times, which = [], []
+    for k, target in enumerate(targets):
+        f = wrap180(elong - target)
+        fdf = fdf_for(target)
+        # 只取由负变正的穿越；wrap180 在 ±180° 处由正跳到负，不是根
+        for i in sign_changes(f):
+            if f[i] < 0:
+                times.append(solve_root(fdf, t[i], t[i + 1], f[i], f[i + 1], tol=tol))
+                which.append(k)
+    times, which = np.array(times, dtype='float64'), np.array(which, dtype='int64')
+    keep = (times >= jd_start) & (times <= jd_end)
+    order = np.argsort(times[keep], kind='stable')
+    return times[keep][order], which[keep][order]
+
+
+def _kp_columns(lons):
+    kp = kp_lords_at(lons)
+    return {key: kp[key].to_numpy() for key in ('sign', 'star', 'star_lord', 'sub_lord')}
+
+
+@instrumented('find_lunations')
+@cached('find_lunations')
+def find_lunations(start, end, events=tuple(LUNATION_EVENTS), ecliptic_mode='sidereal',
+                   ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None, tol=DEFAULT_TOLERANCE):
+    """
+    朔、望与上下弦的精确时刻。
+
+    参数:
+        start, end : 起止时间 (儒略日 UT、numpy.datetime64 或 UTC datetime)
+        events     : LUNATION_EVENTS 中的事件名
+        ecliptic_mode / ayanamsha_mode / ephe_path : 与 calculate_positions 相同，只影响输出的黄经与 KP 星主
+                                                     (距角与黄道模式无关)
+    返回:
+        DataFrame，按时间排序，列为
+        event, jd_ut, time (UTC datetime64), sun_lon, moon_lon,
+        sign, star, star_lord, sub_lord (月亮黄经处的 KP 星主)
+    """
+    unknown = [e for e in events if e not in LUNATION_EVENTS]
+    if unknown:
+        raise ValueError(f"不支持的月相事件: {', '.join(unknown)}，可选: {', '.join(LUNATION_EVENTS)}")
+    events = list(events)
+    jd_start, jd_end = jd_range(start, end)
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+
+    times, which = _solve_elongations(jd_start, jd_end, [LUNATION_EVENTS[e] for e in events], flag, tol)
+    positions = np.array([_elongation(jd, flag)[2:] for jd in times.tolist()]).reshape(-1, 2)
+    df = pd.DataFrame({
+        'event': pd.Categorical.from_codes(which, categories=events),
+        'jd_ut': times,
+        'time': jd_to_datetime64(times),
+        'sun_lon': positions[:, 0],
+        'moon_lon': positions[:, 1],
+        **_kp_columns(positions[:, 1]),
+    })
+    instrument.add_rows('find_lunations', len(df))
+    return df
+
+
+def _eclipse_type(retflag, kind):
+    if kind == 'solar':
+        if retflag & swe.ECL_ANNULAR_TOTAL:
+            return 'hybrid'
+        if retflag & swe.ECL_TOTAL:
+            return 'total'
+        if retflag & swe.ECL_ANNULAR:
+            return 'annular'
+        return 'partial'
+    if retflag & swe.ECL_TOTAL:
+        return 'total'
+    if retflag & swe.ECL_PARTIAL:
+        return 'partial'
+    return 'penumbral'
+
+
+@instrumented('find_eclipses')
+@cached('find_eclipses')
+def find_eclipses(start, end, kinds=ECLIPSE_KINDS, ecliptic_mode='sidereal',
+                  ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None):
+    """
+    日食与月食 (全球)。
+
+    参数:
+        start, end : 起止时间
+        kinds      : ('solar', 'lunar') 的子集
+        ecliptic_mode / ayanamsha_mode / ephe_path : 食点黄经与 KP 星主所用的黄道
+    返回:
+        DataFrame，按食甚时刻排序，列为
+        event ('solar_eclipse' / 'lunar_eclipse'), eclipse_type (total / annular / hybrid / partial / penumbral),
+        jd_ut (食甚), time, begin_jd, end_jd (初亏与复圆；半影月食为半影食始末),
+        lon (食点黄经：日食取太阳，月食取月亮), sign, star, star_lord, sub_lord
+    """
+    unknown = [k for k in kinds if k not in ECLIPSE_KINDS]
+    if unknown:
+        raise ValueError(f"kinds 只能取 {ECLIPSE_KINDS}，收到: {unknown}")
+    jd_start, jd_end = jd_range(start, end)
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+    search_flag = swe.FLG_SWIEPH
+
+    rows = []
+    for kind in kinds:
+        jd = jd_start
+        while True:
+            if kind == 'solar':
+                retflag, tret = swe.sol_eclipse_when_glob(jd, search_flag, 0)
+                body = swe.SUN
+            else:
+                retflag, tret = swe.lun_eclipse_when(jd, search_flag, 0)
+                body = swe.MOON
+            eclipse_type = _eclipse_type(retflag, kind)
+            begin, finish = (tret[6], tret[7]) if eclipse_type == 'penumbral' else (tret[2], tret[3])
+            maximum = tret[0]
+            if maximum > jd_end:
+                break
+            lon = swe.calc_ut(maximum, body, flag)[0][0] % 360.0
+            rows.append((f'{kind}_eclipse', eclipse_type, maximum, begin, finish, lon))
+            jd = maximum + 1.0
+
+    df = pd.DataFrame(rows, columns=['event', 'eclipse_type', 'jd_ut', 'begin_jd', 'end_jd', 'lon'])
+    df = df.sort_values('jd_ut', kind='stable').reset_index(drop=True)
+    df.insert(3, 'time', jd_to_datetime64(df['jd_ut'].to_numpy()))
+    for key, values in _kp_columns(df['lon'].to_numpy()).items():
+        df[key] = values
+    instrument.add_rows('find_eclipses', len(df))
+    return df
+
+
+@instrumented('lunar_calendar')
+def lunar_calendar(start, end, ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None):
+    """
+    月相事件日历：find_lunations 的全部事件，朔/望若伴随日/月食，附上 eclipse_type 与食甚时刻 eclipse_jd
+    (日食总在朔附近、月食总在望附近，按一天以内的最近事件匹配)。
+    """
+    lunations = find_lunations(start, end, ecliptic_mode=ecliptic_mode, ayanamsha_mode=ayanamsha_mode,
+                               ephe_path=ephe_path)
+    eclipses = find_eclipses(start, end, ecliptic_mode=ecliptic_mode, ayanamsha_mode=ayanamsha_mode,
+                             ephe_path=ephe_path)
+    df = lunations.copy()
+    df['eclipse_type'] = pd.Series([None] * len(df), dtype='object')
+    df['eclipse_jd'] = np.nan
+    for kind, event in (('solar', 'new_moon'), ('lunar', 'full_moon')):
+        candidates = np.flatnonzero((df['event'] == event).to_numpy())
+        eclipse_rows = eclipses[eclipses['event'] == f'{kind}_eclipse']
+        if not len(candidates) or eclipse_rows.empty:
+            continue
+        jds = df['jd_ut'].to_numpy()[candidates]
+        for eclipse_type, jd in zip(eclipse_rows['eclipse_type'], eclipse_rows['jd_ut']):
+            k = int(np.argmin(np.abs(jds - jd)))
+            if abs(jds[k] - jd) <= 1.0:
+                df.iat[candidates[k], df.columns.get_loc('eclipse_type')] = eclipse_type
+                df.iat[candidates[k], df.columns.get_loc('eclipse_jd')] = jd
+    return df
+
+
+# ----------------- 向量化月相查询 -----------------
+
+@cached('lunations.phase_knots')
+def _phase_knots_uncached(block, ephe_path=None):
+    """第 block 个年块 (自 J2000 起) 的距角节点：(jd, 展开后的距角, 距角速度)。"""
+    _ensure_ephe_path(ephe_path)
+    flag = swe.FLG_SWIEPH | swe.FLG_SPEED
+    jd_start = _J2000 + block * _BLOCK_DAYS - _BLOCK_PAD
+    jd_end = jd_start + _BLOCK_DAYS + 2.0 * _BLOCK_PAD
+    targets = np.arange(0.0, 360.0, _KNOT_SPACING)
+    times, which = _solve_elongations(jd_start, jd_end, targets.tolist(), flag, DEFAULT_TOLERANCE)
+    rates = np.array([_elongation(jd, flag)[1] for jd in times.tolist()])
+    # 相邻节点的目标角相差 30° (取 360 的模)，累加得到连续增长的距角
+    angles = targets[which]
+    unwrapped = angles[0] + np.concatenate([[0.0], np.cumsum(np.diff(angles) % 360.0)])
+    return times, unwrapped, rates
+
+
+@lru_cache(maxsize=64)
+def _phase_knots(block, ephe_path=None):
+    return _phase_knots_uncached(block, ephe_path)
+
+
+@instrumented('phase_at')
+def phase_at(timestamps, ephe_path=None):
+    """
+    任意时间数组的月相 (向量化)。
+
+    参数:
+        timestamps : 儒略日 (UT) 数组，或 UTC 的 datetime64 / DatetimeIndex (带时区的自动转为 UTC)
+    返回:
+        DataFrame (行与输入一一对应)，列为
+        angle        : 日月距角 0–360 (0 朔、180 望；插值误差小于 0.01°)
+        phase        : 八分月相 (MOON_PHASES，以主相位为中心各占 45°)
+        illumination : 月面被照亮比例的近似值 (1 - cos 距角) / 2
+        age          : 月龄 (距上一次朔的天数)
+    """
+    jd = np.atleast_1d(to_jd_array(timestamps)).astype('float64').ravel()
+    angle = np.full(len(jd), np.nan)
+    age = np.full(len(jd), np.nan)
+    valid = np.isfinite(jd)
+    blocks = np.full(len(jd), 0, dtype='int64')
+    blocks[valid] = np.floor((jd[valid] - _J2000) / _BLOCK_DAYS).astype('int64')
+
+    for block in np.unique(blocks[valid]).tolist():
+        idx = np.flatnonzero(valid & (blocks == block))
+        times, unwrapped, rates = _phase_knots(block, ephe_path)
+        k = np.clip(np.searchsorted(times, jd[idx], side='right') - 1, 0, len(times) - 2)
+        value = hermite(jd[idx], times[k], times[k + 1], unwrapped[k], unwrapped[k + 1], rates[k], rates[k + 1])
+        angle[idx] = value % 360.0
+        # 上一次朔 = 展开距角为 360 整数倍的节点
+        new_moons = times[np.isclose(unwrapped % 360.0, 0.0)]
+        prev = np.searchsorted(new_moons, jd[idx], side='right') - 1
+        age[idx] = np.where(prev >= 0, jd[idx] - new_moons[np.maximum(prev, 0)], np.nan)
+
+    codes = np.where(valid, np.floor(((np.nan_to_num(angle) + 22.5) % 360.0) / 45.0), -1).astype('int8')
+    df = pd.DataFrame({
+        'angle': angle,
+        'phase': pd.Categorical.from_codes(codes, categories=MOON_PHASES),
+        'illumination': (1.0 - np.cos(np.radians(angle))) / 2.0,
+        'age': age,
+    })
+    if isinstance(timestamps, (pd.DatetimeIndex, pd.Series)):
+        df.index = timestamps.index if isinstance(timestamps, pd.Series) else timestamps
+    instrument.add_rows('phase_at', len(df))
+    return df
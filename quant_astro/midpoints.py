@@ -0,0 +1,218 @@
+# quant_astro/midpoints.py
+
+import numpy as np
+import pandas as pd
+
+from . import instrument
+from .instrument import instrumented
+
+# =============================================================================
+# 中点 (Midpoint) 引擎
+#
+# N 个星体两两组合共 N(N-1)/2 个中点，每个中点有近中点 (短弧) 与远中点 (+180°)。
+# 在谐波表盘 (dial = 360 / 90 / 45 / 22.5 ...) 上，位置取 dial 的模；
+# dial 整除 180 时远、近中点落在同一点。
+# 命中检测：把中点在表盘上的位置排序 (首尾按容许度环绕延伸)，每个星体用二分查找
+# 取出 [位置 - orb, 位置 + orb] 内的全部中点，复杂度 O((M + N) log M + 命中数)。
+# =============================================================================
+
+DEFAULT_DIAL = 90.0
+DEFAULT_ORB = 1.5
+
+
+def collect_bodies(*position_dicts, aliases=None, include=None):
+    """
+    把若干位置字典 (calculate_positions 的行星/宫头、get_attributes 的阿拉伯点等) 合并为
+    (names, lons)。只收录带 'lon' 的条目。
+
+    aliases : 名称替换，如 {'house 1': 'Asc', 'house 10': 'MC'}
+    include : 只保留这些名称 (替换后的名称)，按给定顺序
+    """
+    aliases = aliases or {}
+    merged = {}
+    for positions in position_dicts:
+        for name, data in (positions or {}).items():
+            if isinstance(data, dict) and 'lon' in data:
+                merged[aliases.get(name, name)] = float(data['lon'])
+    if include is not None:
+        missing = [name for name in include if name not in merged]
+        if missing:
+            raise ValueError(f"位置字典中找不到: {', '.join(missing)}")
+        merged = {name: merged[name] for name in include}
+    return list(merged), np.array(list(merged.values()), dtype='float64')
+
+
+def pair_indices(n):
+    """N 个星体的全部组合 (i < j)，按 (i, j) 字典序。"""
+    return np.triu_indices(n, k=1)
+
+
+def calculate_midpoints(lons):
+    """
+    全部两两近中点。
+
+    lons : 形状 (N,) 或 (T, N) 的黄经数组
+    返回 (i, j, near)：i、j 为长度 M = N(N-1)/2 的星体索引，
+    near 为形状 (M,) 或 (T, M) 的近中点黄经 (0–360)；远中点 = (near + 180) % 360。
+    两星正好对冲时取 lons[i] - 90° (即 lons[j] + 90°)，如 [10, 190] -> 280。
+    """
+    lons = np.asarray(lons, dtype='float64')
+    i, j = pair_indices(lons.shape[-1])
+    a, b = lons[..., i], lons[..., j]
+    diff = (b - a + 180.0) % 360.0 - 180.0
+    return i, j, (a + diff / 2.0) % 360.0
+
+
+def _check_dial(dial, orb):
+    dial = float(dial)
+    if dial <= 0 or abs(360.0 / dial - round(360.0 / dial)) > 1e-9:
+        raise ValueError(f"dial 必须整除 360 (如 360、90、45、22.5)，收到: {dial}")
+    if not 0 <= orb < dial / 2:
+        raise ValueError(f"orb 必须在 [0, dial/2) 内，收到 orb={orb}, dial={dial}")
+    return dial
+
+
+def _hits_block(lons, dial, orb, include_far, exclude_self):
+    """
+    一块时间序列 (T, N) 的命中检测，返回 (t, body, pair, far, orb) 数组。
+    所有行拼成一个有序数组：第 r 行的值平移 r × stride，行与行互不重叠，
+    一次 argsort、一次 searchsorted 即完成整块查询。
+    """
+    T, N = lons.shape
+    i, j, near = calculate_midpoints(lons)
+    M = len(i)
+    if M == 0:
+        empty = np.empty(0, dtype='int64')
+        return empty, empty, empty, np.empty(0, dtype=bool), np.empty(0)
+
+    # 候选点：近中点；360° 表盘上另加远中点 (dial 整除 180 时二者重合)
+    far_distinct = include_far and (180.0 % dial) != 0
+    points = np.concatenate([near, (near + 180.0) % 360.0], axis=1) if far_distinct else near
+    values = points % dial
+    K = values.shape[1]
+    rows = np.broadcast_to(np.arange(T)[:, None], (T, K))
+    cand = np.broadcast_to(np.arange(K), (T, K))
+
+    # 首尾环绕：靠近 0 的点复制到 dial 之后，靠近 dial 的点复制到 0 之前
+    flat_v, flat_r, flat_c = values.ravel(), rows.ravel(), cand.ravel()
+    low = flat_v < orb
+    high = flat_v >= dial - orb
+    v = np.concatenate([flat_v, flat_v[low] + dial, flat_v[high] - dial])
+    r = np.concatenate([flat_r, flat_r[low], flat_r[high]])
+    c = np.concatenate([flat_c, flat_c[low], flat_c[high]])
+
+    stride = dial + 2.0 * orb + 1.0
+    keys = r * stride + (v + orb)
+    order = np.argsort(keys, kind='stable')
+    keys, v, c = keys[order], v[order], c[order]
+
+    body_v = (lons % 360.0) % dial
+    base = np.arange(T)[:, None] * stride + body_v
+    start = np.searchsorted(keys, base.ravel(), side='left')
+    stop = np.searchsorted(keys, (base + 2.0 * orb).ravel(), side='right')
+    counts = stop - start
+    total = int(counts.sum())
+
+    # 展开每个星体命中的区间 [start, stop)
+    owner = np.repeat(np.arange(T * N), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    pos = np.repeat(start, counts) + offsets
+
+    t_idx, body = np.divmod(owner, N)
+    hit_c = c[pos]
+    pair = hit_c % M
+    far = hit_c >= M
+    hit_orb = np.abs(body_v.ravel()[owner] - v[pos])
+
+    keep = hit_orb <= orb
+    if exclude_self:
+        keep &= (i[pair] != body) & (j[pair] != body)
+    return t_idx[keep], body[keep], pair[keep], far[keep], hit_orb[keep]
+
+
+@instrumented('find_midpoint_hits')
+def find_midpoint_hits(lons, names, orb=DEFAULT_ORB, dial=DEFAULT_DIAL, include_far=True, exclude_self=True):
+    """
+    单张星盘的中点结构：哪些星体落在哪些中点上。
+
+    参数:
+        lons         : 长度 N 的黄经数组 (可由 collect_bodies 得到)
+        names        : 长度 N 的星体名
+        orb          : 容许度 (度，在表盘上度量)
+        dial         : 谐波表盘，360 / 90 / 45 / 22.5 等
+        include_far  : 360° 表盘上是否同时检测远中点
+        exclude_self : 是否排除星体落在包含自身的中点上 (如 Su = Su/Mo)
+
+    返回:
+        按 (星体, 容许度) 排序的列表，每项为
+        {'body', 'p1', 'p2', 'midpoint' (黄经), 'far' (是否远中点), 'orb', 'dial'}
+    """
+    lons = np.asarray(lons, dtype='float64')
+    if lons.ndim != 1 or len(names) != len(lons):
+        raise ValueError("lons 必须是一维数组，且与 names 等长。")
+    dial = _check_dial(dial, orb)
+    i, j, near = calculate_midpoints(lons)
+    _, body, pair, far, hit_orb = _hits_block(lons[None, :], dial, orb, include_far, exclude_self)
+
+    order = np.lexsort((hit_orb, body))
+    results = []
+    for k in order:
+        p = pair[k]
+        midpoint = (near[p] + 180.0) % 360.0 if far[k] else near[p]
+        results.append({
+            'body': names[body[k]],
+            'p1': names[i[p]],
+            'p2': names[j[p]],
+            'midpoint': float(midpoint),
+            'far': bool(far[k]),
+            'orb': float(hit_orb[k]),
+            'dial': dial,
+        })
+    instrument.add_rows('find_midpoint_hits', len(results))
+    return results
+
+
+@instrumented('midpoint_hits_series')
+def midpoint_hits_series(lons, names, orb=DEFAULT_ORB, dial=DEFAULT_DIAL, include_far=True, exclude_self=True,
+                         max_block_cells=4_000_000):
+    """
+    时间序列批量版：T 个时刻 × N 个星体 (行运、推运序列等)。
+
+    :param lons:            T×N 黄经数组
+    :param names:           长度 N 的星体名，用作 body / p1 / p2 列的类别
+    :param max_block_cells: 每块处理的 (时刻 × 候选中点) 上限，控制峰值内存
+    :return: DataFrame，每行一个命中，列为
+             t (时刻索引), body, p1, p2 (Categorical 星体名), midpoint, far, orb
+    """
+    lons = np.atleast_2d(np.asarray(lons, dtype='float64'))
+    T, N = lons.shape
+    if len(names) != N:
+        raise ValueError("names 的长度必须与经度数组的列数一致。")
+    dial = _check_dial(dial, orb)
+    i, j = pair_indices(N)
+    per_row = max(len(i) * 2, 1)
+    block = max(1, max_block_cells // per_row)
+
+    parts = []
+    for t0 in range(0, T, block):
+        t_idx, body, pair, far, hit_orb = _hits_block(lons[t0:t0 + block], dial, orb, include_far, exclude_self)
+        parts.append((t_idx + t0, body, pair, far, hit_orb))
+    t_idx, body, pair, far, hit_orb = (np.concatenate(col) for col in zip(*parts))
+
+    order = np.lexsort((hit_orb, body, t_idx))
+    t_idx, body, pair, far, hit_orb = t_idx[order], body[order], pair[order], far[order], hit_orb[order]
+
+    a, b = lons[t_idx, i[pair]], lons[t_idx, j[pair]]
+    near = (a + ((b - a + 180.0) % 360.0 - 180.0) / 2.0) % 360.0
+    categories = list(names)
+    df = pd.DataFrame({
+        't': t_idx.astype('int64'),
+        'body': pd.Categorical.from_codes(body, categories=categories),
+        'p1': pd.Categorical.from_codes(i[pair], categories=categories),
+        'p2': pd.Categorical.from_codes(j[pair], categories=categories),
+        'midpoint': np.where(far, (near + 180.0) % 360.0, near),
+        'far': far.astype(bool),
+        'orb': hit_orb.astype('float64'),
+    })
+    instrument.add_rows('midpoint_hits_series', len(df))
+    return df
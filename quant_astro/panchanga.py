@@ -0,0 +1,279 @@
+# quant_astro/panchanga.py
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .dasha_Vimshottari import _load_star_rows
+from .search import (DEFAULT_TOLERANCE, ephemeris_flag, jd_range, to_jd_array, jd_to_datetime64, time_grid,
+                     sample_body, body_longitudes, wrap180, solve_root)
+
+# =============================================================================
+# 五支历 (Panchanga)
+#
+# 五个要素都是日月恒星黄经的函数，另加以日出为界的星期：
+#   tithi     (太阴日)   : 日月距角 / 12°，1–30 (1–15 白半月 Shukla，16–30 黑半月 Krishna)
+#   karana    (半太阴日) : 日月距角 / 6°，1–60
+#   nakshatra (月宿)     : 月亮黄经 / 13°20′，1–27 (宿名与宿主取自 data/star.csv)，pada 为四分之一宿
+#   yoga      (日月和)   : (太阳 + 月亮) 黄经 / 13°20′，1–27
+#   vara      (星期)     : 以当地日出为一天的开始 (与 get_sun_rise_and_lord 的值日星规则一致)
+# 时间数组上的计算只在 0.25 天网格上调用星历，其余时刻插值 (见 search.body_longitudes)；
+# 各要素的交接时刻作为事件求根：量值单调增长，网格上跨越整格的区间即含一个交接点。
+# =============================================================================
+
+TITHI_NAMES = ('Pratipada', 'Dwitiya', 'Tritiya', 'Chaturthi', 'Panchami', 'Shashthi', 'Saptami', 'Ashtami',
+               'Navami', 'Dashami', 'Ekadashi', 'Dwadashi', 'Trayodashi', 'Chaturdashi')
+# 第 15 个为望 (Purnima)，第 30 个为朔 (Amavasya)
+TITHIS = TITHI_NAMES + ('Purnima',) + TITHI_NAMES + ('Amavasya',)
+
+YOGAS = ('Vishkambha', 'Priti', 'Ayushman', 'Saubhagya', 'Shobhana', 'Atiganda', 'Sukarma', 'Dhriti', 'Shula',
+         'Ganda', 'Vriddhi', 'Dhruva', 'Vyaghata', 'Harshana', 'Vajra', 'Siddhi', 'Vyatipata', 'Variyana',
+         'Parigha', 'Shiva', 'Siddha', 'Sadhya', 'Shubha', 'Shukla', 'Brahma', 'Indra', 'Vaidhriti')
+
+# 第 1 个半太阴日为固定的 Kimstughna，其后 7 个移动 karana 循环 8 次，最后 3 个固定
+MOVABLE_KARANAS = ('Bava', 'Balava', 'Kaulava', 'Taitila', 'Garaja', 'Vanija', 'Vishti')
+KARANAS = ('Kimstughna',) + MOVABLE_KARANAS * 8 + ('Shakuni', 'Chatushpada', 'Naga')
+KARANA_NAMES = ('Kimstughna',) + MOVABLE_KARANAS + ('Shakuni', 'Chatushpada', 'Naga')
+
+# 0 = 星期日
+VARAS = ('Ravivara', 'Somavara', 'Mangalavara', 'Budhavara', 'Guruvara', 'Shukravara', 'Shanivara')
+VARA_LORDS = ('Su', 'Mo', 'Ma', 'Me', 'Ju', 'Ve', 'Sa')
+
+PANCHANGA_ELEMENTS = ('tithi', 'karana', 'nakshatra', 'yoga', 'vara')
+
+# 要素 -> (所用的量, 每格宽度 (度), 格数)
+_ELEMENT_RULES = {
+    'tithi': ('elongation', 12.0, 30),
+    'karana': ('elongation', 6.0, 60),
+    'nakshatra': ('moon', 360.0 / 27.0, 27),
+    'yoga': ('sum', 360.0 / 27.0, 27),
+}
+
+_EVENT_STEP = 0.25   # 交接事件的采样步长 (天)：各量每步最多前进约 4.1°，小于最窄的 karana (6°)
+
+
+def _nakshatra_names():
+    rows = _load_star_rows()
+    return tuple(row['Star'] for row in rows), tuple(row['Star-Lord'] for row in rows)
+
+
+def _quantity(kind, sun, moon):
+    """各要素所用的量 (度)：elongation = 月 - 日，moon = 月，sum = 日 + 月。"""
+    if kind == 'elongation':
+        return (moon - sun) % 360.0
+    if kind == 'moon':
+        return moon % 360.0
+    return (sun + moon) % 360.0
+
+
+def _quantity_rate(kind, sun_speed, moon_speed):
+    if kind == 'elongation':
+        return moon_speed - sun_speed
+    if kind == 'moon':
+        return moon_speed
+    return sun_speed + moon_speed
+
+
+# ----------------- 日出与星期 -----------------
+
+def _sunrises(jd_start, jd_end, latitude, longitude, elevation, rsmi, press, temp):
+    """[jd_start - 1, jd_end] 之间当地的全部日出 (儒略日 UT)。极昼/极夜等无日出的日子跳过。"""
+    geopos = (float(longitude), float(latitude), float(elevation))
+    rises = []
+    jd = jd_start - 1.5
+    while jd <= jd_end:
+        ret_flag, tret = swe.rise_trans(jd, swe.SUN, rsmi, geopos, press, temp, swe.FLG_SWIEPH)
+        if ret_flag < 0 or tret[0] <= 1.0:
+            jd += 1.0
+            continue
+        if tret[0] > jd_end:
+            break
+        rises.append(tret[0])
+        jd = tret[0] + 0.5
+    return np.array(rises, dtype='float64')
+
+
+def _local_weekday(jd_ut, longitude):
+    """地方平太阳时的星期 (0 = 星期日)。日出总在当地上午，因此与当地民用日期的星期一致。"""
+    return (np.floor(np.asarray(jd_ut) + 1.5 + float(longitude) / 360.0) % 7).astype('int8')
+
+
+def _vara_at(jd, latitude, longitude, elevation, rsmi, press, temp):
+    rises = _sunrises(float(np.nanmin(jd)), float(np.nanmax(jd)), latitude, longitude, elevation, rsmi, press, temp)
+    if len(rises) == 0:
+        return np.full(len(jd), -1, dtype='int8')
+    prev = np.searchsorted(rises, jd, side='right') - 1
+    vara = np.where(prev >= 0, _local_weekday(rises[np.maximum(prev, 0)], longitude), -1).astype('int8')
+    return np.where(np.isfinite(jd), vara, -1).astype('int8')
+
+
+# ----------------- 时间序列 -----------------
+
+@instrumented('panchanga_at')
+def panchanga_at(timestamps, latitude=None, longitude=None, elevation=0.0,
+                 ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None,
+                 rsmi=swe.CALC_RISE | swe.BIT_DISC_CENTER, atpress=1013.25, attemp=10.0):
+    """
+    时间数组的五支历。
+
+    参数:
+        timestamps          : 儒略日 (UT) 数组，或 UTC 的 datetime64 / DatetimeIndex (带时区的自动转为 UTC)
+        latitude, longitude : 观测地 (度)；提供时计算以日出为界的 vara，否则 vara 列为空
+        ayanamsha_mode      : 恒星黄道的岁差模式 (与 calculate_positions 相同)
+        rsmi / atpress / attemp : 日出计算参数，默认值与 get_sun_rise_and_lord 相同
+
+    返回:
+        DataFrame (行与输入一一对应)，列为
+        tithi (1–30), tithi_name, paksha ('Shukla' / 'Krishna'), karana (1–60), karana_name,
+        nakshatra (1–27), nakshatra_name, nakshatra_lord, pada (1–4), yoga (1–27), yoga_name,
+        vara (0 = 星期日), vara_name, vara_lord
+        名称列均为 Categorical，编号列为 int8 (无效时刻为 -1)。
+    """
+    jd = np.atleast_1d(to_jd_array(timestamps)).astype('float64').ravel()
+    valid = np.isfinite(jd)
+    flag = ephemeris_flag('sidereal', ayanamsha_mode, ephe_path)
+    lons, _ = body_longitudes(jd[valid], [swe.SUN, swe.MOON], flag)
+    sun = np.full(len(jd), np.nan)
+    moon = np.full(len(jd), np.nan)
+    sun[valid], moon[valid] = lons[:, 0], lons[:, 1]
+
+    def index(kind, width, count):
+        value = np.floor(_quantity(kind, sun, moon) / width)
+        return np.where(valid, np.minimum(np.nan_to_num(value), count - 1), -1).astype('int16')
+
+    tithi = index('elongation', 12.0, 30)
+    karana = index('elongation', 6.0, 60)
+    nakshatra = index('moon', 360.0 / 27.0, 27)
+    pada = np.where(valid, np.floor(np.nan_to_num(moon) / (360.0 / 108.0)) % 4, -1).astype('int16')
+    yoga = index('sum', 360.0 / 27.0, 27)
+    star_names, star_lords = _nakshatra_names()
+    lord_categories = list(dict.fromkeys(star_lords))
+    lord_codes = np.array([lord_categories.index(lord) for lord in star_lords], dtype='int16')
+    karana_codes = np.array([KARANA_NAMES.index(name) for name in KARANAS], dtype='int16')
+
+    def number(codes):
+        return np.where(codes >= 0, codes + 1, -1).astype('int8')
+
+    def categorical(codes, table, categories):
+        return pd.Categorical.from_codes(np.where(codes >= 0, table[np.maximum(codes, 0)], -1), categories=categories)
+
+    tithi_categories = list(dict.fromkeys(TITHIS))
+    tithi_codes = np.array([tithi_categories.index(name) for name in TITHIS], dtype='int16')
+    data = {
+        'tithi': number(tithi),
+        'tithi_name': categorical(tithi, tithi_codes, tithi_categories),
+        'paksha': pd.Categorical.from_codes(np.where(tithi >= 0, tithi // 15, -1), categories=['Shukla', 'Krishna']),
+        'karana': number(karana),
+        'karana_name': categorical(karana, karana_codes, list(KARANA_NAMES)),
+        'nakshatra': number(nakshatra),
+        'nakshatra_name': pd.Categorical.from_codes(nakshatra, categories=list(star_names)),
+        'nakshatra_lord': categorical(nakshatra, lord_codes, lord_categories),
+        'pada': number(pada),
+        'yoga': number(yoga),
+        'yoga_name': pd.Categorical.from_codes(yoga, categories=list(YOGAS)),
+    }
+    if latitude is not None and longitude is not None and valid.any():
+        vara = _vara_at(jd, latitude, longitude, elevation, rsmi, atpress, attemp)
+    else:
+        vara = np.full(len(jd), -1, dtype='int8')
+    data['vara'] = vara
+    data['vara_name'] = pd.Categorical.from_codes(vara, categories=list(VARAS))
+    data['vara_lord'] = pd.Categorical.from_codes(vara, categories=list(VARA_LORDS))
+
+    df = pd.DataFrame(data)
+    if isinstance(timestamps, (pd.DatetimeIndex, pd.Series)):
+        df.index = timestamps.index if isinstance(timestamps, pd.Series) else timestamps
+    instrument.add_rows('panchanga_at', len(df))
+    return df
+
+
+# ----------------- 交接事件 -----------------
+
+def _element_names(element):
+    if element == 'tithi':
+        return TITHIS
+    if element == 'karana':
+        return KARANAS
+    if element == 'nakshatra':
+        return _nakshatra_names()[0]
+    return YOGAS
+
+
+def _boundaries(element, t, sun, moon, flag, tol):
+    """网格 t 上采样的日月黄经 -> 该要素的全部交接时刻与新值 (0 起)。"""
+    kind, width, count = _ELEMENT_RULES[element]
+    q = _quantity(kind, sun, moon)
+    unwrapped = np.degrees(np.unwrap(np.radians(q)))
+    cell = np.floor(unwrapped / width).astype('int64')
+
+    def fdf_for(target):
+        def fdf(jd):
+            s = swe.calc_ut(jd, swe.SUN, flag)[0]
+            m = swe.calc_ut(jd, swe.MOON, flag)[0]
+            return float(wrap180(_quantity(kind, s[0], m[0]) - target)), _quantity_rate(kind, s[3], m[3])
+        return fdf
+
+    times, values = [], []
+    for i in np.flatnonzero(np.diff(cell) > 0):
+        new_cell = cell[i + 1]
+        target = (new_cell * width) % 360.0
+        f_lo = float(wrap180(q[i] - target))
+        f_hi = float(wrap180(q[i + 1] - target))
+        times.append(solve_root(fdf_for(target), t[i], t[i + 1], f_lo, f_hi, tol=tol))
+        values.append(int(new_cell % count))
+    return times, values
+
+
+@instrumented('panchanga_events')
+def panchanga_events(start, end, elements=('tithi', 'karana', 'nakshatra', 'yoga'),
+                     latitude=None, longitude=None, elevation=0.0,
+                     ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None, tol=DEFAULT_TOLERANCE,
+                     rsmi=swe.CALC_RISE | swe.BIT_DISC_CENTER, atpress=1013.25, attemp=10.0):
+    """
+    五支历各要素的交接时刻。
+
+    参数:
+        start, end : 起止时间 (儒略日 UT、numpy.datetime64 或 UTC datetime)
+        elements   : PANCHANGA_ELEMENTS 的子集；'vara' 需要 latitude / longitude (交接时刻即当地日出)
+        其余参数与 panchanga_at 相同
+
+    返回:
+        DataFrame，按时间排序，列为
+        element, value (新开始的编号：tithi/karana/nakshatra/yoga 从 1 起，vara 0 = 星期日),
+        name (新开始的名称), jd_ut, time
+        每行既是上一个值的结束时刻，也是下一个值的开始时刻。
+    """
+    elements = [elements] if isinstance(elements, str) else list(elements)
+    unknown = [e for e in elements if e not in PANCHANGA_ELEMENTS]
+    if unknown:
+        raise ValueError(f"不支持的五支历要素: {', '.join(unknown)}，可选: {', '.join(PANCHANGA_ELEMENTS)}")
+    if 'vara' in elements and (latitude is None or longitude is None):
+        raise ValueError("计算 vara 的交接时刻需要提供 latitude 与 longitude。")
+    jd_start, jd_end = jd_range(start, end)
+    flag = ephemeris_flag('sidereal', ayanamsha_mode, ephe_path)
+
+    rows = []
+    lunar = [e for e in elements if e != 'vara']
+    if lunar:
+        t = time_grid(jd_start, jd_end, _EVENT_STEP)
+        sun = sample_body(t, swe.SUN, flag, index=(0,))[:, 0]
+        moon = sample_body(t, swe.MOON, flag, index=(0,))[:, 0]
+        for element in lunar:
+            names = _element_names(element)
+            times, values = _boundaries(element, t, sun, moon, flag, tol)
+            # vara 从 0 起编号，其余要素从 1 起
+            rows.extend((element, value + 1, names[value], jd) for jd, value in zip(times, values))
+    if 'vara' in elements:
+        rises = _sunrises(jd_start, jd_end, latitude, longitude, elevation, rsmi, atpress, attemp)
+        rises = rises[rises >= jd_start]
+        rows.extend(('vara', int(w), VARAS[w], jd) for jd, w in zip(rises, _local_weekday(rises, longitude)))
+
+    df = pd.DataFrame(rows, columns=['element', 'value', 'name', 'jd_ut'])
+    df = df.sort_values(['jd_ut'], kind='stable').reset_index(drop=True)
+    df['element'] = pd.Categorical(df['element'], categories=list(PANCHANGA_ELEMENTS))
+    df['value'] = df['value'].astype('int8')
+    df['time'] = jd_to_datetime64(df['jd_ut'].to_numpy())
+    instrument.add_rows('panchanga_events', len(df))
+    return df
@@ -0,0 +1,254 @@
+# quant_astro/progressions.py
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .core import HOUSE_SYSTEMS, _to_jd_utc
+from .aspects import calculate_transit_aspects
+from .search import ephemeris_flag, to_jd_array, jd_to_datetime64, time_grid, body_longitudes
+
+# =============================================================================
+# 推运 (Progressions) 与向运 (Directions)
+#
+# 次限推运 (secondary)：出生后第 n 天的星体位置对应第 n 年，progressed_jd = birth + age_years (天)。
+#   100 年的推运只覆盖出生后约 100 天的星历，按 search.body_longitudes 在网格上采样后插值，不逐月重算。
+# 太阳弧向运 (solar_arc)：全部本命点加上同一段弧 = 推运太阳黄经 - 本命太阳黄经。
+# Naibod 向运 (naibod)：弧 = 平太阳日行 (360° / 回归年) × 年龄。
+# 推运四轴：本命 ARMC 加上赤经弧 (太阳弧取推运太阳的赤经差，Naibod 取平均速率)，
+#   在推运时刻的黄赤交角下由 swe.houses_armc 反算宫头 (恒星黄道再减去推运时刻含章动的岁差，与 houses_ex 一致)。
+# 推运对本命的相位沿用 calculate_transit_aspects：推运星体作为"行运"，速度单位为 度/年。
+# =============================================================================
+
+YEAR_LENGTH = 365.24219            # 回归年 (天)
+NAIBOD_RATE = 360.0 / YEAR_LENGTH  # 度/年
+
+PROGRESSION_BODIES = {
+    'Su': swe.SUN, 'Mo': swe.MOON, 'Me': swe.MERCURY, 'Ve': swe.VENUS, 'Ma': swe.MARS, 'Ju': swe.JUPITER,
+    'Sa': swe.SATURN, 'Ur': swe.URANUS, 'Ne': swe.NEPTUNE, 'Pl': swe.PLUTO, 'Ra': swe.MEAN_NODE,
+}
+DEFAULT_PROGRESSION_BODIES = tuple(PROGRESSION_BODIES) + ('Ke',)
+PROGRESSION_METHODS = ('secondary', 'solar_arc', 'naibod')
+ANGLE_METHODS = ('solar_arc', 'naibod')
+
+# 推运星历的插值步长 (天)：月亮 0.25 天 (误差约 2e-6°)，其余星体 1 天 (误差小于 1e-4°)
+_MOON_STEP = 0.25
+_PROGRESSION_STEP = 1.0
+
+
+def _check(value, allowed, label):
+    if value not in allowed:
+        raise ValueError(f"不支持的{label}: {value}，可选: {', '.join(allowed)}")
+
+
+def _ages(birth_jd, target_jds, year_length):
+    """目标时刻 -> 年龄 (年)。"""
+    return (target_jds - birth_jd) / year_length
+
+
+def _secondary(birth_jd, ages, bodies, flag, node_mode):
+    """
+    次限推运位置：返回 (lon, speed) 两个 (T, len(bodies)) 数组，速度单位为 度/年 (即推运日速度)。
+    'Ke' 由 'Ra' 对冲得到。
+    """
+    node = swe.TRUE_NODE if node_mode == 'true' else swe.MEAN_NODE
+    ids = []
+    for name in bodies:
+        _check(name, DEFAULT_PROGRESSION_BODIES, '推运星体')
+        ids.append(node if name in ('Ra', 'Ke') else PROGRESSION_BODIES[name])
+    pjd = birth_jd + ages
+    lon = np.empty((len(pjd), len(ids)))
+    speed = np.empty_like(lon)
+    moon = np.array([body == swe.MOON for body in ids])
+    for mask, step in ((moon, _MOON_STEP), (~moon, _PROGRESSION_STEP)):
+        if mask.any():
+            lon[:, mask], speed[:, mask] = body_longitudes(pjd, [b for b, m in zip(ids, mask) if m], flag, step=step)
+    for b, name in enumerate(bodies):
+        if name == 'Ke':
+            lon[:, b] = (lon[:, b] + 180.0) % 360.0
+    return lon, speed
+
+
+def _arcs(birth_jd, ages, method, flag):
+    """向运弧 (度) 与弧的变化率 (度/年)。"""
+    if method == 'naibod':
+        return NAIBOD_RATE * ages, np.full(len(ages), NAIBOD_RATE)
+    natal_sun = swe.calc_ut(birth_jd, swe.SUN, flag)[0][0]
+    lon, speed = body_longitudes(birth_jd + ages, [swe.SUN], flag, step=_PROGRESSION_STEP)
+    # 太阳每年推运约 1°，弧在 100 年内不会超过 360°，按年龄符号展开
+    arc = (lon[:, 0] - natal_sun) % 360.0
+    arc = np.where(ages < 0, arc - 360.0, arc)
+    return arc, speed[:, 0]
+
+
+def _progressed_angles(birth_jd, ages, latitude, longitude, house_system, method, ecliptic_mode):
+    """推运宫头：返回 (T, 14) 数组，列为 house 1 … house 12、Asc、MC。"""
+    code = HOUSE_SYSTEMS[house_system]
+    natal_armc = swe.houses_ex(birth_jd, latitude, longitude, code)[1][2]
+    pjd = birth_jd + ages
+    if method == 'naibod':
+        arc = NAIBOD_RATE * ages
+    else:
+        # 赤经弧：推运太阳与本命太阳的赤经差 (热带赤道坐标)
+        eq_flag = swe.FLG_SWIEPH | swe.FLG_SPEED | swe.FLG_EQUATORIAL
+        natal_ra = swe.calc_ut(birth_jd, swe.SUN, eq_flag)[0][0]
+        ra, _ = body_longitudes(pjd, [swe.SUN], eq_flag, step=_PROGRESSION_STEP)
+        arc = (ra[:, 0] - natal_ra) % 360.0
+        arc = np.where(ages < 0, arc - 360.0, arc)
+
+    # 黄赤交角与岁差在推运区间内变化缓慢，在逐日网格上取值后线性插值
+    grid = time_grid(float(pjd.min()), float(pjd.max()), _PROGRESSION_STEP) if len(pjd) else pjd
+    eps = np.interp(pjd, grid, [swe.calc_ut(jd, swe.ECL_NUT, 0)[0][0] for jd in grid.tolist()])
+    if ecliptic_mode == 'sidereal':
+        ayanamsa = np.interp(pjd, grid, [swe.get_ayanamsa_ex_ut(jd, 0)[1] for jd in grid.tolist()])
+    else:
+        ayanamsa = np.zeros(len(pjd))
+
+    houses_armc = swe.houses_armc
+    out = np.empty((len(ages), 14))
+    for k, (armc, e) in enumerate(zip(((natal_armc + arc) % 360.0).tolist(), eps.tolist())):
+        cusps, ascmc = houses_armc(armc, latitude, e, code)
+        out[k, :12] = cusps[:12]
+        out[k, 12:] = ascmc[:2]
+    out -= ayanamsa[:, None]
+    return out % 360.0
+
+
+def _natal_table(natal):
+    """本命位置：{名称: 黄经} 或 calculate_positions 风格的 {名称: {'lon': ...}}。"""
+    names = list(natal)
+    lons = np.array([float(v['lon']) if isinstance(v, dict) else float(v) for v in natal.values()])
+    return names, lons
+
+
+def _frame(targets, ages, columns):
+    df = pd.DataFrame({'jd_ut': targets, 'time': jd_to_datetime64(targets), 'age': ages})
+    for name, values in columns.items():
+        df[name] = values
+    return df
+
+
+@instrumented('calculate_progressions')
+def calculate_progressions(birth, targets, bodies=DEFAULT_PROGRESSION_BODIES, latitude=None, longitude=None,
+                           angle_method='solar_arc', house_system='Placidus', node_mode='mean',
+                           ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None,
+                           year_length=YEAR_LENGTH):
+    """
+    次限推运 (一天为一年)：一次计算全部目标时刻的推运位置。
+
+    参数:
+        birth               : 出生时刻 (儒略日 UT、numpy.datetime64 或 UTC datetime)
+        targets             : 目标时刻数组 (儒略日 UT、datetime64 或 DatetimeIndex)
+        bodies              : 推运星体 (DEFAULT_PROGRESSION_BODIES 的子集)
+        latitude, longitude : 出生地 (度)；提供时附带推运宫头
+        angle_method        : 推运四轴的弧，'solar_arc' (推运太阳赤经弧) 或 'naibod' (平均速率)
+        year_length         : 一"年"的天数 (默认回归年)
+
+    返回:
+        DataFrame (行与 targets 一一对应)，列为
+        jd_ut, time, age (年), progressed_jd, 各星体的推运黄经；
+        提供地点时再加 'house 1' … 'house 12'、'Asc'、'MC'
+    """
+    _check(angle_method, ANGLE_METHODS, '推运四轴方法')
+    _check(house_system, HOUSE_SYSTEMS, '宫制')
+    birth_jd = _to_jd_utc(birth)
+    target_jds = np.atleast_1d(to_jd_array(targets)).astype('float64')
+    bodies = list(dict.fromkeys([bodies] if isinstance(bodies, str) else bodies))
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+
+    ages = _ages(birth_jd, target_jds, year_length)
+    lon, _ = _secondary(birth_jd, ages, bodies, flag, node_mode)
+    columns = {'progressed_jd': birth_jd + ages}
+    columns.update({name: lon[:, b] for b, name in enumerate(bodies)})
+    if latitude is not None and longitude is not None:
+        angles = _progressed_angles(birth_jd, ages, float(latitude), float(longitude), house_system,
+                                    angle_method, ecliptic_mode)
+        labels = [f"house {i + 1}" for i in range(12)] + ['Asc', 'MC']
+        columns.update({label: angles[:, k] for k, label in enumerate(labels)})
+    df = _frame(target_jds, ages, columns)
+    instrument.add_rows('calculate_progressions', len(df))
+    return df
+
+
+@instrumented('calculate_directions')
+def calculate_directions(natal, birth, targets, method='solar_arc', ecliptic_mode='sidereal',
+                         ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None, year_length=YEAR_LENGTH):
+    """
+    太阳弧 / Naibod 向运：全部本命点加上同一段弧。
+
+    参数:
+        natal   : 本命位置，{名称: 黄经} 或 calculate_positions 风格的 {名称: {'lon': ...}} (可含宫头)
+        birth   : 出生时刻
+        targets : 目标时刻数组
+        method  : 'solar_arc' 或 'naibod'
+
+    返回:
+        DataFrame (行与 targets 一一对应)，列为 jd_ut, time, age, arc (度)，以及 natal 中各点的向运黄经
+    """
+    _check(method, ANGLE_METHODS, '向运方法')
+    birth_jd = _to_jd_utc(birth)
+    target_jds = np.atleast_1d(to_jd_array(targets)).astype('float64')
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+    names, natal_lons = _natal_table(natal)
+
+    ages = _ages(birth_jd, target_jds, year_length)
+    arc, _ = _arcs(birth_jd, ages, method, flag)
+    directed = (natal_lons[None, :] + arc[:, None]) % 360.0
+    columns = {'arc': arc}
+    columns.update({name: directed[:, k] for k, name in enumerate(names)})
+    df = _frame(target_jds, ages, columns)
+    instrument.add_rows('calculate_directions', len(df))
+    return df
+
+
+@instrumented('progressed_aspects')
+def progressed_aspects(natal, birth, targets, aspect_config, method='secondary',
+                       bodies=DEFAULT_PROGRESSION_BODIES, node_mode='mean', ecliptic_mode='sidereal',
+                       ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None, year_length=YEAR_LENGTH):
+    """
+    推运 / 向运星体对本命点的相位 (向量化容许度判罚，规则与 calculate_transit_aspects 相同)。
+
+    参数:
+        natal         : 本命位置，{名称: 黄经} 或 {名称: {'lon': ...}}
+        aspect_config : 与 calculate_aspects 相同的配置字典 (orb_config_str、aspect_types)
+        method        : 'secondary' (bodies 的次限推运位置)，'solar_arc' / 'naibod' (natal 各点的向运位置)
+
+    返回:
+        DataFrame，每行一个命中，列为
+        t (targets 中的索引), jd_ut, time, progressed, natal (Categorical 星体名),
+        type (相位符号), angle_def, orb, applying (按 度/年 的推运速度判断)
+    """
+    _check(method, PROGRESSION_METHODS, '推运方法')
+    birth_jd = _to_jd_utc(birth)
+    target_jds = np.atleast_1d(to_jd_array(targets)).astype('float64')
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+    natal_names, natal_lons = _natal_table(natal)
+    ages = _ages(birth_jd, target_jds, year_length)
+
+    if method == 'secondary':
+        moving = list(dict.fromkeys([bodies] if isinstance(bodies, str) else bodies))
+        lon, speed = _secondary(birth_jd, ages, moving, flag, node_mode)
+    else:
+        moving = natal_names
+        arc, rate = _arcs(birth_jd, ages, method, flag)
+        lon = (natal_lons[None, :] + arc[:, None]) % 360.0
+        speed = np.repeat(rate[:, None], len(moving), axis=1)
+
+    hits = calculate_transit_aspects(lon, natal_lons[None, :], aspect_config, moving, natal_names,
+                                     transit_speed=speed)
+    t = hits['t'].to_numpy()
+    df = pd.DataFrame({
+        't': t,
+        'jd_ut': target_jds[t],
+        'time': jd_to_datetime64(target_jds[t]),
+        'progressed': pd.Categorical.from_codes(hits['p'].to_numpy(), categories=moving),
+        'natal': pd.Categorical.from_codes(hits['q'].to_numpy(), categories=natal_names),
+        'type': hits['type'],
+        'angle_def': hits['angle_def'],
+        'orb': hits['orb'],
+        'applying': hits['applying'],
+    })
+    instrument.add_rows('progressed_aspects', len(df))
+    return df
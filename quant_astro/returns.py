@@ -0,0 +1,233 @@
+# quant_astro/returns.py
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .core import calculate_houses_batch
+from .search import (DEFAULT_TOLERANCE, ephemeris_flag, to_jd_array, jd_to_datetime64, time_grid, sample_body,
+                     hermite, wrap180)
+from .stations import _body_settings, _speed_brackets, _station_time
+
+# =============================================================================
+# 回归 (Return)：行运星体回到本命黄经的时刻 (太阳回归、月亮回归、行星回归)
+#
+# 星体的运动与本命无关，因此整段时间只采样一次：
+#   1. 网格上取黄经与速度，插入精确的留 (逆行星体)，把展开后的黄经切成若干单调段；
+#   2. 每个单调段内，每位命主的目标值为 natal + 360k，用 searchsorted 一次定位全部所在区间；
+#   3. 区间内先对 Hermite 插值曲线做向量化牛顿迭代得到初值，再用 swe.calc_ut 的黄经与速度做牛顿修正到 tol。
+# 回归盘 (可选) 在各回归时刻计算行星位置，宫头由 calculate_houses_batch 批量给出。
+# =============================================================================
+
+# 日月不逆行，采样只需满足插值初值的精度；其余星体沿用 STATION_BODIES 的留搜索步长
+RETURN_STEPS = {'Su': 1.0, 'Mo': 0.25}
+
+# 回归盘中的星体 (与 calculate_positions 的主行星相同，Ra/Ke 为平交点)
+RETURN_CHART_BODIES = {
+    'Su': swe.SUN, 'Mo': swe.MOON, 'Me': swe.MERCURY, 'Ve': swe.VENUS, 'Ma': swe.MARS, 'Ju': swe.JUPITER,
+    'Sa': swe.SATURN, 'Ur': swe.URANUS, 'Ne': swe.NEPTUNE, 'Pl': swe.PLUTO, 'Ra': swe.MEAN_NODE,
+}
+
+_GUESS_ITERATIONS = 4   # 插值曲线上的牛顿迭代次数
+_MAX_ITERATIONS = 12    # 星历牛顿修正的上限
+
+
+def _body(name):
+    if name in RETURN_STEPS:
+        return RETURN_CHART_BODIES[name], RETURN_STEPS[name], False
+    body, step, _ = _body_settings(name)
+    return body, step, True
+
+
+def _per_native(values, n, label):
+    values = np.asarray(values, dtype='float64')
+    if values.ndim == 0:
+        return np.full(n, float(values))
+    if values.shape != (n,):
+        raise ValueError(f"{label} 必须是标量或长度与 natal_lons 相同的数组。")
+    return values
+
+
+def _monotonic_track(body, flag, jd_start, jd_end, step, retrograde, tol):
+    """
+    采样网格 (含精确的留) 上的 (t, 展开黄经 U, 速度)，以及单调段的端点索引列表 [(a, b), ...]。
+    相邻段共用留所在的格点。
+    """
+    t = time_grid(jd_start - step, jd_end + step, step)
+    samples = sample_body(t, body, flag)
+    if retrograde:
+        stations = [_station_time(body, flag, lo, hi, v_lo, v_hi, tol)
+                    for lo, hi, v_lo, v_hi in _speed_brackets(t, samples[:, 1], body, flag, step)]
+        if stations:
+            extra = sample_body(stations, body, flag)
+            extra[:, 1] = 0.0
+            t = np.concatenate([t, stations])
+            order = np.argsort(t, kind='stable')
+            t, samples = t[order], np.concatenate([samples, extra])[order]
+    lon, speed = samples[:, 0], samples[:, 1]
+    U = np.degrees(np.unwrap(np.radians(lon)))
+
+    cuts = np.flatnonzero(speed == 0.0) if retrograde else np.empty(0, dtype='int64')
+    bounds = np.r_[0, cuts, len(t) - 1]
+    segments = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    return t, U, speed, segments
+
+
+def _segment_roots(t, U, speed, a, b, natal):
+    """
+    单调段 [a, b] 内全部回归的 (命主索引, 区间左端 i, 目标展开黄经)；
+    段首不计、段尾计入，相邻段共用的留不会重复。
+    """
+    u_first, u_last = U[a], U[b]
+    direction = 1.0 if u_last >= u_first else -1.0
+    lo, hi = min(u_first, u_last), max(u_first, u_last)
+    if direction > 0:
+        k_min = np.floor((lo - natal) / 360.0) + 1        # 目标 > lo
+        k_max = np.floor((hi - natal) / 360.0)            # 目标 ≤ hi
+    else:
+        k_min = np.ceil((lo - natal) / 360.0)             # 目标 ≥ lo
+        k_max = np.ceil((hi - natal) / 360.0) - 1         # 目标 < hi
+    counts = np.maximum(k_max - k_min + 1, 0).astype('int64')
+    native = np.repeat(np.arange(len(natal)), counts)
+    k = np.repeat(k_min, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    target = natal[native] + 360.0 * k
+
+    track = direction * U[a:b + 1]
+    i = np.clip(np.searchsorted(track, direction * target, side='left') - 1, 0, b - a - 1) + a
+    return native, i, target
+
+
+def _interpolated_guess(t, U, speed, i, target):
+    """在区间 [t_i, t_{i+1}] 的 Hermite 曲线上解 U(t) = target，向量化牛顿迭代 (越界时取中点)。"""
+    t0, t1 = t[i], t[i + 1]
+    u0, u1, m0, m1 = U[i], U[i + 1], speed[i], speed[i + 1]
+    h = t1 - t0
+    guess = t0 + h * np.clip((target - u0) / np.where(u1 != u0, u1 - u0, 1.0), 0.0, 1.0)
+    for _ in range(_GUESS_ITERATIONS):
+        s = (guess - t0) / h
+        value = hermite(guess, t0, t1, u0, u1, m0, m1)
+        slope = ((6 * s * s - 6 * s) * (u0 - u1) / h + (3 * s * s - 4 * s + 1) * m0 + (3 * s * s - 2 * s) * m1)
+        nxt = guess - (value - target) / np.where(slope != 0, slope, np.inf)
+        guess = np.where((nxt > t0) & (nxt < t1), nxt, (t0 + t1) / 2.0)
+    return guess
+
+
+def _refine(guess, lo, hi, target, body, flag, tol):
+    """以星历黄经与速度做牛顿修正；跳出区间的步退回到区间中点。"""
+    calc = swe.calc_ut
+    t = guess.copy()
+    lo, hi = lo.copy(), hi.copy()
+    active = np.arange(len(t))
+    for _ in range(_MAX_ITERATIONS):
+        if not len(active):
+            break
+        xx = np.array([calc(jd, body, flag)[0][0:4:3] for jd in t[active].tolist()]).reshape(-1, 2)
+        f = wrap180(xx[:, 0] - target[active])
+        v = xx[:, 1]
+        step = f / np.where(v != 0, v, np.inf)
+        nxt = t[active] - step
+        # 以 f 的符号与运动方向收缩区间
+        early = (f * np.sign(v)) < 0
+        lo[active] = np.where(early, t[active], lo[active])
+        hi[active] = np.where(early, hi[active], t[active])
+        inside = (nxt >= lo[active]) & (nxt <= hi[active]) & np.isfinite(nxt)
+        t[active] = np.where(inside, nxt, (lo[active] + hi[active]) / 2.0)
+        active = active[~(inside & (np.abs(step) < tol))]
+    return t
+
+
+def _chart_columns(jds, flag, bodies):
+    calc = swe.calc_ut
+    columns = {}
+    for name in bodies:
+        if name == 'Ke':
+            columns['Ke'] = (columns['Ra'] + 180.0) % 360.0 if 'Ra' in columns else \
+                (sample_body(jds, swe.MEAN_NODE, flag, index=(0,))[:, 0] + 180.0) % 360.0
+            continue
+        if name not in RETURN_CHART_BODIES:
+            raise ValueError(f"回归盘不支持的星体: {name}，可选: {', '.join(list(RETURN_CHART_BODIES) + ['Ke'])}")
+        columns[name] = np.array([calc(jd, RETURN_CHART_BODIES[name], flag)[0][0] % 360.0 for jd in jds.tolist()])
+    return columns
+
+
+@instrumented('find_returns')
+def find_returns(natal_lons, body, start, end, latitude=None, longitude=None, chart=False,
+                 chart_bodies=tuple(RETURN_CHART_BODIES) + ('Ke',), house_system='Placidus',
+                 ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None,
+                 tol=DEFAULT_TOLERANCE, chunk_size=20_000):
+    """
+    批量求回归时刻：星体 body 在时间范围内回到每位命主本命黄经的全部精确时刻。
+
+    参数:
+        natal_lons          : 各命主的本命黄经 (度)，标量或长度 M 的数组 (与 ecliptic_mode 同一黄道)
+        body                : 'Su'、'Mo'、STATION_BODIES 中的行星或 MINOR_PLANET_CATALOG 中的小行星
+        start, end          : 起止时间 (儒略日 UT、datetime64 或 UTC datetime)；也可为长度 M 的数组，逐人设定
+        latitude, longitude : 回归盘的地点 (度)，标量或长度 M 的数组；chart=True 时必须提供
+        chart               : 是否附上回归盘 (chart_bodies 的黄经与 house_system 的宫头)
+        tol                 : 求根精度 (天)
+        chunk_size          : 每批处理的命主数，控制峰值内存
+
+    返回:
+        DataFrame，按 (native, jd_ut) 排序，列为
+        native (natal_lons 中的索引), body, jd_ut, time (UTC datetime64), natal_lon,
+        retrograde (行星逆行时回到本命点为 True)；
+        chart=True 时再加 chart_bodies 各列与 'house 1' … 'house 12'、'Asc'、'MC'
+    """
+    natal = np.atleast_1d(np.asarray(natal_lons, dtype='float64')) % 360.0
+    M = len(natal)
+    starts = _per_native(to_jd_array(start), M, 'start')
+    ends = _per_native(to_jd_array(end), M, 'end')
+    if not np.all(ends > starts):
+        raise ValueError("结束时间必须晚于开始时间。")
+    if chart and (latitude is None or longitude is None):
+        raise ValueError("chart=True 时需要提供 latitude 与 longitude。")
+    body_id, step, retrograde = _body(body)
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+
+    _t = instrument.start()
+    t, U, speed, segments = _monotonic_track(body_id, flag, float(starts.min()), float(ends.max()),
+                                             step, retrograde, tol)
+    instrument.stop('find_returns.track', _t)
+
+    parts = []
+    for c0 in range(0, M, chunk_size):
+        chunk = natal[c0:c0 + chunk_size]
+        found = [_segment_roots(t, U, speed, a, b, chunk) for a, b in segments]
+        native = np.concatenate([f[0] for f in found]) + c0
+        i = np.concatenate([f[1] for f in found])
+        target = np.concatenate([f[2] for f in found])
+
+        guess = _interpolated_guess(t, U, speed, i, target)
+        _t = instrument.start()
+        jd = _refine(guess, t[i], t[i + 1], target % 360.0, body_id, flag, tol)
+        instrument.stop('find_returns.refine', _t)
+
+        keep = (jd >= starts[native]) & (jd <= ends[native])
+        parts.append((native[keep], jd[keep], (U[i + 1] < U[i])[keep]))
+
+    native, jd, retro = (np.concatenate(col) for col in zip(*parts))
+    order = np.lexsort((jd, native))
+    native, jd, retro = native[order], jd[order], retro[order]
+    df = pd.DataFrame({
+        'native': native.astype('int64'),
+        'body': pd.Categorical([body] * len(native)),
+        'jd_ut': jd,
+        'time': jd_to_datetime64(jd),
+        'natal_lon': natal[native],
+        'retrograde': retro,
+    })
+
+    if chart:
+        _t = instrument.start()
+        lat = _per_native(latitude, M, 'latitude')[native]
+        lon = _per_native(longitude, M, 'longitude')[native]
+        for name, values in _chart_columns(jd, flag, chart_bodies).items():
+            df[name] = values
+        houses = calculate_houses_batch(jd, lat, lon, house_system, ecliptic_mode, ayanamsha_mode, ephe_path)
+        df = pd.concat([df, houses], axis=1)
+        instrument.stop('find_returns.chart', _t)
+
+    instrument.add_rows('find_returns', len(df))
+    return df
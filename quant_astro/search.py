@@ -0,0 +1,187 @@
+# quant_astro/search.py
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from .core import _ensure_ephe_path, _resolve_ayanamsha, _to_jd_utc
+
+# =============================================================================
+# 事件搜索的公共工具
+#
+# 留/朔望/界线等事件都可以写成 "某个连续函数 f(t) 过零"：
+#   1. 在时间网格上采样 f，找出符号变化的相邻格点 (区间内恰有一个根的前提是网格步长小于事件最短间隔)；
+#   2. 每个区间用带保护的牛顿法求根：有导数时走牛顿步，牛顿步跳出区间或收敛过慢时退回二分。
+# 采样与求根都直接调用 swisseph，不构造星盘。
+# =============================================================================
+
+DEFAULT_TOLERANCE = 1e-7   # 儒略日，约 0.01 秒
+
+
+def ephemeris_flag(ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None):
+    """
+    准备星历并返回 swe.calc_ut 的标志位，黄道模式与 calculate_positions 相同
+    (sidereal 时设置岁差模式；swisseph 状态按线程保存，每次搜索开始时设置一次)。
+    """
+    _ensure_ephe_path(ephe_path)
+    if ecliptic_mode == 'sidereal':
+        swe.set_sid_mode(_resolve_ayanamsha(ayanamsha_mode))
+        return swe.FLG_SIDEREAL | swe.FLG_SWIEPH | swe.FLG_SPEED
+    if ecliptic_mode != 'tropical':
+        raise ValueError(f"ecliptic_mode 必须是 'sidereal' 或 'tropical'，收到: {ecliptic_mode!r}")
+    return swe.FLG_SWIEPH | swe.FLG_SPEED
+
+
+def jd_range(start, end):
+    """起止时间 (儒略日 UT、numpy.datetime64 或 UTC datetime) 转为 (jd_start, jd_end)。"""
+    jd_start, jd_end = _to_jd_utc(start), _to_jd_utc(end)
+    if not jd_end > jd_start:
+        raise ValueError("结束时间必须晚于开始时间。")
+    return jd_start, jd_end
+
+
+def to_jd_array(timestamps):
+    """
+    时间数组 -> 儒略日 (UT) 数组。
+    接受儒略日浮点数，或 UTC 的 numpy.datetime64 / pandas.DatetimeIndex / datetime 序列 (带时区的先转为 UTC)。
+    """
+    if isinstance(timestamps, pd.Series):
+        timestamps = pd.Index(timestamps)
+    if isinstance(timestamps, pd.DatetimeIndex) and timestamps.tz is not None:
+        timestamps = timestamps.tz_convert('UTC').tz_localize(None)
+    values = np.asarray(timestamps)
+    if values.dtype.kind in 'fiu':
+        return values.astype('float64')
+    us = values.astype('datetime64[us]').astype('int64')
+    return 2440587.5 + us / 86400e6
+
+
+def jd_to_datetime64(jd):
+    """儒略日 (UT) 数组 -> numpy.datetime64[us] (UTC)。"""
+    us = np.rint((np.asarray(jd, dtype='float64') - 2440587.5) * 86400e6).astype('int64')
+    return us.astype('datetime64[us]')
+
+
+def time_grid(jd_start, jd_end, step):
+    """覆盖 [jd_start, jd_end] 的等距网格 (末点恰为 jd_end)。"""
+    n = max(int(np.ceil((jd_end - jd_start) / step)), 1)
+    return np.linspace(jd_start, jd_end, n + 1)
+
+
+def sample_body(jds, body, flag, index=(0, 3)):
+    """
+    在网格上逐点调用 swe.calc_ut，返回形状 (len(jds), len(index)) 的数组
+    (默认取 黄经、黄经速度 两列；赤道坐标等传入相应的 flag 与 index)。
+    """
+    calc = swe.calc_ut
+    out = np.empty((len(jds), len(index)))
+    for k, jd in enumerate(np.asarray(jds, dtype='float64').tolist()):
+        xx = calc(jd, body, flag)[0]
+        out[k] = [xx[i] for i in index]
+    return out
+
+
+def hermite(t, t0, t1, y0, y1, m0, m1):
+    """三次 Hermite 插值：区间 [t0, t1] 两端的值 y 与导数 m 均已知 (可为数组)。"""
+    h = t1 - t0
+    s = (t - t0) / h
+    s2, s3 = s * s, s * s * s
+    return ((2 * s3 - 3 * s2 + 1) * y0 + (s3 - 2 * s2 + s) * h * m0
+            + (-2 * s3 + 3 * s2) * y1 + (s3 - s2) * h * m1)
+
+
+def body_longitudes(jds, bodies, flag, step=0.25):
+    """
+    多个时刻 × 多个星体的黄经与速度，返回两个形状 (len(jds), len(bodies)) 的数组 (黄经 0–360、速度)。
+
+    时刻数多于覆盖它们的网格点数时，只在步长为 step 天的网格上调用星历，
+    其余时刻用黄经与速度做三次 Hermite 插值 (日月在 0.25 天步长下误差约 1e-5°)；否则逐点直接计算。
+    """
+    jds = np.asarray(jds, dtype='float64')
+    if len(jds) == 0:
+        return np.empty((0, len(bodies))), np.empty((0, len(bodies)))
+    lo, hi = float(np.nanmin(jds)), float(np.nanmax(jds))
+    grid = time_grid(lo, hi, step) if hi > lo else np.array([lo])
+    direct = len(jds) <= len(grid)
+    points = jds if direct else grid
+
+    lon = np.empty((len(points), len(bodies)))
+    speed = np.empty_like(lon)
+    for b, body in enumerate(bodies):
+        samples = sample_body(np.nan_to_num(points, nan=lo), body, flag)
+        lon[:, b], speed[:, b] = samples[:, 0], samples[:, 1]
+    if direct:
+        return lon % 360.0, speed
+
+    unwrapped = np.degrees(np.unwrap(np.radians(lon), axis=0))
+    k = np.clip(np.searchsorted(grid, jds, side='right') - 1, 0, len(grid) - 2)[:, None]
+    t = jds[:, None]
+    out_lon = hermite(t, grid[k], grid[k + 1], np.take_along_axis(unwrapped, k, 0), np.take_along_axis(unwrapped, k + 1, 0),
+                      np.take_along_axis(speed, k, 0), np.take_along_axis(speed, k + 1, 0))
+    # 速度取两端的线性插值
+    w = (t - grid[k]) / (grid[k + 1] - grid[k])
+    out_speed = (1 - w) * np.take_along_axis(speed, k, 0) + w * np.take_along_axis(speed, k + 1, 0)
+    return out_lon % 360.0, out_speed
+
+
+def wrap180(angle):
+    """角度差归一到 [-180, 180)。"""
+    return (np.asarray(angle) + 180.0) % 360.0 - 180.0
+
+
+def sign_changes(values):
+    """
+    相邻样本符号变化 (含恰为 0 的样本) 的左端索引 i：values[i] 与 values[i + 1] 之间有根。
+    恰为 0 的样本只归入以它为右端的区间，不会重复报告。
+    """
+    values = np.asarray(values, dtype='float64')
+    left, right = values[:-1], values[1:]
+    return np.flatnonzero(((left < 0) & (right >= 0)) | ((left > 0) & (right <= 0)))
+
+
+def solve_root(fdf, lo, hi, f_lo=None, f_hi=None, tol=DEFAULT_TOLERANCE, max_iter=60):
+    """
+    带保护的牛顿法 (rtsafe)：在 [lo, hi] 内求 f 的根，要求 f(lo)、f(hi) 异号。
+
+    fdf(t) 返回 (f, f')；f' 可为 None，此时用割线斜率代替。
+    返回根所在的时间；区间端点不异号时抛出 ValueError。
+    """
+    if f_lo is None:
+        f_lo = fdf(lo)[0]
+    if f_hi is None:
+        f_hi = fdf(hi)[0]
+    if f_lo == 0:
+        return lo
+    if f_hi == 0:
+        return hi
+    if (f_lo > 0) == (f_hi > 0):
+        raise ValueError(f"区间 [{lo}, {hi}] 两端函数值同号，无法求根。")
+    # 让 f(lo) < 0
+    if f_lo > 0:
+        lo, hi, f_lo, f_hi = hi, lo, f_hi, f_lo
+
+    t = lo - f_lo * (hi - lo) / (f_hi - f_lo)
+    step_old = abs(hi - lo)
+    for _ in range(max_iter):
+        f, df = fdf(t)
+        if f == 0:
+            return t
+        if f < 0:
+            lo, f_lo = t, f
+        else:
+            hi, f_hi = t, f
+        if df is None or df == 0:
+            df = (f_hi - f_lo) / (hi - lo)
+        newton = t - f / df
+        # 牛顿步落在区间外或收敛不够快时二分
+        if (newton - lo) * (newton - hi) > 0 or abs(newton - t) > step_old / 2:
+            step_old = abs(hi - lo)
+            t = (lo + hi) / 2.0
+            if step_old < tol:
+                return t
+        else:
+            step_old = abs(newton - t)
+            t = newton
+            if step_old < tol:
+                return t
+    return t
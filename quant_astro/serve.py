@@ -0,0 +1,384 @@
+# quant_astro/serve.py
+"""
+本地 HTTP 星盘服务 (可选组件，仅依赖标准库)。
+
+    python -m quant_astro.serve --port 8765 --workers 4
+
+所有计算端点均为 POST，请求体为 JSON：
+    {
+        "birth_config": {"local_time_str": ..., "timezone_str": ..., "latitude_str": ...,
+                         "longitude_str": ..., "elevation": 0.0, "calendar": "g"},
+        "options": {... calculate_positions 的计算选项 ...},
+        ... 端点需要的其他字段 ...
+    }
+
+    /positions      行星、宫位、ascmc、jd_utc、庙旺、小行星
+    /kp_lords       KP 行星/宫位主星 (另需 KP 计算所用的 options)
+    /significators  KP 象征星
+    /aspects        相位 (另需 "aspect_config")
+    /attributes     阿拉伯点、映点、界与面 (可选 "attributes": get_attributes 的关键字参数)
+    /dasha          Vimshottari Dasha (需 "dasa_config"；给出 "at" 时间戳列表则返回各层主星标注，
+                    否则返回 Dasha 表的行，"max_rows" 限制行数)
+
+GET /health 与 GET /stats 返回服务状态 (/stats 含 worker 实际使用的星历目录 ephe_path)。
+
+并发到达的同一端点请求在 max_delay_ms 内合并为一批 (至多 max_batch 条；worker 都忙时继续累积)，
+整批交给预热过星历的 worker 进程 (aio.create_executor) 一次处理：相同请求只算一次，
+出生时间/时区/经纬度用 parse_birth_columns 向量化解析，结果在 worker 中直接编码为 JSON。
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from datetime import date, datetime
+from http import HTTPStatus
+
+import numpy as np
+
+from .aio import MicroBatcher, create_executor, worker_ephe_path
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_DELAY_MS = 2.0
+MAX_BODY_BYTES = 1024 * 1024
+DEFAULT_MAX_DASHA_ROWS = 10000
+
+# 出生配置中属于时间/地点解析的字段，其余选项原样传给 calculate_positions
+_BIRTH_FIELDS = ('local_time_str', 'timezone_str', 'latitude_str', 'longitude_str')
+
+
+# =============================================================================
+# worker 端 (在进程池中运行)
+# =============================================================================
+
+def _json_default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _encode(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def _options(payload):
+    options = dict(payload.get('options') or {})
+    birth = payload['birth_config']
+    options.setdefault('elevation', birth.get('elevation', 0.0))
+    return options
+
+
+def _parse_births(payloads):
+    """
+    批量解析出生时间与地点，返回与 payloads 等长的 (jd_utc, latitude, longitude) 或异常。
+    按时区策略分组后各做一次向量化解析；某组解析失败时逐条重试，只让出错的请求失败。
+    """
+    from .core import parse_birth_columns
+
+    results = [None] * len(payloads)
+    groups = {}
+    for k, payload in enumerate(payloads):
+        birth = payload['birth_config']
+        policy = (birth.get('ambiguous', 'raise'), birth.get('nonexistent', 'raise'))
+        groups.setdefault(policy, []).append(k)
+
+    def parse(indices, policy):
+        births = [payloads[k]['birth_config'] for k in indices]
+        cols = parse_birth_columns(
+            [b['local_time_str'] for b in births], [b['timezone_str'] for b in births],
+            [b['latitude_str'] for b in births], [b['longitude_str'] for b in births],
+            calendar=[b.get('calendar', 'g') for b in births],
+            ambiguous=policy[0], nonexistent=policy[1],
+        )
+        for row, k in enumerate(indices):
+            jd = cols['jd_utc'][row]
+            if np.isnan(jd):
+                results[k] = ValueError(f"本地时间在时区 {births[row]['timezone_str']} 中不存在或有歧义")
+            else:
+                results[k] = (float(jd), float(cols['latitude'][row]), float(cols['longitude'][row]))
+
+    for policy, indices in groups.items():
+        try:
+            parse(indices, policy)
+        except (ValueError, KeyError, TypeError):
+            for k in indices:
+                try:
+                    parse([k], policy)
+                except (ValueError, KeyError, TypeError) as exc:
+                    results[k] = exc
+    return results
+
+
+def _positions(payload, parsed):
+    from .core import calculate_positions_numeric
+    if isinstance(parsed, Exception):
+        raise parsed
+    jd_utc, latitude, longitude = parsed
+    options = _options(payload)
+    elevation = options.pop('elevation')
+    return calculate_positions_numeric(jd_utc, latitude, longitude, elevation, **options)
+
+
+def _handle_positions(payload, parsed):
+    planets, houses, ascmc, jd_utc, dignities, minor = _positions(payload, parsed)
+    return {'planets': planets, 'houses': houses, 'ascmc': list(ascmc), 'jd_utc': jd_utc,
+            'dignities': dignities, 'minor_planets': minor}
+
+
+def _handle_kp_lords(payload, parsed):
+    from .kp import get_kp_lords
+    planets, houses = _positions(payload, parsed)[:2]
+    kp_planets, kp_houses = get_kp_lords(planets, houses)
+    return {'planets': kp_planets, 'houses': kp_houses}
+
+
+def _handle_significators(payload, parsed):
+    from .kp import get_kp_lords, get_significators
+    planets, houses = _positions(payload, parsed)[:2]
+    kp_planets, kp_houses = get_kp_lords(planets, houses)
+    planet_sigs, house_sigs = get_significators(planets, houses, kp_planets, kp_houses)
+    return {'planets': planet_sigs, 'houses': house_sigs}
+
+
+def _handle_aspects(payload, parsed):
+    from .aspects import calculate_aspects
+    if 'aspect_config' not in payload:
+        raise ValueError("请求缺少 'aspect_config'")
+    planets, houses = _positions(payload, parsed)[:2]
+    return calculate_aspects(planets, houses, payload['aspect_config'])
+
+
+def _handle_attributes(payload, parsed):
+    from .attributes import get_attributes
+    planets, houses, _, jd_utc, _, minor = _positions(payload, parsed)
+    names = ('planets', 'houses', 'minor_planets', 'fixed_stars', 'arabic_parts', 'antiscia', 'contra_antiscia')
+    result = get_attributes(planets, houses, jd=jd_utc, minor_planet_positions=minor,
+                            **(payload.get('attributes') or {}))
+    return dict(zip(names, result))
+
+
+def _handle_dasha(payload, parsed):
+    from itertools import islice
+    from .dasha_Vimshottari import DASHA_LORDS, label_dasha_index, _iter_dasha_rows
+    from .dasha_Vimshottari_api import _prepare_dasha_seed
+    if 'dasa_config' not in payload:
+        raise ValueError("请求缺少 'dasa_config'")
+    dasa_config = payload['dasa_config']
+    planets = _positions(payload, parsed)[0]
+    start, first_lord, _ = _prepare_dasha_seed(planets, payload['birth_config'], dasa_config)
+    result = {'dasha_start': start.isoformat(), 'first_lord': first_lord}
+    if 'at' in payload:
+        at = np.array(payload['at'], dtype='datetime64[us]')
+        labels = label_dasha_index(at, start, first_lord, dasa_config)
+        result['labels'] = [[DASHA_LORDS[i] if i >= 0 else None for i in row] for row in labels.to_numpy().tolist()]
+    else:
+        max_rows = int(payload.get('max_rows', DEFAULT_MAX_DASHA_ROWS))
+        result['rows'] = list(islice(_iter_dasha_rows(start, first_lord, dasa_config), max_rows))
+    return result
+
+
+_HANDLERS = {
+    'positions': _handle_positions,
+    'kp_lords': _handle_kp_lords,
+    'significators': _handle_significators,
+    'aspects': _handle_aspects,
+    'attributes': _handle_attributes,
+    'dasha': _handle_dasha,
+}
+
+
+def _run_batch(endpoint, bodies):
+    """
+    worker 任务：处理同一端点的一批请求体 (原始 JSON 字节)。
+    返回与输入等长的 [(HTTP 状态码, JSON 字节)]；单条失败不影响同批其他请求。
+    """
+    handler = _HANDLERS[endpoint]
+    responses = [None] * len(bodies)
+
+    # 完全相同的请求体只计算一次
+    unique = {}
+    for k, body in enumerate(bodies):
+        unique.setdefault(body, []).append(k)
+
+    payloads, owners = [], []
+    for body, indices in unique.items():
+        try:
+            payload = json.loads(body)
+            if not isinstance(payload, dict) or not isinstance(payload.get('birth_config'), dict):
+                raise ValueError("请求体必须是包含 'birth_config' 对象的 JSON")
+            missing = [f for f in _BIRTH_FIELDS if f not in payload['birth_config']]
+            if missing:
+                raise ValueError(f"birth_config 缺少字段: {', '.join(missing)}")
+        except ValueError as exc:
+            for k in indices:
+                responses[k] = (400, _encode({'error': str(exc)}))
+            continue
+        payloads.append(payload)
+        owners.append(indices)
+
+    for payload, parsed, indices in zip(payloads, _parse_births(payloads), owners):
+        try:
+            response = (200, _encode(handler(payload, parsed)))
+        except (ValueError, KeyError, TypeError) as exc:
+            response = (400, _encode({'error': f"{type(exc).__name__}: {exc}"}))
+        except Exception as exc:
+            response = (500, _encode({'error': f"{type(exc).__name__}: {exc}"}))
+        for k in indices:
+            responses[k] = response
+    return responses
+
+
+# =============================================================================
+# 主进程：HTTP/1.1 (keep-alive)
+# =============================================================================
+
+def _response(status, body, keep_alive):
+    phrase = HTTPStatus(status).phrase
+    head = (f"HTTP/1.1 {status} {phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def _read_request(reader):
+    """读取一个请求，返回 (方法, 路径, 头部字典, 请求体)；连接关闭时返回 None。"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise _HttpError(400, '无法解析的 HTTP 请求')
+    if length > MAX_BODY_BYTES:
+        raise _HttpError(413, '请求体过大')
+    body = await reader.readexactly(length) if length else b''
+    return method, path.split('?', 1)[0], headers, body
+
+
+def _make_handler(batcher, started):
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except _HttpError as exc:
+                    writer.write(_response(exc.status, _encode({'error': str(exc)}), False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                endpoint = path.strip('/')
+
+                if method == 'GET' and endpoint == 'health':
+                    status, payload = 200, _encode({'status': 'ok'})
+                elif method == 'GET' and endpoint == 'stats':
+                    # ephe_path 由 worker 报告，用于确认自定义星历在处理请求之后仍然生效
+                    ephe_path = await asyncio.wrap_future(batcher.executor.submit(worker_ephe_path))
+                    status, payload = 200, _encode(dict(batcher.stats(), uptime_s=time.monotonic() - started,
+                                                        ephe_path=ephe_path))
+                elif endpoint not in _HANDLERS:
+                    status, payload = 404, _encode({'error': f"未知端点: {path}"})
+                elif method != 'POST':
+                    status, payload = 405, _encode({'error': '计算端点只接受 POST'})
+                else:
+                    try:
+                        status, payload = await batcher.submit(endpoint, body)
+                    except Exception as exc:
+                        # worker 进程异常退出等整批失败的情况
+                        status, payload = 500, _encode({'error': f"{type(exc).__name__}: {exc}"})
+
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_batch=DEFAULT_MAX_BATCH,
+                max_delay_ms=DEFAULT_MAX_DELAY_MS, ephe_path=None, cache_path=None, ready=None):
+    """
+    启动服务并一直运行，直到收到 SIGTERM 或任务被取消 (如 Ctrl-C)。ready 若提供，在开始监听后以 (host, port) 调用一次。
+    退出时停止监听并关闭执行器，等待 worker 进程退出 (尚未开始的批直接取消)，不会留下孤儿进程。
+    """
+    # workers=0 时在单个后台线程中计算 (不支持多线程并发，见 aio 模块说明)，否则为进程池
+    kind = 'thread' if workers == 0 else 'process'
+    executor = create_executor(kind, workers or None, ephe_path, cache_path)
+    batcher = MicroBatcher(executor, _run_batch, max_batch, max_delay_ms)
+    server = await asyncio.start_server(_make_handler(batcher, time.monotonic()), host, port)
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    try:
+        # SIGTERM (如 Popen.terminate) 默认会直接结束主进程，进程池的 worker 成为孤儿；改为正常退出
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+    except (NotImplementedError, RuntimeError):
+        pass   # Windows 或非主线程的事件循环
+    try:
+        bound = server.sockets[0].getsockname()[:2]
+        if ready is not None:
+            ready(*bound)
+        async with server:
+            await stop.wait()
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGTERM)
+        except (NotImplementedError, RuntimeError):
+            pass
+        if sys.version_info >= (3, 9):
+            executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            executor.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='quant_astro 本地星盘服务')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='为 0 时由系统分配端口')
+    parser.add_argument('--workers', type=int, default=None, help='worker 进程数 (默认 CPU 核数；0 表示单线程)')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help='每批最多合并的请求数')
+    parser.add_argument('--max-delay-ms', type=float, default=DEFAULT_MAX_DELAY_MS, help='合并请求的等待窗口 (毫秒)')
+    parser.add_argument('--ephe-path', default=None, help='星历目录 (默认使用库内置星历)')
+    parser.add_argument('--cache', dest='cache_path', default=None, help='在 worker 中启用持久化缓存的文件路径')
+    args = parser.parse_args(argv)
+
+    def ready(host, port):
+        # 以固定格式输出监听地址，便于脚本 (如 benchmarks/load_test.py) 解析
+        print(f"quant_astro.serve listening on http://{host}:{port}", flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_batch, args.max_delay_ms,
+                          args.ephe_path, args.cache_path, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
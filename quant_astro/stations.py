@@ -0,0 +1,168 @@
+# quant_astro/stations.py
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .core import MINOR_PLANET_CATALOG
+from .search import (DEFAULT_TOLERANCE, ephemeris_flag, jd_range, jd_to_datetime64, time_grid, sample_body,
+                     wrap180, sign_changes, solve_root)
+
+# =============================================================================
+# 留 (Station) 与逆行阴影期
+#
+# 留 = 黄经速度过零：由正变负为留逆 (station_retrograde)，由负变正为留顺 (station_direct)。
+# 网格步长按各星体最短逆行期设定 (保证一个区间内至多一次变号)；|速度| 出现局部极小却未变号的格点附近
+# 再加密采样一次，防止贴着零擦过的留被漏掉。每个变号区间用牛顿法求根，导数 (加速度) 由速度的中心差分给出。
+# 阴影期：留逆之前行星顺行到达留顺点黄经的时刻 (shadow_entry)，留顺之后回到留逆点黄经的时刻 (shadow_exit)，
+# 同样以黄经为函数、速度为导数求根。
+# =============================================================================
+
+# 星体 -> (swisseph 常量, 采样步长 (天), 阴影期搜索的前后延伸 (天))
+STATION_BODIES = {
+    'Me': (swe.MERCURY, 4.0, 45.0),
+    'Ve': (swe.VENUS, 10.0, 60.0),
+    'Ma': (swe.MARS, 10.0, 90.0),
+    'Ju': (swe.JUPITER, 15.0, 130.0),
+    'Sa': (swe.SATURN, 15.0, 140.0),
+    'Ur': (swe.URANUS, 20.0, 160.0),
+    'Ne': (swe.NEPTUNE, 20.0, 170.0),
+    'Pl': (swe.PLUTO, 20.0, 180.0),
+}
+# 小行星 (MINOR_PLANET_CATALOG 中的简写)：逆行期最短约两个月
+MINOR_STATION_STEP = 10.0
+MINOR_SHADOW_PAD = 180.0
+
+DEFAULT_STATION_BODIES = tuple(STATION_BODIES)
+STATION_EVENTS = ('station_retrograde', 'station_direct', 'shadow_entry', 'shadow_exit')
+
+_SPEED_DIFF_STEP = 0.01   # 中心差分求加速度的步长 (天)
+
+
+def _body_settings(name):
+    if name in STATION_BODIES:
+        return STATION_BODIES[name]
+    if name in MINOR_PLANET_CATALOG:
+        return MINOR_PLANET_CATALOG[name], MINOR_STATION_STEP, MINOR_SHADOW_PAD
+    raise ValueError(f"不支持的星体: {name}，可选: {', '.join(list(STATION_BODIES) + list(MINOR_PLANET_CATALOG))}")
+
+
+def _speed_brackets(t, speed, body, flag, step):
+    """速度变号的区间 (左端, 右端)；局部极小处加密采样补充贴零的留。"""
+    brackets = [(t[i], t[i + 1], speed[i], speed[i + 1]) for i in sign_changes(speed)]
+    mag = np.abs(speed)
+    dips = np.flatnonzero((mag[1:-1] < mag[:-2]) & (mag[1:-1] <= mag[2:])) + 1
+    for i in dips:
+        if np.sign(speed[i - 1]) != np.sign(speed[i + 1]) or np.sign(speed[i]) != np.sign(speed[i + 1]):
+            continue   # 已由变号区间覆盖
+        fine_t = np.linspace(t[i - 1], t[i + 1], 17)
+        fine_v = sample_body(fine_t, body, flag, index=(3,))[:, 0]
+        brackets += [(fine_t[k], fine_t[k + 1], fine_v[k], fine_v[k + 1]) for k in sign_changes(fine_v)]
+    return sorted(brackets)
+
+
+def _station_time(body, flag, lo, hi, v_lo, v_hi, tol):
+    calc = swe.calc_ut
+    h = _SPEED_DIFF_STEP
+
+    def fdf(jd):
+        speed = calc(jd, body, flag)[0][3]
+        accel = (calc(jd + h, body, flag)[0][3] - calc(jd - h, body, flag)[0][3]) / (2.0 * h)
+        return speed, accel
+
+    return solve_root(fdf, lo, hi, v_lo, v_hi, tol=tol)
+
+
+def _crossing_time(body, flag, t, lon, target, tol, last):
+    """
+    在 (t, lon) 样本内找黄经顺行越过 target 的时刻 (wrap180(lon - target) 由负变正)；
+    last=True 取最后一次，否则取第一次。找不到时返回 None。
+    """
+    f = wrap180(lon - target)
+    rising = [i for i in sign_changes(f) if f[i] < 0]
+    if not rising:
+        return None
+    i = rising[-1] if last else rising[0]
+    calc = swe.calc_ut
+
+    def fdf(jd):
+        xx = calc(jd, body, flag)[0]
+        return float(wrap180(xx[0] - target)), xx[3]
+
+    return solve_root(fdf, t[i], t[i + 1], f[i], f[i + 1], tol=tol)
+
+
+def _body_events(name, jd_start, jd_end, flag, shadows, tol):
+    body, step, pad = _body_settings(name)
+    pad = pad if shadows else step
+    t = time_grid(jd_start - pad, jd_end + pad, step)
+    samples = sample_body(t, body, flag)
+    lon, speed = samples[:, 0], samples[:, 1]
+
+    stations = []
+    for lo, hi, v_lo, v_hi in _speed_brackets(t, speed, body, flag, step):
+        jd = _station_time(body, flag, lo, hi, v_lo, v_hi, tol)
+        event = 'station_retrograde' if v_lo > 0 else 'station_direct'
+        stations.append((jd, event, swe.calc_ut(jd, body, flag)[0][0] % 360.0))
+
+    events = [(name, event, jd, station_lon) for jd, event, station_lon in stations]
+    if shadows:
+        for k in range(len(stations) - 1):
+            (t_sr, e_sr, lon_sr), (t_sd, e_sd, lon_sd) = stations[k], stations[k + 1]
+            if e_sr != 'station_retrograde' or e_sd != 'station_direct':
+                continue
+            # 进入阴影：上一个留顺 (或网格起点) 与留逆之间，最后一次顺行越过留顺点
+            t_prev, lon_prev = (stations[k - 1][0], stations[k - 1][2]) if k > 0 else (t[0], lon[0])
+            window = (t > t_prev) & (t < t_sr)
+            entry = _crossing_time(body, flag, np.r_[t_prev, t[window], t_sr], np.r_[lon_prev, lon[window], lon_sr],
+                                   lon_sd, tol, last=True)
+            if entry is not None:
+                events.append((name, 'shadow_entry', entry, lon_sd))
+            # 离开阴影：留顺与下一个留逆 (或网格终点) 之间，第一次顺行越过留逆点
+            t_next = stations[k + 2][0] if k + 2 < len(stations) else t[-1]
+            window = (t > t_sd) & (t < t_next)
+            exit_ = _crossing_time(body, flag, np.r_[t_sd, t[window]], np.r_[lon_sd, lon[window]],
+                                   lon_sr, tol, last=False)
+            if exit_ is not None:
+                events.append((name, 'shadow_exit', exit_, lon_sr))
+
+    return [event for event in events if jd_start <= event[2] <= jd_end]
+
+
+@instrumented('find_stations')
+def find_stations(start, end, bodies=DEFAULT_STATION_BODIES, shadows=True,
+                  ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', ephe_path=None,
+                  tol=DEFAULT_TOLERANCE):
+    """
+    查找时间范围内各星体的留逆、留顺以及逆行阴影期的进出时刻。
+
+    参数:
+        start, end     : 起止时间 (儒略日 UT、numpy.datetime64 或 UTC datetime)
+        bodies         : 星体简写，默认水星至冥王星；也可加入 MINOR_PLANET_CATALOG 中的小行星 ('Ch', 'Ce' 等)
+        shadows        : 是否计算阴影期 (shadow_entry / shadow_exit)
+        ecliptic_mode / ayanamsha_mode / ephe_path : 与 calculate_positions 相同 (恒星黄道中速度相差岁差速率)
+        tol            : 求根精度 (天)
+
+    返回:
+        DataFrame，按时间排序，列为
+        body, event (STATION_EVENTS 之一), jd_ut, time (UTC datetime64), lon (留的黄经；阴影期为所越过的黄经)
+        只返回发生在 [start, end] 内的事件。
+    """
+    jd_start, jd_end = jd_range(start, end)
+    flag = ephemeris_flag(ecliptic_mode, ayanamsha_mode, ephe_path)
+    bodies = [bodies] if isinstance(bodies, str) else list(bodies)
+
+    rows = []
+    for name in bodies:
+        _t = instrument.start()
+        rows.extend(_body_events(name, jd_start, jd_end, flag, shadows, tol))
+        instrument.stop(f'find_stations.{name}', _t)
+
+    df = pd.DataFrame(rows, columns=['body', 'event', 'jd_ut', 'lon'])
+    df = df.sort_values(['jd_ut', 'body'], kind='stable').reset_index(drop=True)
+    df.insert(3, 'time', jd_to_datetime64(df['jd_ut'].to_numpy()))
+    df['event'] = pd.Categorical(df['event'], categories=STATION_EVENTS)
+    instrument.add_rows('find_stations', len(df))
+    return df
@@ -0,0 +1,137 @@
+# quant_astro/sweep.py
+
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .core import HOUSE_SYSTEMS, PLANET_DIGNITIES, _ensure_ephe_path, _to_jd_utc
+from .kp import get_kp_lords
+from .aspects import calculate_aspects, parse_orb_config, parse_aspect_types, _orb_pair_records
+from .zodiacs import ayanamsha_value, _body_list, _ephemeris_pass, _variant_planets, _variant_houses
+
+# =============================================================================
+# 多地点 × 多宫制扫描：同一时刻的行星只算一次
+#
+# 行星位置、行星的 KP 星主、行星之间的相位都与地点和宫制无关，整个扫描共用一份；
+# 每个 (地点, 宫制) 组合只调用一次 swe.houses_ex2，再补上宫头的 KP 星主与"行星-宫头"相位。
+# 宫头按热带计算后减去岁差 (与 zodiacs 相同，结果与 calculate_positions 的恒星黄道宫头一致)。
+# 组合的相位结果与 calculate_aspects(行星, 宫位, aspect_config) 逐条相同：
+# orb_mode 由共用的行星对记录与本组合的行星-宫头记录按原顺序合并，whole_sign / vedic 只与行星有关，直接共用。
+# =============================================================================
+
+
+def _normalize_locations(locations):
+    """{名称: (纬度, 经度)} 或 [(纬度, 经度), ...] (名称为序号) -> [(名称, 纬度, 经度)]。"""
+    items = locations.items() if isinstance(locations, dict) else enumerate(locations)
+    normalized = []
+    for name, loc in items:
+        if len(loc) < 2:
+            raise ValueError(f"地点 {name!r} 需要 (纬度, 经度)。")
+        normalized.append((name, float(loc[0]), float(loc[1])))
+    if not normalized:
+        raise ValueError("locations 不能为空。")
+    return normalized
+
+
+def _chart_aspects(shared, bodies, houses, aspect_config, orb_settings, custom_aspects, dec_settings):
+    """在共用的行星相位上补上行星-宫头的容许度相位，顺序与 calculate_aspects 相同。"""
+    if 'orb' not in aspect_config.get('modes', []):
+        return shared
+    house_bodies = [{'name': f"house {h}", 'type': 'house', 'data': houses[f"house {h}"]}
+                    for h in aspect_config.get('active_houses', []) if f"house {h}" in houses]
+    shared_by_p1 = {}
+    for record in shared.get('orb_mode', []):
+        shared_by_p1.setdefault(record['p1'], []).append(record)
+
+    orb_results = []
+    for body in bodies:
+        orb_results.extend(shared_by_p1.get(body['name'], []))
+        for house in house_bodies:
+            limit = (orb_settings.get(body['name'], 0.0) + orb_settings.get(house['name'], 0.0)) / 2.0
+            orb_results.extend(_orb_pair_records(body, house, limit, custom_aspects, dec_settings))
+    return {**shared, 'orb_mode': orb_results}
+
+
+@instrumented('calculate_positions_sweep')
+def calculate_positions_sweep(when, locations, house_systems=('Placidus',), utc_offset=0.0,
+                              ecliptic_mode='sidereal', ayanamsha_mode='SIDM_KRISHNAMURTI', node_mode='mean',
+                              ephe_path=None, kp=True, aspect_config=None,
+                              selected_planets=None, selected_minor_planets=()):
+    """
+    同一时刻在多个地点、多个宫制下的星盘：行星只计算一次，每个组合只计算宫头。
+
+    参数:
+        when, utc_offset : 与 calculate_positions_numeric 相同
+        locations        : {名称: (纬度, 经度)}，或 [(纬度, 经度), ...] (名称为序号)
+        house_systems    : HOUSE_SYSTEMS 中的宫制名称列表
+        kp               : 是否计算 KP 星主 (行星共用一份，宫头逐组合)
+        aspect_config    : 与 calculate_aspects 相同的配置字典；为 None 时不计算相位
+        其余参数与 calculate_positions 相同
+
+    返回:
+        字典:
+            'jd_utc', 'ayanamsha', 'planets', 'minor_planets', 'dignities',
+            'kp_planets'  : 共用的行星 KP 星主 (kp=True 时)
+            'aspects'     : 共用的行星之间的相位 (aspect_config 不为 None 时)
+            'cusps'       : DataFrame，索引为 (location, house_system)，列为 'house 1' … 'house 12'、'Asc'、'MC'、'ARMC'
+            'charts'      : {(地点名, 宫制): {'houses': 宫位字典, 'ascmc': ascmc 元组,
+                                             'kp_houses': ..., 'aspects': ...}}
+        宫位字典与相位结果的格式与 calculate_positions / calculate_aspects 相同。
+    """
+    house_systems = list(dict.fromkeys([house_systems] if isinstance(house_systems, str) else house_systems))
+    unknown = [hs for hs in house_systems if hs not in HOUSE_SYSTEMS]
+    if unknown:
+        raise ValueError(f"不支持的宫制: {', '.join(unknown)}，可选: {', '.join(HOUSE_SYSTEMS)}")
+    if ecliptic_mode not in ('sidereal', 'tropical'):
+        raise ValueError(f"ecliptic_mode 必须是 'sidereal' 或 'tropical'，收到: {ecliptic_mode!r}")
+    locations = _normalize_locations(locations)
+    jd_utc = _to_jd_utc(when, utc_offset)
+    _ensure_ephe_path(ephe_path)
+    sidereal = ecliptic_mode == 'sidereal'
+    aya, rate = ayanamsha_value(jd_utc, ayanamsha_mode if sidereal else 'tropical')
+
+    # 1. 共用部分：行星、行星 KP 星主、行星之间的相位
+    _t = instrument.start()
+    raw, eps = _ephemeris_pass(jd_utc, _body_list(node_mode, selected_planets, selected_minor_planets), sidereal)
+    planets, minor = _variant_planets(raw, aya, rate, eps, sidereal, selected_planets)
+    result = {'jd_utc': jd_utc, 'ayanamsha': aya, 'planets': planets, 'minor_planets': minor,
+              'dignities': PLANET_DIGNITIES.copy()}
+    all_planets = {**planets, **minor}
+    if kp:
+        result['kp_planets'], _ = get_kp_lords(all_planets, {})
+    if aspect_config is not None:
+        result['aspects'] = calculate_aspects(all_planets, {}, aspect_config)
+        orb_settings = parse_orb_config(aspect_config.get('orb_config_str', ''))
+        custom_aspects = parse_aspect_types(aspect_config.get('aspect_types', []))
+        dec_config = aspect_config.get('declination', {})
+        dec_settings = ((dec_config.get('orb', 1.2), dec_config.get('parallel_sym', '∥'),
+                         dec_config.get('contra_sym', '∦')) if dec_config.get('is_active', False) else None)
+        bodies = [{'name': name, 'type': 'planet', 'data': data} for name, data in all_planets.items()]
+    instrument.stop('calculate_positions_sweep.planets', _t)
+
+    # 2. 每个 (地点, 宫制) 组合：宫头、宫头 KP 星主、行星-宫头相位
+    _t = instrument.start()
+    charts, rows, index = {}, [], []
+    for name, latitude, longitude in locations:
+        for house_system in house_systems:
+            cusps, ascmc, cusp_speeds, _ = swe.houses_ex2(jd_utc, latitude, longitude, HOUSE_SYSTEMS[house_system],
+                                                          flags=0)
+            houses, chart_ascmc = _variant_houses(cusps, cusp_speeds, ascmc, aya, eps,
+                                                 whole_sign=house_system == 'Whole Sign')
+            chart = {'houses': houses, 'ascmc': chart_ascmc}
+            if kp:
+                _, chart['kp_houses'] = get_kp_lords({}, houses)
+            if aspect_config is not None:
+                chart['aspects'] = _chart_aspects(result['aspects'], bodies, houses, aspect_config,
+                                                  orb_settings, custom_aspects, dec_settings)
+            charts[(name, house_system)] = chart
+            rows.append([houses[f"house {i + 1}"]['lon'] for i in range(12)] + list(chart_ascmc[:3]))
+            index.append((name, house_system))
+    instrument.stop('calculate_positions_sweep.houses', _t)
+
+    result['cusps'] = pd.DataFrame(rows, columns=[f"house {i + 1}" for i in range(12)] + ['Asc', 'MC', 'ARMC'],
+                                   index=pd.MultiIndex.from_tuples(index, names=['location', 'house_system']))
+    result['charts'] = charts
+    instrument.add_rows('calculate_positions_sweep', len(charts))
+    return result
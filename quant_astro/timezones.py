@@ -0,0 +1,254 @@
+# quant_astro/timezones.py
+
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pytz
+
+# =============================================================================
+# 时区：固定偏移 ("+8:00"、"-0530") 与 IANA 时区名 ("Asia/Shanghai")
+#
+# IANA 时区的夏令时规则取自 pytz 的转换表：每个时区只解析一次，
+# 之后整列本地时间用 searchsorted 一次性映射到 UTC，不再逐行 localize。
+# 与 pytz 一致，2037 年之后沿用表中最后一段的偏移。
+# =============================================================================
+
+_TIMEZONE_RE = re.compile(r'^([+-]?)(\d{1,2})(:?)(\d{0,2})$')
+
+# 本地时间落在"拨回"重叠段 (出现两次) 时的处理方式
+AMBIGUOUS_POLICIES = ('raise', 'earliest', 'latest', 'nan')
+# 本地时间落在"拨快"空缺段 (不存在) 时的处理方式
+NONEXISTENT_POLICIES = ('raise', 'shift_forward', 'shift_backward', 'nan')
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+# 远古/远未来哨兵，留出余量，加减偏移时不会溢出
+_FAR_PAST = np.iinfo('int64').min // 4
+_FAR_FUTURE = np.iinfo('int64').max // 4
+
+
+@lru_cache(maxsize=1024)
+def _parse_timezone(tz_str):
+    """解析时区字符串为小时浮点数，支持 +8、-5:30、+0530 等格式。"""
+    match = _TIMEZONE_RE.match(tz_str.strip())
+    if not match:
+        raise ValueError(f"无法解析时区字符串: {tz_str}")
+    sign = -1 if match.group(1) == '-' else 1
+    hours = float(match.group(2))
+    mins = float(match.group(4) or 0)
+    return sign * (hours + mins/60)
+
+def is_fixed_offset(tz_str):
+    """是否为固定偏移写法 (而非 IANA 时区名)。"""
+    return _TIMEZONE_RE.match(tz_str.strip()) is not None
+
+@lru_cache(maxsize=None)
+def _zone(name):
+    try:
+        return pytz.timezone(name.strip())
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"无法识别的时区: {name}。请使用 '+8:00' 形式的固定偏移或 IANA 时区名。")
+
+def _check_policies(ambiguous, nonexistent):
+    if ambiguous not in AMBIGUOUS_POLICIES:
+        raise ValueError(f"ambiguous 必须是 {AMBIGUOUS_POLICIES} 之一，收到: {ambiguous}")
+    if nonexistent not in NONEXISTENT_POLICIES:
+        raise ValueError(f"nonexistent 必须是 {NONEXISTENT_POLICIES} 之一，收到: {nonexistent}")
+
+
+# ----------------- 转换表 -----------------
+
+@lru_cache(maxsize=None)
+def _transition_table(name):
+    """
+    时区的转换表 (均为只读 int64 微秒数组)：
+        utc_start   : 第 i 段在 UTC 下的起点
+        offset      : 第 i 段的 UTC 偏移
+        local_start : 第 i 段在本地时间下的起点
+        local_end   : 第 i 段在本地时间下的终点 (不含)
+    相邻两段本地区间重叠处即歧义时间，之间的空隙即不存在的时间。
+    """
+    if is_fixed_offset(name):
+        utc_start = np.array([_FAR_PAST], dtype='int64')
+        offset = np.array([round(_parse_timezone(name) * 3_600_000_000)], dtype='int64')
+    else:
+        tz = _zone(name)
+        times = getattr(tz, '_utc_transition_times', None)
+        if times:
+            utc_start = np.array([(t - _EPOCH) // _ONE_US for t in times], dtype='int64')
+            utc_start[0] = _FAR_PAST
+            offset = np.array([info[0] // _ONE_US for info in tz._transition_info], dtype='int64')
+        else:
+            # 无夏令时的静态时区 (如 UTC)
+            utc_start = np.array([_FAR_PAST], dtype='int64')
+            offset = np.array([tz.utcoffset(_EPOCH) // _ONE_US], dtype='int64')
+
+        # 合并偏移不变的相邻段 (只改了缩写或 dst 标志)
+        keep = np.r_[True, offset[1:] != offset[:-1]]
+        utc_start, offset = utc_start[keep], offset[keep]
+
+    local_start = utc_start + offset
+    local_end = np.r_[utc_start[1:] + offset[:-1], _FAR_FUTURE]
+    table = (utc_start, offset, local_start, local_end)
+    for arr in table:
+        arr.setflags(write=False)
+    return table
+
+def _format_us(us):
+    return str(np.datetime64(int(us), 'us')).replace('T', ' ')
+
+def _local_us_to_utc_us(local_us, name, ambiguous='raise', nonexistent='raise'):
+    """
+    单一时区下，本地微秒时间戳数组 -> (UTC 微秒数组, 有效掩码)。
+    策略为 'nan' 的行掩码为 False。
+    """
+    utc_start, offset, local_start, local_end = _transition_table(name)
+    local_us = np.asarray(local_us, dtype='int64')
+    valid = np.ones(local_us.shape, dtype=bool)
+    if len(offset) == 1:
+        return local_us - offset[0], valid
+
+    i = np.maximum(np.searchsorted(local_start, local_us, side='right') - 1, 0)
+    prev = np.maximum(i - 1, 0)
+    in_late = local_us < local_end[i]
+    in_early = (i > 0) & (local_us < local_end[prev])
+    utc_us = local_us - np.where(in_late, offset[i], offset[prev])
+
+    ambiguous_mask = in_late & in_early
+    if ambiguous_mask.any():
+        if ambiguous == 'raise':
+            bad = local_us[np.argmax(ambiguous_mask)]
+            raise ValueError(f"本地时间 {_format_us(bad)} 在时区 {name} 中出现两次 (夏令时回拨)，"
+                             "请通过 ambiguous='earliest'/'latest'/'nan' 指定处理方式。")
+        if ambiguous == 'earliest':
+            # 回拨前的偏移更大，对应较早的 UTC 时刻
+            utc_us[ambiguous_mask] = local_us[ambiguous_mask] - offset[prev[ambiguous_mask]]
+        elif ambiguous == 'nan':
+            valid &= ~ambiguous_mask
+
+    gap_mask = ~in_late & ~in_early
+    if gap_mask.any():
+        if nonexistent == 'raise':
+            bad = local_us[np.argmax(gap_mask)]
+            raise ValueError(f"本地时间 {_format_us(bad)} 在时区 {name} 中不存在 (夏令时拨快)，"
+                             "请通过 nonexistent='shift_forward'/'shift_backward'/'nan' 指定处理方式。")
+        # 空缺段之后的那次转换时刻
+        transition = utc_start[np.minimum(i[gap_mask] + 1, len(utc_start) - 1)]
+        if nonexistent == 'shift_forward':
+            utc_us[gap_mask] = transition
+        elif nonexistent == 'shift_backward':
+            utc_us[gap_mask] = transition - 1
+        else:
+            valid &= ~gap_mask
+
+    return utc_us, valid
+
+def _utc_us_to_offset_us(utc_us, name):
+    """单一时区下，UTC 微秒时间戳数组 -> 当时的 UTC 偏移 (微秒)。"""
+    utc_start, offset, _, _ = _transition_table(name)
+    i = np.maximum(np.searchsorted(utc_start, np.asarray(utc_us, dtype='int64'), side='right') - 1, 0)
+    return offset[i]
+
+
+# ----------------- 向量化接口 -----------------
+
+def _to_local_us(local_times, calendar='g'):
+    """本地时间 (字符串 / datetime64 / DatetimeIndex / datetime 序列) -> 微秒整数数组。"""
+    arr = np.asarray(local_times)
+    if arr.dtype.kind in ('U', 'S', 'O') and arr.size and isinstance(arr.ravel()[0], str):
+        from .core import local_times_to_gregorian
+        arr = local_times_to_gregorian(arr, calendar)
+    return np.asarray(arr, dtype='datetime64[us]').astype('int64')
+
+def _by_zone(tz, n, fn):
+    """把逐行的时区列按去重后的时区分组处理；tz 为单个字符串时整列一次完成。"""
+    if isinstance(tz, str):
+        fn(np.arange(n), tz)
+        return
+    tz = np.asarray(tz, dtype=object).ravel()
+    if len(tz) != n:
+        raise ValueError("时区序列的长度必须与时间序列一致。")
+    uniq, inverse = np.unique(tz, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.searchsorted(inverse[order], np.arange(len(uniq) + 1))
+    for k, name in enumerate(uniq):
+        fn(order[bounds[k]:bounds[k + 1]], name)
+
+def local_to_utc(local_times, tz, ambiguous='raise', nonexistent='raise', calendar='g'):
+    """
+    把一列本地时间批量转换为 UTC，返回 numpy.datetime64[us] 数组。
+
+    参数:
+        local_times : 本地时间序列 (字符串 "YYYY-MM-DD HH:MM:SS[.ffffff]"、datetime64 或 naive DatetimeIndex)
+        tz          : 单个时区，或与 local_times 等长的逐行时区；可为 '+8:00' 或 'Asia/Shanghai'
+        ambiguous   : 重叠时间 —— 'raise' / 'earliest' (取较早的 UTC) / 'latest' / 'nan' (NaT)
+        nonexistent : 空缺时间 —— 'raise' / 'shift_forward' (移到转换后) / 'shift_backward' / 'nan'
+        calendar    : 字符串输入所用历法，'g' / 'j' 或逐行数组
+    """
+    _check_policies(ambiguous, nonexistent)
+    local_us = _to_local_us(local_times, calendar).ravel()
+    utc_us = np.empty_like(local_us)
+    valid = np.empty(local_us.shape, dtype=bool)
+
+    def convert(rows, name):
+        utc_us[rows], valid[rows] = _local_us_to_utc_us(local_us[rows], name, ambiguous, nonexistent)
+
+    _by_zone(tz, len(local_us), convert)
+    out = utc_us.astype('datetime64[us]')
+    out[~valid] = np.datetime64('NaT')
+    return out
+
+def local_to_jd_utc(local_times, tz, ambiguous='raise', nonexistent='raise', calendar='g'):
+    """同 local_to_utc，但直接返回 UTC 儒略日 (float64，无效行为 NaN)。"""
+    from .calendars import datetime64_to_jd
+    utc = local_to_utc(local_times, tz, ambiguous, nonexistent, calendar)
+    jd = datetime64_to_jd(np.where(np.isnat(utc), np.datetime64(0, 'us'), utc))
+    jd[np.isnat(utc)] = np.nan
+    return jd
+
+def utc_offsets(utc_times, tz):
+    """一列 UTC 时刻在给定时区下的偏移 (小时，float64)。"""
+    utc_us = np.asarray(utc_times, dtype='datetime64[us]').astype('int64').ravel()
+    out = np.empty(utc_us.shape, dtype='float64')
+
+    def lookup(rows, name):
+        out[rows] = _utc_us_to_offset_us(utc_us[rows], name) / 3_600_000_000
+
+    _by_zone(tz, len(utc_us), lookup)
+    return out
+
+
+# ----------------- 单值接口 (供 core / dasha 入口使用) -----------------
+
+def resolve_utc_offset(local_dt, tz_str, ambiguous='raise', nonexistent='raise'):
+    """
+    单个本地时间 (naive、格里历 datetime) 在 tz_str 下的 UTC 偏移 (小时)。
+    固定偏移直接解析；IANA 时区按当时的夏令时规则确定。
+    本地时间 - 偏移 即为对应的 UTC 时间 (空缺时间按 nonexistent 平移)。
+    单个时间没有可以标记为缺失的位置：策略为 'nan' 且时间有歧义或不存在时抛出 ValueError
+    (需要 NaT/NaN 标记时请用 local_to_utc 等向量化接口)。
+    """
+    if is_fixed_offset(tz_str):
+        return _parse_timezone(tz_str)
+    _check_policies(ambiguous, nonexistent)
+    local_us = (local_dt - _EPOCH) // _ONE_US
+    utc_us, valid = _local_us_to_utc_us(np.array([local_us]), tz_str, ambiguous, nonexistent)
+    if not valid[0]:
+        raise ValueError(f"本地时间 {local_dt} 在时区 {tz_str} 中有歧义或不存在，"
+                         f"ambiguous={ambiguous!r} / nonexistent={nonexistent!r} 时无法确定 UTC 偏移")
+    return (local_us - int(utc_us[0])) / 3_600_000_000
+
+def utc_to_local(utc_dt, tz_str):
+    """单个 UTC 时间 (naive datetime) -> tz_str 下的本地时间 (naive datetime)。"""
+    if is_fixed_offset(tz_str):
+        return utc_dt + timedelta(hours=_parse_timezone(tz_str))
+    utc_us = (utc_dt - _EPOCH) // _ONE_US
+    return utc_dt + timedelta(microseconds=int(_utc_us_to_offset_us(np.array([utc_us]), tz_str)[0]))
+
+def get_tzinfo(tz_str):
+    """tz_str 对应的 pytz tzinfo：固定偏移返回 FixedOffset，IANA 名返回对应时区。"""
+    if is_fixed_offset(tz_str):
+        return pytz.FixedOffset(int(_parse_timezone(tz_str) * 60))
+    return _zone(tz_str)
@@ -0,0 +1,153 @@
+# quant_astro/vargas.py
+
+import numpy as np
+
+from . import instrument
+from .instrument import instrumented
+from .attributes import ZODIAC_NAMES
+
+# =============================================================================
+# 吠陀分盘 (Varga, D1–D60)
+#
+# 每个分盘把一个星座等分为 n 份 (D30 按不等分的度数界)，第 k 份落入的星座由
+# "起始星座 + k × 步长" 决定，起始星座按奇偶 / 三分性 (基本·固定·变动) / 四元素取值。
+# 导入时把每个分盘展开为长度 12 × n 的查找表 (第 s 个星座第 k 份 -> 分盘星座)，
+# 计算时只需 idx = floor(lon × n / 30) 一次取表，任意形状的经度数组都可直接处理。
+# 星座索引 0 = 白羊 ... 11 = 双鱼 (与 ZODIAC_NAMES 一致)；奇数星座指白羊、双子等 (索引为偶数)。
+# =============================================================================
+
+def _by_parity(odd, even):
+    return [odd if s % 2 == 0 else even for s in range(12)]
+
+def _by_modality(movable, fixed, dual):
+    return [(movable, fixed, dual)[s % 3] for s in range(12)]
+
+def _by_element(fire, earth, air, water):
+    return [(fire, earth, air, water)[s % 4] for s in range(12)]
+
+def _offset(odd, even):
+    """本星座起算：奇数星座 + odd，偶数星座 + even。"""
+    return [(s + (odd if s % 2 == 0 else even)) % 12 for s in range(12)]
+
+
+# 分盘名 -> (等分数, 各星座的起始星座, 步长 (整数或按星座的列表))
+VARGA_RULES = {
+    'D1':  (1,  _offset(0, 0), 1),
+    'D2':  (2,  _by_parity(4, 3), _by_parity(-1, 1)),  # Hora：奇数座 狮子→巨蟹，偶数座 巨蟹→狮子
+    'D3':  (3,  _offset(0, 0), 4),                      # Drekkana：本座、第5座、第9座
+    'D4':  (4,  _offset(0, 0), 3),                      # Chaturthamsa：本座与各始宫
+    'D7':  (7,  _offset(0, 6), 1),                      # Saptamsa：偶数座从对宫起
+    'D9':  (9,  _by_element(0, 9, 6, 3), 1),            # Navamsa：火白羊、土摩羯、风天秤、水巨蟹
+    'D10': (10, _offset(0, 8), 1),                      # Dasamsa：偶数座从第9座起
+    'D12': (12, _offset(0, 0), 1),                      # Dwadasamsa
+    'D16': (16, _by_modality(0, 4, 8), 1),              # Shodasamsa：基本白羊、固定狮子、变动射手
+    'D20': (20, _by_modality(0, 8, 4), 1),              # Vimsamsa：基本白羊、固定射手、变动狮子
+    'D24': (24, _by_parity(4, 3), 1),                   # Chaturvimsamsa：奇数座狮子、偶数座巨蟹
+    'D27': (27, _by_element(0, 3, 6, 9), 1),            # Bhamsa：火白羊、土巨蟹、风天秤、水摩羯
+    'D30': (30, None, None),                            # Trimsamsa：见 TRIMSAMSA_BOUNDS
+    'D40': (40, _by_parity(0, 6), 1),                   # Khavedamsa：奇数座白羊、偶数座天秤
+    'D45': (45, _by_modality(0, 4, 8), 1),              # Akshavedamsa：基本白羊、固定狮子、变动射手
+    'D60': (60, _offset(0, 0), 1),                      # Shashtiamsa
+}
+
+# D30 的度数界：[(限制度数, 分盘星座索引), ...]，格式与 attributes.EGYPTIAN_BOUNDS 相同
+TRIMSAMSA_BOUNDS = {
+    'odd':  [(5, 0), (10, 10), (18, 8), (25, 2), (30, 6)],   # 火(白羊)、土(水瓶)、木(射手)、水(双子)、金(天秤)
+    'even': [(5, 1), (12, 5), (20, 11), (25, 9), (30, 7)],   # 金(金牛)、水(处女)、木(双鱼)、土(摩羯)、火(天蝎)
+}
+
+VARGAS = tuple(VARGA_RULES)
+
+
+def _build_table(name):
+    parts, starts, steps = VARGA_RULES[name]
+    table = np.empty((12, parts), dtype='int8')
+    if name == 'D30':
+        for s in range(12):
+            lower = 0
+            for limit, sign in TRIMSAMSA_BOUNDS['odd' if s % 2 == 0 else 'even']:
+                table[s, lower:limit] = sign
+                lower = limit
+    else:
+        steps = steps if isinstance(steps, list) else [steps] * 12
+        k = np.arange(parts)
+        for s in range(12):
+            table[s] = (starts[s] + k * steps[s]) % 12
+    return table.ravel()
+
+
+# 分盘名 -> (等分数, 扁平查找表)
+_LOOKUP = {name: (VARGA_RULES[name][0], _build_table(name)) for name in VARGAS}
+
+
+def _check_vargas(vargas):
+    names = [vargas] if isinstance(vargas, str) else list(vargas)
+    unknown = [name for name in names if name not in _LOOKUP]
+    if unknown:
+        raise ValueError(f"不支持的分盘: {', '.join(map(str, unknown))}，可选: {', '.join(VARGAS)}")
+    return names
+
+
+@instrumented('varga_signs')
+def varga_signs(lons, vargas=VARGAS, out=None, chunk_size=1 << 14):
+    """
+    把黄经数组映射为各分盘的星座索引。
+
+    参数:
+        lons       : 任意形状的黄经数组 (度，可为负或大于 360)
+        vargas     : 分盘名列表 (如 ['D9', 'D10'])，默认全部；传单个字符串时不增加末维
+        out        : 可选的输出数组 (int8，形状 lons.shape + (len(vargas),))
+        chunk_size : 每次处理的经度个数，所有分盘在同一块上依次取表，临时数组保持在缓存大小
+
+    返回:
+        int8 数组，形状 lons.shape + (len(vargas),)，值为 0–11 的星座索引
+        (名称见 ZODIAC_NAMES；千万行 × 16 个分盘约 160 MB)
+    """
+    names = _check_vargas(vargas)
+    lons = np.asarray(lons, dtype='float64')
+    if not np.isfinite(lons).all():
+        raise ValueError("lons 中含有 NaN 或无穷大。")
+    shape = lons.shape + (len(names),)
+    if out is None:
+        out = np.empty(shape, dtype='int8')
+    elif out.shape != shape or out.dtype != np.int8:
+        raise ValueError(f"out 必须是形状 {shape} 的 int8 数组。")
+
+    flat = lons.reshape(-1)
+    flat_out = out.reshape(-1, len(names))
+    scaled = np.empty(min(chunk_size, flat.size), dtype='float64')
+    idx = np.empty(scaled.size, dtype=np.intp)
+    for start in range(0, flat.size, chunk_size):
+        block = flat[start:start + chunk_size]
+        n = block.size
+        lon = np.mod(block, 360.0)
+        for v, name in enumerate(names):
+            parts, table = _LOOKUP[name]
+            # 先乘后除，整度数边界 (如 D3 的 10°、20°) 不受浮点误差影响
+            np.multiply(lon, parts, out=scaled[:n])
+            scaled[:n] /= 30.0
+            np.floor(scaled[:n], out=scaled[:n])
+            idx[:n] = scaled[:n]
+            np.minimum(idx[:n], table.size - 1, out=idx[:n])
+            flat_out[start:start + n, v] = table[idx[:n]]
+
+    instrument.add_rows('varga_signs', flat.size)
+    return out[..., 0] if isinstance(vargas, str) else out
+
+
+@instrumented('get_vargas')
+def get_vargas(planet_dict, house_dict, vargas=VARGAS):
+    """
+    单张星盘的分盘星座，输入与 get_kp_lords 相同。
+
+    返回:
+        (planet_results, house_results)：{名称: {'D1': 'Ari', 'D9': 'Sag', ...}}
+    """
+    names = _check_vargas(vargas)
+
+    def process_single_dict(input_dict):
+        keys = list(input_dict)
+        codes = varga_signs([float(input_dict[k]['lon']) for k in keys], names)
+        return {k: {name: ZODIAC_NAMES[c] for name, c in zip(names, row)} for k, row in zip(keys, codes.tolist())}
+
+    return process_single_dict(planet_dict), process_single_dict(house_dict)
@@ -0,0 +1,218 @@
+# quant_astro/zodiacs.py
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from . import instrument
+from .instrument import instrumented
+from .core import (MINOR_PLANET_CATALOG, HOUSE_SYSTEMS, PLANET_DIGNITIES, _ensure_ephe_path, _resolve_ayanamsha,
+                   _to_jd_utc)
+from .kp import get_kp_lords
+from .search import to_jd_array, sample_body
+
+# =============================================================================
+# 多黄道 / 多岁差：一次热带星历，按减法得到各恒星黄道版本
+#
+# swisseph 的恒星黄道位置 = 热带位置 (含章动) - 真岁差值 (swe.get_ayanamsa_ex_ut)，宫头同理 (ARMC 不变)。
+# 因此每个时刻只调用一次热带星历，各岁差模式只需查一次岁差值 (按 (儒略日, 模式) 缓存)：
+#   经度 = 热带经度 - 岁差；速度 = 热带速度 - 岁差变化率 (与 swisseph 的恒星黄道速度相差约 1e-7 °/天)。
+# 赤道坐标：恒星黄道模式下 swisseph 返回的 ra/dec 与岁差模式无关，只需再算一次；热带版本取热带赤道坐标。
+# 输出的行星 / 宫位字典与 calculate_positions 相同，可直接交给 get_kp_lords、calculate_aspects 等。
+# =============================================================================
+
+DEFAULT_ZODIAC_VARIANTS = ('tropical', 'SIDM_KRISHNAMURTI', 'SIDM_LAHIRI', 'SIDM_FAGAN_BRADLEY',
+                           'SIDM_KRISHNAMURTI_VP291')
+
+# 与 calculate_positions 相同的主行星顺序 (Ke 由 Ra 对冲得到，紧跟在 Ra 之后)
+_MAIN_BODIES = (('Su', swe.SUN), ('Mo', swe.MOON), ('Me', swe.MERCURY), ('Ve', swe.VENUS), ('Ma', swe.MARS),
+                ('Ju', swe.JUPITER), ('Sa', swe.SATURN), ('Ur', swe.URANUS), ('Ne', swe.NEPTUNE), ('Pl', swe.PLUTO))
+_AYANAMSHA_RATE_STEP = 0.5   # 岁差变化率的中心差分半步长 (天)
+
+
+@lru_cache(maxsize=65536)
+def _ayanamsha(jd_utc, mode):
+    swe.set_sid_mode(mode)
+    return swe.get_ayanamsa_ex_ut(jd_utc, 0)[1]
+
+
+def ayanamsha_value(jd_utc, ayanamsha_mode='SIDM_KRISHNAMURTI'):
+    """
+    真岁差值 (含章动，度) 及其变化率 (度/天)，按 (儒略日, 模式) 缓存。
+    'tropical' 返回 (0.0, 0.0)。
+    """
+    if ayanamsha_mode == 'tropical':
+        return 0.0, 0.0
+    mode = _resolve_ayanamsha(ayanamsha_mode)
+    jd_utc = float(jd_utc)
+    h = _AYANAMSHA_RATE_STEP
+    rate = (_ayanamsha(jd_utc + h, mode) - _ayanamsha(jd_utc - h, mode)) / (2.0 * h)
+    return _ayanamsha(jd_utc, mode), rate
+
+
+def _body_list(node_mode, selected_planets, selected_minor_planets):
+    """(名称, swisseph 常量) 列表，筛选规则与 calculate_positions 相同 (Ke 随 Ra 一起计算)。"""
+    node = swe.TRUE_NODE if node_mode == 'true' else swe.MEAN_NODE
+    bodies = list(_MAIN_BODIES) + [('Ra', node)]
+    bodies += [(code, MINOR_PLANET_CATALOG[code]) for code in selected_minor_planets if code in MINOR_PLANET_CATALOG]
+    if selected_planets is None or 'All' in selected_planets:
+        return bodies
+    wanted = set(selected_planets) | set(selected_minor_planets)
+    return [(name, body) for name, body in bodies
+            if name in wanted or (name == 'Ra' and 'Ke' in wanted)]
+
+
+def _ephemeris_pass(jd_utc, bodies, sidereal):
+    """
+    单个时刻的一次热带星历：返回 {名称: (黄道 xx, 热带赤道 xx, 恒星黄道模式赤道 xx)} 与真黄赤交角。
+    sidereal=False 时不计算恒星黄道模式的赤道坐标。
+    """
+    eps = swe.calc_ut(jd_utc, swe.ECL_NUT, 0)[0][0]
+    flag = swe.FLG_SWIEPH | swe.FLG_SPEED
+    raw = {}
+    for name, body in bodies:
+        xx = swe.calc_ut(jd_utc, body, flag)[0]
+        xx_eq = swe.calc_ut(jd_utc, body, flag | swe.FLG_EQUATORIAL)[0]
+        xx_sid_eq = swe.calc_ut(jd_utc, body, flag | swe.FLG_SIDEREAL | swe.FLG_EQUATORIAL)[0] if sidereal else None
+        raw[name] = (xx, xx_eq, xx_sid_eq)
+    return raw, eps
+
+
+def _variant_planets(raw, aya, rate, eps, sidereal, selected_planets):
+    """由一次星历的结果构造某个黄道版本的行星字典 (格式与 calculate_positions 相同)。"""
+    positions = {}
+    for name, (xx, xx_eq, xx_sid_eq) in raw.items():
+        eq = xx_sid_eq if sidereal else xx_eq
+        lon = (xx[0] - aya) % 360
+        keep_ra = name != 'Ra' or selected_planets is None or 'All' in selected_planets or 'Ra' in selected_planets
+        if keep_ra:
+            positions[name] = {'lon': lon, 'lat': xx[1], 'speed': xx[3] - rate,
+                               'ra': eq[0], 'dec': eq[1], 'dec_speed': eq[4]}
+        if name == 'Ra' and (selected_planets is None or 'All' in selected_planets or 'Ke' in selected_planets):
+            south_lon = (lon + 180) % 360
+            pos_eq = swe.cotrans((south_lon, -xx[1], xx[2]), eps)
+            positions['Ke'] = {'lon': south_lon, 'lat': -xx[1], 'speed': xx[3] - rate,
+                               'ra': pos_eq[0], 'dec': pos_eq[1], 'dec_speed': -eq[4]}
+    if selected_planets and 'All' not in selected_planets:
+        ordered = {k: positions[k] for k in selected_planets if k in positions}
+        ordered.update((k, v) for k, v in positions.items() if k not in ordered)
+        positions = ordered
+    main = {k: v for k, v in positions.items() if k not in MINOR_PLANET_CATALOG}
+    minor = {k: v for k, v in positions.items() if k in MINOR_PLANET_CATALOG}
+    return main, minor
+
+
+def _variant_houses(cusps, cusp_speeds, ascmc, aya, eps, whole_sign=False):
+    """
+    热带宫头 -> 某个黄道版本的宫位字典与 ascmc (ARMC 不变)。
+    整宫制的宫头是所在黄道的星座起点，不能整体平移，按平移后的上升点重新取整 (速度同 swisseph，均为上升点速度)。
+    """
+    if whole_sign and aya:
+        first = ((ascmc[0] - aya) % 360) // 30 * 30
+        cusps = [(first + 30 * i + aya) % 360 for i in range(12)]
+        cusp_speeds = [cusp_speeds[0]] * 12
+    houses = {}
+    for i in range(12):
+        lon = (cusps[i] - aya) % 360
+        pos_eq = swe.cotrans((lon, 0.0, 1.0), eps)
+        houses[f"house {i + 1}"] = {'lon': lon, 'lat': 0.0, 'speed': cusp_speeds[i],
+                                    'ra': pos_eq[0], 'dec': pos_eq[1], 'dec_speed': 0.0}
+    shifted = tuple(value if k == 2 else (value - aya) % 360 for k, value in enumerate(ascmc))
+    return houses, shifted
+
+
+@instrumented('calculate_positions_variants')
+def calculate_positions_variants(when, latitude, longitude, variants=DEFAULT_ZODIAC_VARIANTS, utc_offset=0.0,
+                                 node_mode='mean', house_system='Placidus', ephe_path=None, kp=True,
+                                 selected_planets=None, selected_minor_planets=()):
+    """
+    同一时刻、同一地点的多个黄道版本 (热带 + 多个岁差模式)，只调用一次星历。
+
+    参数:
+        when, latitude, longitude, utc_offset : 与 calculate_positions_numeric 相同
+        variants       : 'tropical' 与岁差模式名 (如 'SIDM_LAHIRI'，写法同 ayanamsha_mode)
+        kp             : 是否为每个版本附上 get_kp_lords 的结果
+        selected_planets / selected_minor_planets : 与 calculate_positions 的同名参数相同
+
+    返回:
+        {版本名: {'ayanamsha': 岁差值 (热带为 0), 'planets': 主行星字典, 'minor_planets': 小行星字典,
+                  'houses': 宫位字典, 'ascmc': ascmc 元组, 'kp_planets': ..., 'kp_houses': ...}}
+        行星与宫位字典的格式与 calculate_positions 相同；'dignities' 为 PLANET_DIGNITIES。
+    """
+    if house_system not in HOUSE_SYSTEMS:
+        raise ValueError(f"不支持的宫制: {house_system}，可选: {', '.join(HOUSE_SYSTEMS)}")
+    variants = list(dict.fromkeys([variants] if isinstance(variants, str) else variants))
+    jd_utc = _to_jd_utc(when, utc_offset)
+    _ensure_ephe_path(ephe_path)
+    # 先查岁差值：模式名写错时在计算星历之前报错
+    ayanamshas = {variant: ayanamsha_value(jd_utc, variant) for variant in variants}
+    sidereal = any(variant != 'tropical' for variant in variants)
+
+    _t = instrument.start()
+    bodies = _body_list(node_mode, selected_planets, selected_minor_planets)
+    raw, eps = _ephemeris_pass(jd_utc, bodies, sidereal)
+    cusps, ascmc, cusp_speeds, _ = swe.houses_ex2(jd_utc, float(latitude), float(longitude),
+                                                  HOUSE_SYSTEMS[house_system], flags=0)
+    instrument.stop('calculate_positions_variants.ephemeris', _t)
+
+    results = {}
+    for variant in variants:
+        aya, rate = ayanamshas[variant]
+        planets, minor = _variant_planets(raw, aya, rate, eps, variant != 'tropical', selected_planets)
+        houses, variant_ascmc = _variant_houses(cusps, cusp_speeds, ascmc, aya, eps,
+                                                whole_sign=house_system == 'Whole Sign')
+        result = {'ayanamsha': aya, 'planets': planets, 'minor_planets': minor, 'houses': houses,
+                  'ascmc': variant_ascmc, 'jd_utc': jd_utc, 'dignities': PLANET_DIGNITIES.copy()}
+        if kp:
+            result['kp_planets'], result['kp_houses'] = get_kp_lords({**planets, **minor}, houses)
+        results[variant] = result
+    instrument.add_rows('calculate_positions_variants', len(results))
+    return results
+
+
+@instrumented('variant_longitudes')
+def variant_longitudes(timestamps, variants=DEFAULT_ZODIAC_VARIANTS, bodies=tuple(name for name, _ in _MAIN_BODIES),
+                       ephe_path=None):
+    """
+    批量版：时间数组 × 星体的黄经，一次热带星历，各版本减去逐时刻 (缓存的) 岁差值。
+
+    参数:
+        timestamps : 儒略日 (UT) 数组，或 UTC 的 datetime64 / DatetimeIndex
+        variants   : 'tropical' 与岁差模式名
+        bodies     : 主行星简写、'Ra' (平交点)、'Ke' 或 MINOR_PLANET_CATALOG 中的小行星
+
+    返回:
+        DataFrame，行与 timestamps 一一对应，列为 MultiIndex (版本, 星体)，值为 0–360 的黄经
+        (可直接交给 kp_lords_at 或 varga_signs)。
+    """
+    variants = list(dict.fromkeys([variants] if isinstance(variants, str) else variants))
+    bodies = list(dict.fromkeys([bodies] if isinstance(bodies, str) else bodies))
+    ids = dict(_MAIN_BODIES, Ra=swe.MEAN_NODE, Ke=swe.MEAN_NODE, **MINOR_PLANET_CATALOG)
+    unknown = [name for name in bodies if name not in ids]
+    if unknown:
+        raise ValueError(f"不支持的星体: {', '.join(unknown)}，可选: {', '.join(ids)}")
+    jds = np.atleast_1d(to_jd_array(timestamps)).astype('float64')
+    _ensure_ephe_path(ephe_path)
+
+    tropical = np.empty((len(jds), len(bodies)))
+    for k, name in enumerate(bodies):
+        tropical[:, k] = sample_body(jds, ids[name], swe.FLG_SWIEPH, index=(0,))[:, 0] + (180.0 if name == 'Ke' else 0.0)
+
+    columns = {}
+    for variant in variants:
+        if variant == 'tropical':
+            aya = np.zeros(len(jds))
+        else:
+            mode = _resolve_ayanamsha(variant)
+            aya = np.array([_ayanamsha(jd, mode) for jd in jds.tolist()])
+        values = (tropical - aya[:, None]) % 360.0
+        for k, name in enumerate(bodies):
+            columns[(variant, name)] = values[:, k]
+    df = pd.DataFrame(columns)
+    df.columns = pd.MultiIndex.from_tuples(df.columns, names=['variant', 'body'])
+    if isinstance(timestamps, (pd.DatetimeIndex, pd.Series)):
+        df.index = timestamps.index if isinstance(timestamps, pd.Series) else timestamps
+    instrument.add_rows('variant_longitudes', len(df))
+    return df
@@ -20,9 +20,9 @@ setup(
     url='https://github.com/LouiShadowMZ/quant-astro-lib.git',
     packages=find_packages(),
     
-    # 包含了 data 和 ephe 目录下的所有文件，更具扩展性
+    # 包含了 data、ephe 和 html (星盘页面的样式资源) 目录下的所有文件，更具扩展性
     package_data={
-        'quant_astro': ['data/*', 'ephe/*'],
+        'quant_astro': ['data/*', 'ephe/*', 'html/*'],
     },
     include_package_data=True,
     